@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.run_benchmarks import LastValueModel, compare
+
+
+RESULTS_PATH = "benchmarks/results/e2e_latest.json"
+BASELINE_PATH = "benchmarks/results/e2e_baseline.json"
+
+
+def write_lab_reports(patients, lab_path, template_path="data/lab_reports"):
+    """Give every virtual patient a copy of its template patient's lab report."""
+    os.makedirs(lab_path, exist_ok=True)
+    templates = {}
+    for patient_id, template, _ in patients:
+        if template not in templates:
+            templates[template] = pd.read_csv(os.path.join(template_path, f"{template}.csv"))
+        templates[template].assign(Patient_ID=patient_id).to_csv(os.path.join(lab_path, f"{patient_id}.csv"), index=False)
+
+
+def percentiles_ms(latencies):
+    if not len(latencies):
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {"p50_ms": round(p50, 2), "p95_ms": round(p95, 2), "p99_ms": round(p99, 2)}
+
+
+def run(transport, patients, rows, loops, rate, work_dir, idle_timeout=30.0):
+    """Drive producer → consumer → merge → predict through `transport` on this machine.
+
+    Returns the stage results and the data-loss problems found: every message consumed,
+    one merged row per reading sent and a prediction for every patient. Timings of a
+    run that lost data are not a valid measurement.
+    """
+    kafka_path = os.path.join(work_dir, "kafkaConsumerData")
+    lab_path = os.path.join(work_dir, "lab_reports")
+    merged_path = os.path.join(work_dir, "merged.csv")
+    encoder_path = os.path.join(work_dir, "encoder.pkl")
+    shutil.copy("artifacts/encoder.pkl", encoder_path)
+    # The producer, consumer and monitor read their configuration at import / construction time.
+    # A replay sends all of a patient's readings at once and the consumer polls one topic's backlog
+    # before the other's, so the join must be able to hold every reading of a patient unmatched.
+    os.environ.update(
+        TRANSPORT=transport, TRANSPORT_LOG_PATH=os.path.join(work_dir, "transport_log"),
+        KAFKA_DATA_PATH=kafka_path, LAB_PATH=lab_path, CONSUMER_STATE_PATH=os.path.join(work_dir, "consumer_state"),
+        LIVE_INFERENCE="false", MERGED_DATA_PATH=merged_path, ENCODER_PATH=encoder_path, SCALER_PATH="artifacts/scaler.pkl",
+        JOIN_MAX_PENDING=str(max(rows * loops, 16)),
+    )
+    import kafka_producer
+    from kafka_consumer import ConsumerWorker
+    from src.data_merging import PatientDataMerger
+    from main import PatientHealthMonitor
+
+    patient_data = kafka_producer.load_patient_data(kafka_producer.base_path)
+    virtual = kafka_producer.synthesize_patients(patient_data, patients)
+    write_lab_reports(virtual, lab_path)
+    rows = min(rows, min(len(frame) for records in patient_data.values() for frame in records.values()))
+    expected = 2 * len(virtual) * rows * loops
+
+    results, problems = [], []
+
+    def record(stage, seconds, **extra):
+        results.append({"stage": f"{transport}_{stage}", "patients": len(virtual), "rows": rows * loops,
+                        "seconds": round(seconds, 4), **extra})
+        print(f"{transport + '_' + stage:>16} patients={len(virtual):<7} rows={rows * loops:<5} {seconds:9.3f}s"
+              + "".join(f" {key}={value}" for key, value in extra.items()))
+
+    worker = ConsumerWorker()
+    producer = kafka_producer.create_producer(262144, 20, transport=transport)
+    produced = {}
+    thread = threading.Thread(
+        target=lambda: produced.update(zip(("sent", "seconds"), kafka_producer.replay(producer, patient_data, patients, rate, loops=loops, report_every=float("inf"), rows=rows))),
+        name="producer",
+    )
+
+    latencies, consumed = [], 0
+    start = last_progress = time.perf_counter()
+    thread.start()
+    while consumed < expected and time.perf_counter() - last_progress < idle_timeout:
+        batches = worker.step(timeout_ms=100)
+        now = time.time()
+        for messages in batches.values():
+            latencies.extend(now - message.value["timestamp"] / 1000 for message in messages)
+            consumed += len(messages)
+            last_progress = time.perf_counter()
+    consume_seconds = time.perf_counter() - start
+    thread.join()
+    producer.close()
+    worker.close()
+    if consumed < expected:
+        problems.append(f"consumed {consumed} of {expected} messages before going idle for {idle_timeout}s")
+
+    record("produce", produced["seconds"], messages=produced["sent"], messages_per_s=round(produced["sent"] / produced["seconds"]))
+    record("consume", consume_seconds, messages=consumed, messages_per_s=round(consumed / consume_seconds), **percentiles_ms(np.array(latencies)))
+
+    start = time.perf_counter()
+    merged = PatientDataMerger(kafka_path, lab_path, merged_path, log_file=None).merge()
+    merged_rows = 0 if merged is None else len(merged)
+    record("merge", time.perf_counter() - start, merged_rows=merged_rows)
+    if merged_rows != len(virtual) * rows * loops:
+        problems.append(f"merged {merged_rows} rows for {len(virtual) * rows * loops} readings sent")
+
+    start = time.perf_counter()
+    monitor = PatientHealthMonitor(model=LastValueModel())
+    predictions, alerts = monitor.make_predictions()
+    record("predict", time.perf_counter() - start, predicted=len(predictions), alerting=len(alerts))
+    if rows * loops >= monitor.sequence_length and len(predictions) != len(virtual):
+        problems.append(f"predicted {len(predictions)} of {len(virtual)} patients")
+    return results, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark producer → consumer → merge → predict without a broker.")
+    parser.add_argument("--transport", choices=["memory", "mmap"], default="memory")
+    parser.add_argument("--patients", type=int, default=100, help="virtual patients synthesized from the data/P* templates")
+    parser.add_argument("--rows", type=int, default=60, help="readings per patient per loop")
+    parser.add_argument("--loops", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=0.0, help="target produce rate in messages/s (0 = as fast as possible)")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs. the baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix=f"e2e_{args.transport}_")
+    try:
+        results, problems = run(args.transport, args.patients, args.rows, args.loops, args.rate, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for problem in problems:
+        print(f"DATA LOSS {problem}")
+    if problems:
+        # Throughput measured on collapsed data is neither a result nor a baseline.
+        return 1
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+    report = {
+        "meta": {"date": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                 "platform": platform.platform(), "transport": args.transport, "rate": args.rate},
+        "results": results,
+        "regressions": regressions,
+    }
+    for path in [args.output] + ([args.baseline] if args.save_baseline else []):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    for r in regressions:
+        print(f"REGRESSION {r['stage']} patients={r['patients']} rows={r['rows']}: {r['seconds']}s vs {r['baseline_seconds']}s (x{r['ratio']})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+from logger import LOG_FORMAT, setup_logging, shutdown_logging, count_event
+
+
+RESULTS_PATH = "benchmarks/results/logging_latest.json"
+
+
+def message(i):
+    """A reading shaped like the ones the consumer and producer used to log one line for."""
+    return {"Patient_ID": f"P{i % 1000}", "Heart_Rate": 72 + i % 30, "SpO2": 97, "timestamp": 1700000000000 + i}
+
+
+def legacy_handler(log_file):
+    """The previous setup: a synchronous FileHandler on the root logger."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    handler = logging.FileHandler(log_file, encoding="utf-8")
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    return handler
+
+
+def log_fstring(i):
+    logging.info(f"📥 Received message from wearable_blood: {message(i)}")
+
+
+def log_lazy(i):
+    logging.info("📥 Received message from %s: %s", "wearable_blood", message(i))
+
+
+def log_counter(i):
+    message(i)
+    count_event("messages consumed")
+
+
+SCENARIOS = {
+    "legacy_sync_fstring": (True, log_fstring),
+    "queued_fstring": (False, log_fstring),
+    "queued_lazy": (False, log_lazy),
+    "queued_counter": (False, log_counter),
+}
+
+
+def run(name, calls, work_dir):
+    """Return caller seconds, drain seconds and lines written for `calls` hot-path log calls."""
+    legacy, fn = SCENARIOS[name]
+    log_file = os.path.join(work_dir, f"{name}.log")
+    if legacy:
+        handler = legacy_handler(log_file)
+    else:
+        setup_logging(log_file=log_file, stream=False, force=True)
+
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if legacy:
+        logging.getLogger().removeHandler(handler)
+        handler.close()
+    else:
+        shutdown_logging()
+    drain_seconds = time.perf_counter() - start
+
+    with open(log_file, encoding="utf-8") as f:
+        lines = sum(1 for _ in f)
+    result = {"stage": name, "calls": calls, "seconds": round(seconds, 4), "us_per_call": round(seconds / calls * 1e6, 2),
+              "drain_seconds": round(drain_seconds, 4), "lines": lines}
+    print(f"{name:>20} calls={calls:<8} {seconds:8.3f}s {result['us_per_call']:8.2f}µs/call drain={drain_seconds:.3f}s lines={lines}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the per-message cost of the old and the queued logging setups.")
+    parser.add_argument("--calls", type=int, default=100000, help="hot-path log calls per scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--output", default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="logging_bench_")
+    try:
+        results = [run(name, args.calls, work_dir) for name in args.scenarios]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "meta": {"date": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(), "platform": platform.platform()},
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.synthetic_data import generate
+
+
+RESULTS_PATH = "benchmarks/results/latest.json"
+BASELINE_PATH = "benchmarks/results/baseline.json"
+
+
+class LastValueModel:
+    """Stub forecaster used when no trained model is available: repeats the last row."""
+
+    def predict(self, x, batch_size=None, verbose=0):
+        return np.asarray(x)[:, -1, :]
+
+
+def measure(fn, memory=True):
+    """Return (seconds, peak MB, result) of `fn`; peak memory comes from a second, traced run."""
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        fn()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return seconds, peak_mb, result
+
+
+def load_model(kind):
+    if kind == "stub":
+        return LastValueModel()
+    if kind == "numpy":
+        from src.numpy_lstm import NumpyLSTMModel
+        return NumpyLSTMModel.load(os.environ["NUMPY_MODEL_PATH"])
+    from tensorflow.keras.models import load_model as load_keras_model
+    return load_keras_model(os.environ["MODEL_PATH"])
+
+
+def run_scale(patients, rows, model_kind, memory, work_dir):
+    from src.data_merging import PatientDataMerger
+    from src.data_preprocessing import DataPreprocessor
+    from src.drift_engine import ReferenceProfile, DriftEngine
+    from src.schema import load_csv
+    from main import PatientHealthMonitor
+
+    kafka_path, lab_path = generate(work_dir, patients, rows)
+    merged_path = os.path.join(work_dir, "merged.csv")
+    encoder_path = os.path.join(work_dir, "encoder.pkl")
+    scaler_path = os.path.join(work_dir, "scaler.pkl")
+    shutil.copy("artifacts/encoder.pkl", encoder_path)
+    shutil.copy("artifacts/scaler.pkl", scaler_path)
+    os.environ.update(MERGED_DATA_PATH=merged_path, ENCODER_PATH=encoder_path, SCALER_PATH=scaler_path)
+
+    results = []
+
+    def record(stage, fn):
+        seconds, peak_mb, result = measure(fn, memory)
+        results.append({"stage": stage, "patients": patients, "rows": rows, "seconds": round(seconds, 4),
+                        "peak_mb": None if peak_mb is None else round(peak_mb, 2)})
+        print(f"{stage:>14} patients={patients:<7} rows={rows:<5} {seconds:9.3f}s" + ("" if peak_mb is None else f" {peak_mb:9.1f} MB"))
+        return result
+
+    merger = PatientDataMerger(kafka_path, lab_path, merged_path, log_file=None)
+    record("merge", merger.merge)
+    record("preprocess", lambda: DataPreprocessor(merged_path, encoder_path, scaler_path).preprocess())
+
+    monitor = PatientHealthMonitor(model=load_model(model_kind))
+    def predict_step():
+        if monitor.prediction_cache is not None:
+            monitor.prediction_cache.clear()
+        return monitor.make_predictions()
+    predictions, _ = record("predict", predict_step)
+    record("predict_cached", monitor.make_predictions)
+    record("forecast", monitor.forecast)
+
+    matrix = np.vstack(list(predictions.values())) if predictions else np.empty((0, len(monitor.all_feature_names)))
+    def alert_step():
+        severity = monitor.alert_engine.evaluate(matrix)
+        return [monitor.alert_engine.alert_messages(row, mask) for row, mask in zip(matrix, severity) if mask.any()]
+    record("alert", alert_step)
+
+    profile = ReferenceProfile.build(load_csv("data/merged_patient_data.csv", "merged"))
+    current = load_csv(merged_path, "merged")
+    def drift_step():
+        engine = DriftEngine(profile)
+        engine.update(current)
+        return engine.scores()
+    record("drift", drift_step)
+
+    return results
+
+
+def compare(results, baseline, tolerance, noise_floor=0.05):
+    """Return the results that are slower than the baseline by more than `tolerance`."""
+    previous = {(r["stage"], r["patients"], r["rows"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        base = previous.get((r["stage"], r["patients"], r["rows"]))
+        if base is None:
+            continue
+        ratio = r["seconds"] / base["seconds"] if base["seconds"] else float("inf")
+        r["baseline_seconds"] = base["seconds"]
+        r["ratio"] = round(ratio, 3)
+        if ratio > 1 + tolerance and r["seconds"] - base["seconds"] > noise_floor:
+            regressions.append(r)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark merge, preprocess, predict, alert and drift stages on synthetic data.")
+    parser.add_argument("--patients", type=int, nargs="+", default=[10, 1000], help="patient counts to benchmark (e.g. 10 1000 100000)")
+    parser.add_argument("--rows", type=int, default=200, help="readings per patient")
+    parser.add_argument("--model", choices=["stub", "numpy", "keras"], default="stub")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced run that measures peak memory")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs. the baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = []
+    for patients in args.patients:
+        work_dir = tempfile.mkdtemp(prefix=f"bench_{patients}_")
+        try:
+            results += run_scale(patients, args.rows, args.model, not args.no_memory, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+    report = {
+        "meta": {"date": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                 "platform": platform.platform(), "model": args.model},
+        "results": results,
+        "regressions": regressions,
+    }
+    for path in [args.output] + ([args.baseline] if args.save_baseline else []):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    for r in regressions:
+        print(f"REGRESSION {r['stage']} patients={r['patients']} rows={r['rows']}: {r['seconds']}s vs {r['baseline_seconds']}s (x{r['ratio']})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import os
+import glob
+import argparse
+import numpy as np
+import pandas as pd
+from src.schema import load_csv, split_blood_pressure, SYSTOLIC_BP, DIASTOLIC_BP
+
+
+READING_INTERVAL_MS = 10 * 60 * 1000
+BASE_TIME = pd.Timestamp("2025-03-01 00:00:00")
+
+
+def load_templates(data_path="data"):
+    """Load the blood/BP/lab CSVs of every data/P* patient as generation templates."""
+    templates = []
+    for folder in sorted(glob.glob(os.path.join(data_path, "P*"))):
+        templates.append({
+            "blood": load_csv(os.path.join(folder, "blood_monitoring.csv"), "blood_monitoring", float_dtype="float64"),
+            "bp": split_blood_pressure(load_csv(os.path.join(folder, "bp_monitoring.csv"), "bp_monitoring", float_dtype="float64"), "float64"),
+            "lab": load_csv(os.path.join(folder, "lab_results.csv"), "lab_results", float_dtype="float64"),
+        })
+    if not templates:
+        raise FileNotFoundError(f"No patient templates found under {data_path}/P*")
+    return templates
+
+
+def _tile_numeric(frames, columns, template_of, offsets, rows, rng, jitter):
+    """Stack `rows` consecutive template rows per patient, with multiplicative jitter."""
+    out = np.empty((len(template_of) * rows, len(columns)), dtype=np.float64)
+    for t, frame in enumerate(frames):
+        patients = np.flatnonzero(template_of == t)
+        if patients.size == 0:
+            continue
+        values = frame[columns].to_numpy(dtype=np.float64)
+        idx = (offsets[patients, None] + np.arange(rows)) % len(values)
+        block = values[idx] * (1 + rng.normal(0, jitter, (patients.size, rows, len(columns))))
+        out.reshape(len(template_of), rows, len(columns))[patients] = block
+    return out
+
+
+def generate(out_dir, patients, rows, data_path="data", seed=0, jitter=0.02):
+    """Write a synthetic Kafka dump and lab reports for `patients` patients with `rows` readings each.
+
+    Returns (kafka_path, lab_path).
+    """
+    rng = np.random.default_rng(seed)
+    templates = load_templates(data_path)
+    kafka_path = os.path.join(out_dir, "kafkaConsumerData")
+    lab_path = os.path.join(out_dir, "lab_reports")
+    os.makedirs(lab_path, exist_ok=True)
+
+    patient_ids = np.array([f"S{k:07d}" for k in range(patients)])
+    template_of = np.arange(patients) % len(templates)
+    offsets = rng.integers(0, min(len(t["blood"]) for t in templates), patients)
+
+    # Readings are 10 minutes apart; timestamps are unique per patient and reading.
+    stamps = BASE_TIME + pd.to_timedelta(np.arange(rows) * READING_INTERVAL_MS, unit="ms")
+    dates = np.tile(stamps.strftime("%d-%m-%Y").to_numpy(), patients)
+    times = np.tile(np.array([f"{t.hour}.{t.minute:02d}.{t.second:02d}" for t in stamps]), patients)
+    timestamp = int(BASE_TIME.timestamp() * 1000) + np.tile(np.arange(rows) * READING_INTERVAL_MS, patients) + np.repeat(np.arange(patients), rows)
+    ids = np.repeat(patient_ids, rows)
+
+    blood_columns = [c for c in templates[0]["blood"].columns if c not in ("Date", "Time", "Patient_ID")]
+    blood = pd.DataFrame(_tile_numeric([t["blood"] for t in templates], blood_columns, template_of, offsets, rows, rng, jitter).round(2), columns=blood_columns)
+    blood.insert(0, "Time", times)
+    blood.insert(0, "Date", dates)
+    blood["Patient_ID"] = ids
+    blood["patient_id"] = ids
+    blood["timestamp"] = timestamp
+
+    bp_columns = [c for c in templates[0]["bp"].columns if c not in ("Date", "Time", "Patient_ID", SYSTOLIC_BP, DIASTOLIC_BP)]
+    bp_values = _tile_numeric([t["bp"] for t in templates], [SYSTOLIC_BP, DIASTOLIC_BP] + bp_columns, template_of, offsets, rows, rng, jitter)
+    bp = pd.DataFrame(bp_values[:, 2:].round(2), columns=bp_columns)
+    pressure = bp_values[:, :2].round().astype(int).astype(str)
+    bp.insert(0, "Blood Pressure", np.char.add(np.char.add(pressure[:, 0], "/"), pressure[:, 1]))
+    bp.insert(0, "Time", times)
+    bp.insert(0, "Date", dates)
+    bp["Patient_ID"] = ids
+    bp["patient_id"] = ids
+    bp["timestamp"] = timestamp
+
+    for topic, df in (("blood_monitoring", blood), ("bp_monitoring", bp)):
+        os.makedirs(os.path.join(kafka_path, topic), exist_ok=True)
+        df.to_csv(os.path.join(kafka_path, topic, f"{topic}.csv"), index=False)
+
+    # Lab reports: the template's lab rows, dated in the days before the first reading.
+    for k, patient_id in enumerate(patient_ids):
+        lab = templates[template_of[k]]["lab"].copy()
+        lab["Date"] = (BASE_TIME - pd.to_timedelta(np.arange(len(lab), 0, -1), unit="D")).strftime("%d-%m-%Y")
+        lab["Patient_ID"] = patient_id
+        lab.to_csv(os.path.join(lab_path, f"{patient_id}.csv"), index=False)
+
+    return kafka_path, lab_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic patient data from the data/P* templates.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--rows", type=int, default=200, help="readings per patient")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate(args.out_dir, args.patients, args.rows, seed=args.seed)
@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.run_benchmarks import load_model
+
+
+RESULTS_PATH = "benchmarks/results/triage_latest.json"
+
+
+class CensusWindows:
+    """Serves cycle `cycle` of a precomputed (N, L, F) scaled census as the monitor's window store."""
+
+    def __init__(self, patient_ids, scaled, window_size):
+        self.patient_ids = patient_ids
+        self.scaled = scaled
+        self.window_size = window_size
+        self.cycle = 0
+
+    def ready_windows(self, patient_ids=None):
+        return self.patient_ids, self.scaled[:, self.cycle:self.cycle + self.window_size]
+
+    def latest_timestamps(self, patient_ids):
+        return np.zeros(len(patient_ids))
+
+
+def synthesize_census(monitor, patients, length, trending, spiking, seed=0):
+    """A mostly stable census in original units, scaled with the monitor's scaler.
+
+    Stable patients sit mid-range with noise of 3% of each range. A `trending` fraction
+    drifts one vital across a bound over the run; a `spiking` fraction jumps one vital
+    out of range at a random reading without warning (the case triage can miss).
+    """
+    rng = np.random.default_rng(seed)
+    engine = monitor.alert_engine
+    bounded = np.isfinite(engine.min_bounds) & np.isfinite(engine.max_bounds)
+    lower, upper = np.where(bounded, engine.min_bounds, 0), np.where(bounded, engine.max_bounds, 0)
+    middle = np.where(bounded, (lower + upper) / 2, monitor.scaler.mean_)
+    width = np.where(bounded, upper - lower, monitor.scaler.scale_)
+    values = middle + rng.normal(0, 0.03, (patients, length, len(middle))) * width
+
+    candidates = np.flatnonzero(bounded)
+    kinds = rng.random(patients)
+    step = np.arange(length)
+    for i in np.flatnonzero(kinds < trending):
+        f = rng.choice(candidates)
+        values[i, :, f] += rng.choice([-1, 1]) * 0.8 * width[f] * step / length
+    for i in np.flatnonzero((kinds >= trending) & (kinds < trending + spiking)):
+        f = rng.choice(candidates)
+        values[i, rng.integers(length // 2, length):, f] += rng.choice([-1, 1]) * 0.6 * width[f]
+
+    scaled = ((values - monitor.scaler.mean_) / monitor.scaler.scale_).astype(np.float32)
+    return np.arange(patients, dtype=np.float64), scaled
+
+
+def run(monitor, census, cycles):
+    """Predict every cycle with full inference and with triage; return rows, seconds and missed alerts."""
+    triage = monitor.triage
+    totals = {"full_rows": 0, "triage_rows": 0, "full_seconds": 0.0, "triage_seconds": 0.0,
+              "alerts": 0, "missed_alerts": 0, "missed_patients": 0}
+
+    for cycle in range(cycles):
+        census.cycle = cycle
+
+        monitor.triage = None
+        start = time.perf_counter()
+        monitor.make_predictions(window_store=census)
+        totals["full_seconds"] += time.perf_counter() - start
+        full = monitor.alert_severity
+        totals["full_rows"] += len(full)
+
+        monitor.triage = triage
+        scheduled = triage.scheduled.value
+        start = time.perf_counter()
+        monitor.make_predictions(window_store=census)
+        totals["triage_seconds"] += time.perf_counter() - start
+        served = monitor.alert_severity
+        totals["triage_rows"] += int(triage.scheduled.value - scheduled)
+
+        for patient_id, severity in full.items():
+            missed = int(np.count_nonzero((severity != 0) & (served[patient_id] != severity)))
+            totals["alerts"] += int(np.count_nonzero(severity))
+            totals["missed_alerts"] += missed
+            totals["missed_patients"] += missed > 0
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full inference with triage-gated inference on a synthetic census.")
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--cycles", type=int, default=36, help="prediction cycles, one new reading per patient each")
+    parser.add_argument("--trending", type=float, default=0.05, help="fraction of patients drifting across a bound")
+    parser.add_argument("--spiking", type=float, default=0.01, help="fraction of patients jumping out of range abruptly")
+    parser.add_argument("--model", choices=["stub", "numpy", "keras"], default="stub")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    os.environ.update(TRIAGE_ENABLED="true", TRIAGE_AUDIT_EVERY="0", PREDICTION_CACHE_SIZE="0", ALERT_SINKS="")
+    for key, value in (("MERGED_DATA_PATH", "artifacts/merged_patient_kafka_data.csv"),
+                       ("ENCODER_PATH", "artifacts/encoder.pkl"), ("SCALER_PATH", "artifacts/scaler.pkl")):
+        os.environ.setdefault(key, value)
+    from main import PatientHealthMonitor
+
+    monitor = PatientHealthMonitor(model=load_model(args.model))
+    patient_ids, scaled = synthesize_census(monitor, args.patients, monitor.sequence_length + args.cycles, args.trending, args.spiking)
+    totals = run(monitor, CensusWindows(patient_ids, scaled, monitor.sequence_length), args.cycles)
+
+    result = {
+        "patients": args.patients, "cycles": args.cycles, "model": args.model, **totals,
+        "compute_reduction": round(totals["full_rows"] / max(totals["triage_rows"], 1), 2),
+        "speedup": round(totals["full_seconds"] / max(totals["triage_seconds"], 1e-9), 2),
+        "miss_rate": round(totals["missed_alerts"] / max(totals["alerts"], 1), 5),
+    }
+    print(f"patients={args.patients} cycles={args.cycles} model rows {totals['full_rows']} -> {totals['triage_rows']} "
+          f"(x{result['compute_reduction']}), {totals['full_seconds']:.3f}s -> {totals['triage_seconds']:.3f}s (x{result['speedup']}), "
+          f"missed {totals['missed_alerts']} of {totals['alerts']} alerts ({result['miss_rate']:.3%}) in {totals['missed_patients']} patient-cycles")
+
+    report = {
+        "meta": {"date": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(), "platform": platform.platform()},
+        "results": [result],
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,76 +1,300 @@
 import os
 import json
 import logging
-import pandas as pd
-from kafka import KafkaConsumer
+import time
+import argparse
+import multiprocessing
+import joblib
 from dotenv import load_dotenv
-from threading import Timer
-from collections import deque
-from datetime import datetime
+from src.data_preprocessing import DataPreprocessor
+from src.window_store import PatientWindowStore, reading_to_features
+from src.segment_store import SegmentWriter, SEGMENT_SCHEMAS
+from src.stream_join import VitalsJoiner
+from src.metrics import REGISTRY
+from src.schema import load_csv, parse_dates, PATIENT_ID, LAB_FEATURES
+from src.transport import create_consumer, ConsumerRebalanceListener
+from logger import setup_logging
 
 load_dotenv()
 
-
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
+LOG_FORMAT = '%(asctime)s - %(process)d - %(levelname)s - %(message)s'
 
 KAFKA_BROKER = os.getenv("KAFKA_BROKER", "localhost:9092")
 TOPICS = ["blood_monitoring", "bp_monitoring"]
+GROUP_ID = "health_monitoring_group"
+SCALER_PATH = os.getenv("SCALER_PATH", "artifacts/scaler.pkl")
+ENCODER_PATH = os.getenv("ENCODER_PATH", "artifacts/encoder.pkl")
+LAB_PATH = os.getenv("LAB_PATH", "data/lab_reports")
+KAFKA_DATA_PATH = os.getenv("KAFKA_DATA_PATH", "artifacts/kafkaConsumerData")
+CONSUMER_STATE_PATH = os.getenv("CONSUMER_STATE_PATH", "artifacts/consumer_state")
+CONSUMER_WORKERS = int(os.getenv("CONSUMER_WORKERS", 1))
+SEGMENT_MAX_ROWS = int(os.getenv("SEGMENT_MAX_ROWS", 5000))
+SEGMENT_MAX_AGE = float(os.getenv("SEGMENT_MAX_AGE", 120))
+COMMIT_INTERVAL = float(os.getenv("COMMIT_INTERVAL", SEGMENT_MAX_AGE))
+POLL_MAX_RECORDS = int(os.getenv("POLL_MAX_RECORDS", 500))
+LIVE_INFERENCE = os.getenv("LIVE_INFERENCE", "false").lower() == "true"
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", 64))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", 20))
+JOIN_LATENESS_MS = int(os.getenv("JOIN_LATENESS_MS", 5000))
+JOIN_MAX_PENDING = int(os.getenv("JOIN_MAX_PENDING", 16))
+METRICS_PORT = os.getenv("METRICS_PORT")
+
+
+def load_latest_lab_values(lab_path):
+    """Return the most recent lab result per patient as {patient_id: {feature: value}}."""
+    latest = {}
+    if not os.path.isdir(lab_path):
+        return latest
+    for file_name in os.listdir(lab_path):
+        if not file_name.endswith(".csv"):
+            continue
+        # Lab Blood Pressure is left out: the wearable BP readings are the live values.
+        lab_df = load_csv(os.path.join(lab_path, file_name), "lab_results", ["Date", PATIENT_ID] + LAB_FEATURES, float_dtype="float64")
+        lab_df["Date"] = parse_dates(lab_df["Date"])
+        row = lab_df.sort_values("Date").iloc[-1]
+        latest[row[PATIENT_ID]] = reading_to_features(row.drop(["Date", PATIENT_ID]).to_dict())
+    return latest
+
+
+class PartitionStateListener(ConsumerRebalanceListener):
+    """Checkpoints a worker's patients before their partitions move and restores them after."""
+
+    def __init__(self, worker):
+        self.worker = worker
+
+    def on_partitions_revoked(self, revoked):
+        self.worker.release({tp.partition for tp in revoked})
+
+    def on_partitions_assigned(self, assigned):
+        self.worker.acquire({tp.partition for tp in assigned})
+
+
+class ConsumerWorker:
+    """One member of the consumer group; owns the patients of its assigned partitions.
+
+    The producer keys messages by patient ID, so with equally partitioned topics the
+    default range assignor gives both halves of a patient's readings to the same worker.
+    Offsets are committed manually and only after a checkpoint: buffered segments are
+    written and the window/join state of the owned patients is saved per partition
+    under `CONSUMER_STATE_PATH`, where the next owner picks it up after a rebalance.
+    Delivery is at-least-once: readings after the last checkpoint are consumed again.
+
+    The window store is keyed by encoded patient IDs, like the batch predictions, so live
+    and batch results for a patient line up; unseen patients are registered in the shared
+    encoder. Partitions, joins and segments keep the raw IDs of the messages.
+    """
+
+    def __init__(self, worker_id=0, workers=1):
+        self.worker_id = worker_id
+        self.segment_writer = SegmentWriter(
+            KAFKA_DATA_PATH,
+            max_rows=SEGMENT_MAX_ROWS,
+            max_age=SEGMENT_MAX_AGE,
+            index_file=f"index-{worker_id}.jsonl",
+        )
+
+        self.artifacts = DataPreprocessor(None, ENCODER_PATH, SCALER_PATH)
+        self.artifacts.load_artifacts()
+        self.lab_values = load_latest_lab_values(LAB_PATH)
+        self.artifacts.register_patients(list(self.lab_values))
+        self.window_store = PatientWindowStore.from_scaler(self.artifacts.scaler)
+        for patient_id, lab_values in self.lab_values.items():
+            self.window_store.set_static_features(self.encode(patient_id), lab_values)
+
+        self.joiner = VitalsJoiner(
+            {topic: [name for name, _ in SEGMENT_SCHEMAS[topic]] for topic in TOPICS},
+            lateness_ms=JOIN_LATENESS_MS,
+            max_pending=JOIN_MAX_PENDING,
+        )
+        self.partition_of = {}
+        self.uncommitted = 0
+        self.last_commit = time.monotonic()
+        os.makedirs(CONSUMER_STATE_PATH, exist_ok=True)
+
+        self.inference_service = None
+        if LIVE_INFERENCE:
+            from main import PatientHealthMonitor
+            from src.inference_service import MicroBatchInferenceService
+            self.inference_service = MicroBatchInferenceService(
+                PatientHealthMonitor(),
+                max_batch_size=INFERENCE_MAX_BATCH,
+                max_wait_ms=INFERENCE_MAX_WAIT_MS,
+            ).start_in_thread()
+
+        # Without a broker (TRANSPORT=memory|mmap), worker k of n statically owns partitions p % n == k.
+        self.consumer = create_consumer(
+            TOPICS,
+            listener=PartitionStateListener(self),
+            member=worker_id,
+            members=workers,
+            bootstrap_servers=KAFKA_BROKER,
+            group_id=GROUP_ID,
+            auto_offset_reset="latest",
+            enable_auto_commit=False,
+            max_poll_records=POLL_MAX_RECORDS,
+            key_deserializer=lambda k: k.decode('utf-8'),
+            value_deserializer=lambda v: json.loads(v.decode('utf-8'))
+        )
+
+    def encode(self, patient_id):
+        """The encoded ID of a raw patient ID, registering patients the encoder has not seen."""
+        code = self.artifacts.id_map.get(patient_id)
+        if code is None:
+            self.artifacts.register_patients([patient_id])
+            code = self.artifacts.id_map[patient_id]
+        return code
+
+    def decode(self, code):
+        return self.artifacts.encoder.classes_[code]
 
+    def state_path(self, partition):
+        return os.path.join(CONSUMER_STATE_PATH, f"partition-{partition}.pkl")
 
-buffers = {
-    "blood_monitoring": deque(maxlen=250),
-    "bp_monitoring": deque(maxlen=250)
-}
+    def patients_of(self, partitions):
+        return [pid for pid, partition in self.partition_of.items() if partition in partitions]
 
+    def save_state(self, partitions):
+        """Write the window and join state of the patients of `partitions`, one file per partition."""
+        for partition in partitions:
+            patient_ids = self.patients_of({partition})
+            state = {
+                "windows": self.window_store.export_state([self.encode(pid) for pid in patient_ids]),
+                "joins": self.joiner.export_state(patient_ids),
+            }
+            path = self.state_path(partition)
+            joblib.dump(state, path + ".tmp")
+            os.replace(path + ".tmp", path)
 
+    def checkpoint(self, partitions=()):
+        """Persist buffered segments and patient state, then commit the consumed offsets.
 
+        `commit()` covers every assigned partition, so the state of all of them (and of
+        `partitions`, e.g. ones being revoked) is saved first; otherwise a crash could
+        lose readings whose offsets were committed before their windows were persisted.
+        """
+        with REGISTRY.span("consumer_checkpoint"):
+            self.segment_writer.flush()
+            self.save_state({tp.partition for tp in self.consumer.assignment()} | set(partitions))
+            self.consumer.commit()
+        logging.info(f"✅ Worker {self.worker_id} committed {self.uncommitted} messages.")
+        self.uncommitted = 0
+        self.last_commit = time.monotonic()
 
-def save_to_csv():
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    def release(self, partitions):
+        """Checkpoint all owned patients and forget those of the revoked partitions."""
+        if not partitions:
+            return
+        self.checkpoint(partitions)
+        patient_ids = self.patients_of(partitions)
+        self.window_store.drop([self.encode(pid) for pid in patient_ids])
+        self.joiner.drop(patient_ids)
+        for patient_id in patient_ids:
+            del self.partition_of[patient_id]
+            # Lab results are static and seeded in every worker; keep them for a later reassignment.
+            if patient_id in self.lab_values:
+                self.window_store.set_static_features(self.encode(patient_id), self.lab_values[patient_id])
+        logging.info(f"↩️ Worker {self.worker_id} released partitions {sorted(partitions)} ({len(patient_ids)} patients).")
 
-    for topic, buffer in buffers.items():
-        if buffer:
-            df = pd.DataFrame(list(buffer))
+    def acquire(self, partitions):
+        """Restore the checkpointed state of newly assigned partitions."""
+        restored = 0
+        for partition in partitions:
+            path = self.state_path(partition)
+            if not os.path.exists(path):
+                continue
+            state = joblib.load(path)
+            self.window_store.restore_state(state["windows"])
+            self.joiner.restore_state(state["joins"])
+            for patient_id in {self.decode(code) for code in state["windows"]} | set(state["joins"]):
+                self.partition_of[patient_id] = partition
+            restored += len(state["windows"])
+        logging.info(f"➡️ Worker {self.worker_id} assigned partitions {sorted(partitions)} ({restored} patients restored).")
 
-            
-            folder_path = os.path.join("artifacts/kafkaConsumerData", topic)
-            os.makedirs(folder_path, exist_ok=True)
+    def handle_vitals(self, records):
+        """Persist joined readings and push them into the live window store."""
+        for record in records:
+            try:
+                self.segment_writer.append("vitals", record)
+            except ValueError as e:
+                logging.error(f"Skipping reading: {e}")
+                continue
+            patient_id = self.encode(record["Patient_ID"])
+            ready = self.window_store.update(patient_id, reading_to_features(record), record.get("timestamp"))
+            if ready and self.inference_service is not None:
+                self.inference_service.submit_threadsafe(patient_id, self.window_store.window(patient_id), record.get("timestamp"))
+        REGISTRY.counter("vitals_joined_total").inc(len(records))
 
-            
-            filename = f"{topic}.csv"
-            filepath = os.path.join(folder_path, filename)
+    def process(self, batches):
+        now = time.time()
+        for tp, messages in batches.items():
+            REGISTRY.counter("messages_total", topic=tp.topic).inc(len(messages))
+            lag = REGISTRY.histogram("ingest_lag_seconds", topic=tp.topic)
+            for msg in messages:
+                data = msg.value
+                if data.get("timestamp"):
+                    lag.observe(now - data["timestamp"] / 1000)
+                self.partition_of[data.get("patient_id") or data.get("Patient_ID")] = tp.partition
+                self.handle_vitals(self.joiner.add(tp.topic, data))
+            self.uncommitted += len(messages)
+        self.handle_vitals(self.joiner.expire())
 
-            df.to_csv(filepath, index=False)
-            logging.info(f"💾 Saved {len(df)} rows to {filepath}")
+    def step(self, timeout_ms=1000):
+        """Poll and process one batch, rolling segments and checkpointing when due; return the polled batches."""
+        batches = self.consumer.poll(timeout_ms=timeout_ms)
+        with REGISTRY.span("consumer_batch"):
+            self.process(batches)
+        self.segment_writer.roll_expired()
+        if self.uncommitted and time.monotonic() - self.last_commit >= COMMIT_INTERVAL:
+            self.checkpoint()
+        return batches
 
-   
-    Timer(120, save_to_csv).start()  # 300 seconds = 5 minutes
+    def close(self):
+        """Flush the pending joins, checkpoint and leave the group."""
+        self.handle_vitals(self.joiner.expire(now_ms=float("inf")))
+        self.checkpoint()
+        if self.inference_service is not None:
+            self.inference_service.stop_thread()
+            self.inference_service.monitor.close()
+        self.consumer.close(autocommit=False)
+        logging.info(f"📴 Consumer worker {self.worker_id} closed.")
 
+    def run(self):
+        try:
+            logging.info(f"🚀 Consumer worker {self.worker_id} started. Listening to topics: {TOPICS}")
+            while True:
+                self.step()
 
-save_to_csv()
+        except KeyboardInterrupt:
+            logging.warning(f"Worker {self.worker_id} stopped by user.")
+        finally:
+            self.close()
 
 
-consumer = KafkaConsumer(
-    *TOPICS,
-    bootstrap_servers=KAFKA_BROKER,
-    group_id="health_monitoring_group",
-    auto_offset_reset="latest",
-    key_deserializer=lambda k: k.decode('utf-8'),
-    value_deserializer=lambda v: json.loads(v.decode('utf-8'))
-)
+def run_worker(worker_id, workers=1):
+    setup_logging(fmt=LOG_FORMAT)
+    if METRICS_PORT:
+        port = int(METRICS_PORT) + worker_id
+        REGISTRY.serve(port)
+        logging.info(f"📊 Worker {worker_id} metrics served on :{port}/metrics")
+    ConsumerWorker(worker_id, workers).run()
 
 
-try:
-    logging.info(f"🚀 Consumer started. Listening to topics: {TOPICS}")
-    for msg in consumer:
-        topic = msg.topic
-        data = msg.value
-        buffers[topic].append(data)
-        logging.info(f"[{topic}] Buffered message from patient {data.get('patient_id')}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consume the wearable topics with a pool of consumer-group workers.")
+    parser.add_argument("--workers", type=int, default=CONSUMER_WORKERS, help="worker processes (use at most the topics' partition count)")
+    args = parser.parse_args()
 
-except KeyboardInterrupt:
-    logging.warning("Stopped by user.")
-finally:
-    consumer.close()
-    logging.info("📴 Consumer closed.")
+    if args.workers == 1:
+        run_worker(0)
+    else:
+        context = multiprocessing.get_context("spawn")
+        workers = [context.Process(target=run_worker, args=(k, args.workers), name=f"consumer-{k}") for k in range(args.workers)]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            # Workers receive the same interrupt and checkpoint before exiting.
+            for worker in workers:
+                worker.join()
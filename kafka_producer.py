@@ -1,87 +1,205 @@
 import os
 import time
 import json
-import pandas as pd
+import argparse
+import numpy as np
 import logging
-from kafka import KafkaProducer
 from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from src.schema import load_csv, parse_dates
+from src.transport import create_producer as create_transport_producer, TRANSPORT
+from logger import setup_logging, count_event
 
 
 load_dotenv()
 
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-
 KAFKA_BROKER = os.getenv("KAFKA_BROKER", "localhost:9092")
 TOPICS = {
     "blood": "blood_monitoring",
     "bp": "bp_monitoring",
 }
 
-producer = KafkaProducer(
-    bootstrap_servers=KAFKA_BROKER,
-    key_serializer=lambda k: k.encode('utf-8'),
-    value_serializer=lambda v: json.dumps(v).encode('utf-8')
-)
-
-
 base_path = 'data'
 
 
-patient_data = {}
-for patient_id in os.listdir(base_path):
-    patient_folder = os.path.join(base_path, patient_id)
-    if os.path.isdir(patient_folder):
-        try:
-            patient_data[patient_id] = {
-                'blood': pd.read_csv(os.path.join(patient_folder, 'blood_monitoring.csv')),
-                'bp': pd.read_csv(os.path.join(patient_folder, 'bp_monitoring.csv')),
-            }
-            logging.info(f"Loaded data for patient: {patient_id}")
-        except Exception as e:
-            logging.error(f"Error loading data for patient {patient_id}: {e}")
-
-
-if not patient_data:
-    logging.error("No patient data found. Exiting.")
-    exit(1)
-
-
-num_rows = len(next(iter(patient_data.values()))['blood'])
-
-
-def stream_patient_data(patient_id, records):
+def create_producer(batch_size=16384, linger_ms=0, compression_type=None, transport=None):
+    # Replay mode hands over pre-serialized bytes; everything else is still JSON-encoded here.
+    return create_transport_producer(
+        transport,
+        bootstrap_servers=KAFKA_BROKER,
+        key_serializer=lambda k: k.encode('utf-8'),
+        value_serializer=lambda v: v if isinstance(v, bytes) else json.dumps(v).encode('utf-8'),
+        batch_size=batch_size,
+        linger_ms=linger_ms,
+        compression_type=compression_type,
+    )
+
+
+def load_patient_data(base_path):
+    patient_data = {}
+    for patient_id in os.listdir(base_path):
+        patient_folder = os.path.join(base_path, patient_id)
+        if os.path.isdir(patient_folder):
+            try:
+                patient_data[patient_id] = {
+                    # float64 keeps the values exactly as recorded when they are re-serialized to JSON.
+                    'blood': load_csv(os.path.join(patient_folder, 'blood_monitoring.csv'), 'blood_monitoring', float_dtype='float64'),
+                    'bp': load_csv(os.path.join(patient_folder, 'bp_monitoring.csv'), 'bp_monitoring', float_dtype='float64'),
+                }
+                logging.info(f"Loaded data for patient: {patient_id}")
+            except Exception as e:
+                logging.error(f"Error loading data for patient {patient_id}: {e}")
+    return patient_data
+
+
+def stream_patient_data(producer, patient_id, records, num_rows):
     for i in range(num_rows):
         try:
             timestamp = int(time.time() * 1000)
 
-            
+
             blood_msg = records['blood'].iloc[i].to_dict()
             blood_msg.update({'patient_id': patient_id, 'timestamp': timestamp})
             producer.send(TOPICS['blood'], key=patient_id, value=blood_msg)
 
-            
+
             bp_msg = records['bp'].iloc[i].to_dict()
             bp_msg.update({'patient_id': patient_id, 'timestamp': timestamp})
             producer.send(TOPICS['bp'], key=patient_id, value=bp_msg)
 
-            logging.info(f"[{patient_id}] Sent row {i}")
-            time.sleep(1) 
+            count_event("rows sent")
+            time.sleep(1)
 
         except Exception as e:
             logging.error(f"[{patient_id}] Error at row {i}: {e}")
 
 
-try:
-    with ThreadPoolExecutor(max_workers=len(patient_data)) as executor:
-        for pid, records in patient_data.items():
-            executor.submit(stream_patient_data, pid, records)
-    producer.flush()
-    logging.info("All patient data streamed.")
+def serialize_frames(df):
+    """Pre-serialize every row of a template frame to JSON bytes, left open after the last field.
+
+    Patient_ID is dropped so the replay can append the (virtual) patient ID and the
+    send timestamp with one bytes concatenation per message.
+    """
+    rows = df.drop(columns=['Patient_ID'], errors='ignore').to_json(orient='records', lines=True)
+    return [line[:-1].encode('utf-8') for line in rows.splitlines()]
+
+
+def reading_interval(df):
+    """Median spacing in seconds between consecutive readings of a template frame."""
+    stamps = parse_dates(df['Date'], df['Time'])
+    deltas = stamps.diff().abs().dt.total_seconds().dropna()
+    deltas = deltas[deltas > 0]
+    return float(deltas.median()) if len(deltas) else 1.0
+
+
+def synthesize_patients(patient_data, virtual_patients):
+    """Assign each virtual patient a template patient and a start row to decorrelate replays."""
+    templates = sorted(patient_data)
+    if not virtual_patients:
+        return [(pid, pid, 0) for pid in templates]
+
+    num_rows = min(len(patient_data[pid][name]) for pid in templates for name in TOPICS)
+    return [
+        (f"V{k:07d}", templates[k % len(templates)], (k * 7919) % num_rows)
+        for k in range(virtual_patients)
+    ]
+
+
+def replay(producer, patient_data, virtual_patients=0, rate=0.0, time_warp=None, loops=1, report_every=5.0, rows=None):
+    """Replay template data as fast as allowed by `rate` (messages/s, 0 = unthrottled).
+
+    Each loop sends `rows` readings per patient (default: all template rows).
+    With `time_warp`, the rate is derived from the recorded reading spacing instead:
+    every patient sends one reading per (recorded interval / time_warp) seconds.
+    Every reading is stamped when it is sent, and each patient's timestamps strictly
+    increase, so no two readings of a patient share the (patient, timestamp) join key.
+    Returns (messages sent, elapsed seconds).
+    """
+    frames = {
+        pid: {name: serialize_frames(records[name]) for name in TOPICS}
+        for pid, records in patient_data.items()
+    }
+    patients = synthesize_patients(patient_data, virtual_patients)
+    suffixes = {vid: (f',"Patient_ID":"{vid}","patient_id":"{vid}","timestamp":').encode('utf-8') for vid, _, _ in patients}
+    num_rows = min(len(rows) for f in frames.values() for rows in f.values())
+    send_rows = min(rows or num_rows, num_rows)
+
+    if time_warp:
+        interval = np.median([reading_interval(records['blood']) for records in patient_data.values()]) / time_warp
+        rate = 2 * len(patients) / interval
+        logging.info(f"Time warp x{time_warp}: one reading per patient every {interval:.3f}s ({rate:.0f} msgs/s)")
+
+    last_timestamps = dict.fromkeys(suffixes, 0)
+    sent = 0
+    start = last_report = time.perf_counter()
+    reported = 0
+    for _ in range(loops):
+        for i in range(send_rows):
+            for vid, template, offset in patients:
+                row = (i + offset) % num_rows
+                timestamp = last_timestamps[vid] = max(int(time.time() * 1000), last_timestamps[vid] + 1)
+                suffix = suffixes[vid] + str(timestamp).encode('utf-8') + b'}'
+                producer.send(TOPICS['blood'], key=vid, value=frames[template]['blood'][row] + suffix)
+                producer.send(TOPICS['bp'], key=vid, value=frames[template]['bp'][row] + suffix)
+                sent += 2
+
+                # Pace against the schedule instead of sleeping per message.
+                if rate and sent % 256 == 0:
+                    ahead = sent / rate - (time.perf_counter() - start)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                logging.info(f"📈 {sent} messages sent, {(sent - reported) / (now - last_report):.0f} msgs/s")
+                last_report, reported = now, sent
 
-except KeyboardInterrupt:
-    logging.warning("Interrupted by user.")
-finally:
-    producer.close()
+    producer.flush()
+    elapsed = time.perf_counter() - start
+    logging.info(f"🏁 Replayed {sent} messages for {len(patients)} patients in {elapsed:.2f}s ({sent / elapsed:.0f} msgs/s)")
+    return sent, elapsed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stream patient wearable data to Kafka.")
+    parser.add_argument("--transport", choices=["kafka", "mmap"], default=TRANSPORT, help="kafka, or mmap for the broker-free file log (TRANSPORT_LOG_PATH)")
+    parser.add_argument("--replay", action="store_true", help="high-throughput replay / load-generation mode")
+    parser.add_argument("--rate", type=float, default=0.0, help="target aggregate messages/s in replay mode (0 = as fast as possible)")
+    parser.add_argument("--time-warp", type=float, default=None, help="replay at the recorded reading cadence sped up by this factor")
+    parser.add_argument("--virtual-patients", type=int, default=0, help="number of virtual patients synthesized from the data/P* templates")
+    parser.add_argument("--loops", type=int, default=1, help="number of passes over the template rows")
+    parser.add_argument("--batch-size", type=int, default=262144, help="producer batch size in bytes for replay mode")
+    parser.add_argument("--linger-ms", type=int, default=20, help="producer linger in ms for replay mode")
+    parser.add_argument("--compression", default=None, help="producer compression type for replay mode (e.g. gzip, lz4)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    setup_logging(fmt='%(asctime)s - %(levelname)s - %(message)s')
+
+    patient_data = load_patient_data(base_path)
+    if not patient_data:
+        logging.error("No patient data found. Exiting.")
+        exit(1)
+
+    if args.replay:
+        producer = create_producer(args.batch_size, args.linger_ms, args.compression, args.transport)
+    else:
+        producer = create_producer(transport=args.transport)
+
+    try:
+        if args.replay:
+            replay(producer, patient_data, args.virtual_patients, args.rate, args.time_warp, args.loops)
+        else:
+            with ThreadPoolExecutor(max_workers=len(patient_data)) as executor:
+                for pid, records in patient_data.items():
+                    executor.submit(stream_patient_data, producer, pid, records, min(len(records['blood']), len(records['bp'])))
+            producer.flush()
+            logging.info("All patient data streamed.")
+
+    except KeyboardInterrupt:
+        logging.warning("Interrupted by user.")
+    finally:
+        producer.close()
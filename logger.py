@@ -1,18 +1,215 @@
-import logging
 import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from collections import Counter
 from datetime import datetime
-import os
+from logging.handlers import QueueHandler, QueueListener
 
+LOG_DIR = os.getenv("LOG_DIR", os.path.join(os.getcwd(), "logs"))
 LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
+LOG_FILE_PATH = os.path.join(LOG_DIR, LOG_FILE)
+LOG_FORMAT = "[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s"
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Records per second (after a burst) that one call site may log below ERROR; 0 disables the limit.
+LOG_RATE_LIMIT = float(os.getenv("LOG_RATE_LIMIT", 20))
+LOG_RATE_BURST = int(os.getenv("LOG_RATE_BURST", 100))
+LOG_SUMMARY_INTERVAL = float(os.getenv("LOG_SUMMARY_INTERVAL", 30))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+# Records of this logger (clinical alerts) are never rate-limited or dropped.
+ALERT_LOGGER = "alerts"
+
+
+def is_exempt(record):
+    """ERROR and above, alert records and records logged with extra={"ratelimit": False} are always written."""
+    return record.levelno >= logging.ERROR or record.name == ALERT_LOGGER or getattr(record, "ratelimit", True) is False
+
+
+class CallSiteRateLimiter(logging.Filter):
+    """Token bucket per call site (file and line) for records that are not `is_exempt`.
+
+    A site may log `burst` records at once and `rate` per second after that. Records
+    over the limit are dropped before their message is formatted and counted per site
+    for the periodic summary.
+    """
+
+    def __init__(self, rate=LOG_RATE_LIMIT, burst=LOG_RATE_BURST):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.suppressed = Counter()
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if not self.rate or is_exempt(record):
+            return True
+        site = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.get(site, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            self.buckets[site] = (tokens - allowed, now)
+            if not allowed:
+                self.suppressed[site] += 1
+        return allowed
+
+    def drain(self):
+        """Return and reset the suppressed record counts per site."""
+        with self.lock:
+            suppressed, self.suppressed = self.suppressed, Counter()
+        return suppressed
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Hands records to the writer thread; drops (and counts) them instead of blocking when it falls behind.
+
+    Exempt records (errors and alerts) wait for room instead of being dropped.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # QueueHandler.prepare formats the message and traceback on the caller's thread;
+        # the record is queued as it is and the writer's handlers format it instead.
+        return record
+
+    def enqueue(self, record):
+        if is_exempt(record):
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """Waits for room for the stop sentinel, so stopping never loses queued records."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class LogSummary:
+    """Aggregated event counters written as one log line every `interval` seconds, in place of per-event lines."""
+
+    def __init__(self, interval=LOG_SUMMARY_INTERVAL):
+        self.interval = interval
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.limiter = None
+        self.handler = None
+        self.started = time.monotonic()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def inc(self, name, amount=1):
+        with self.lock:
+            self.counts[name] += amount
+
+    def start(self, limiter, handler):
+        self.limiter, self.handler = limiter, handler
+        self.started = time.monotonic()
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="log-summary", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+            self.report()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.report()
+
+    def report(self):
+        now = time.monotonic()
+        elapsed, self.started = max(now - self.started, 1e-9), now
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+        parts = [f"{name}={count:g} ({count / elapsed:.1f}/s)" for name, count in sorted(counts.items())]
+        if self.limiter is not None:
+            parts += [f"suppressed {os.path.basename(path)}:{line}={count}" for (path, line), count in sorted(self.limiter.drain().items())]
+        if self.handler is not None and self.handler.dropped:
+            parts.append(f"dropped (queue full)={self.handler.dropped}")
+            self.handler.dropped = 0
+        if parts:
+            logging.getLogger("logger").info(f"📊 Last {elapsed:.0f}s: " + "; ".join(parts))
+
+
+SUMMARY = LogSummary()
+_listener = None
+_queue_handler = None
+
+
+def count_event(name, amount=1):
+    """Count a high-frequency event for the periodic summary instead of logging it."""
+    SUMMARY.inc(name, amount)
+
+
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, log_file=None, stream=True, file_mode="a", force=False):
+    """Send all records through a bounded queue to one background writer thread.
+
+    The caller only pays for the rate-limit check and the enqueue; formatting and file
+    or stream writes happen on the writer. `log_file` adds a file handler (its directory
+    is created), `stream` a stderr handler (or the given stream). Like `basicConfig`,
+    this does nothing when the root logger already has handlers, unless `force`.
+    """
+    global _listener, _queue_handler
+    root = logging.getLogger()
+    if root.handlers and not force:
+        return _listener
+    shutdown_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+    handlers = []
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        handlers.append(logging.FileHandler(log_file, mode=file_mode, encoding="utf-8"))
+    if stream:
+        handlers.append(logging.StreamHandler(None if stream is True else stream))
+    formatter = logging.Formatter(fmt)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    limiter = CallSiteRateLimiter()
+    _queue_handler = DroppingQueueHandler(log_queue)
+    _queue_handler.addFilter(limiter)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    _listener = DrainingQueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    SUMMARY.start(limiter, _queue_handler)
+    return _listener
 
-logs_path = os.path.join(os.getcwd(), "logs", LOG_FILE)
 
-os.makedirs(logs_path, exist_ok=True)
+def shutdown_logging():
+    """Write the final summary and every queued record, then stop the writer thread."""
+    global _listener, _queue_handler
+    SUMMARY.stop()
+    if _queue_handler is not None:
+        # Later records fall back to logging's last-resort stderr handler instead of a dead queue.
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
 
-LOG_FILE_PATH = os.path.join(logs_path, LOG_FILE)
 
-logging.basicConfig(
-    filename=LOG_FILE_PATH,
-    format="[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
\ No newline at end of file
+atexit.register(shutdown_logging)
@@ -1,47 +1,84 @@
 import os
+import math
+import hashlib
+import threading
 import pandas as pd
 import numpy as np
 import joblib
 import streamlit as st
-from logger import logging
-from tensorflow.keras.models import load_model
+from logger import logging, setup_logging, LOG_FILE_PATH
 import time
 from dotenv import load_dotenv
 from src.data_preprocessing import DataPreprocessor
+from src.alert_engine import ThresholdAlertEngine
+from src.alert_dispatch import AlertDispatcher, build_sinks
+from src.feature_store import FeatureStore
+from src.prediction_cache import PredictionCache
+from src.forecasting import MultiHorizonForecaster
+from src.triage import StreamingTriage
+from src.metrics import REGISTRY
 
 
 load_dotenv()
 
 
-
 class PatientHealthMonitor:
-    def __init__(self):
-        """Initialize paths, load models, and preprocess data."""
+    def __init__(self, model=None):
+        """Initialize paths, load models, and preprocess data.
+
+        `model` replaces the configured model (e.g. a stub for benchmarks).
+        """
         logging.info("Initializing PatientHealthMonitor...")
 
         self.merged_data_path = os.getenv("MERGED_DATA_PATH")
         self.encoder_path = os.getenv("ENCODER_PATH")
         self.scaler_path = os.getenv("SCALER_PATH")
         self.model_path = os.getenv("MODEL_PATH")
+        self.inference_backend = os.getenv("INFERENCE_BACKEND", "keras")
+        self.numpy_model_path = os.getenv("NUMPY_MODEL_PATH")
+        self.sequence_length = int(os.getenv("SEQUENCE_LENGTH", 30))
+        self.batch_size = int(os.getenv("PREDICT_BATCH_SIZE", 256))
+        self.feature_store_path = os.getenv("FEATURE_STORE_PATH")
+        self.prediction_cache_size = int(os.getenv("PREDICTION_CACHE_SIZE", 10000))
+        self.prediction_cache_ttl = float(os.getenv("PREDICTION_CACHE_TTL", 600))
+        self.dashboard_refresh_seconds = float(os.getenv("DASHBOARD_REFRESH_SECONDS", 600))
+        self.forecast_horizon = int(os.getenv("FORECAST_HORIZON_STEPS", 6))
+        self.reading_interval_minutes = float(os.getenv("READING_INTERVAL_MINUTES", 10))
+        self.alert_sinks = os.getenv("ALERT_SINKS", "log")
+        self.alert_file_path = os.getenv("ALERT_FILE_PATH", "artifacts/alerts.jsonl")
+        self.alert_cooldown = float(os.getenv("ALERT_COOLDOWN_SECONDS", 900))
+        self.alert_hysteresis = float(os.getenv("ALERT_HYSTERESIS", 0.05))
+        self.alert_queue_size = int(os.getenv("ALERT_QUEUE_SIZE", 1000))
+        self.triage_enabled = os.getenv("TRIAGE_ENABLED", "false").lower() == "true"
+        self.triage_stable_every = int(os.getenv("TRIAGE_STABLE_EVERY", 6))
+        self.triage_audit_every = int(os.getenv("TRIAGE_AUDIT_EVERY", 12))
+        self.triage_alpha = float(os.getenv("TRIAGE_ALPHA", 0.2))
+        self.refresh_lock = threading.Lock()
+        self.data_mtime = None
+        self.feature_store = None
+        self.df_scaled = None
 
         try:
-            preprocessor = DataPreprocessor(self.merged_data_path, self.encoder_path, self.scaler_path)
-            self.df_scaled = preprocessor.preprocess()
-            logging.info("Data preprocessing completed successfully.")
-
-            self.model = load_model(self.model_path)
-            logging.info("Model loaded successfully.")
-
-            self.encoder = joblib.load(self.encoder_path)
-            self.scaler = joblib.load(self.scaler_path)
+            if self.feature_store_path and FeatureStore.exists(self.feature_store_path):
+                # The store already holds the scaled histories: no CSV parsing at startup.
+                self.feature_store = FeatureStore(self.feature_store_path, readonly=True)
+                self.encoder = joblib.load(self.encoder_path)
+                self.scaler = joblib.load(self.scaler_path)
+                self.all_feature_names = self.feature_store.feature_names
+                logging.info(f"Opened feature store at {self.feature_store_path} ({len(self.feature_store.patient_ids)} patients).")
+            else:
+                self.load_merged_data()
+                self.all_feature_names = list(self.df_scaled.columns[1:])  # Exclude 'Patient_ID'
+            self.patient_names = dict(enumerate(self.encoder.classes_))
             logging.info("Encoder and Scaler loaded successfully.")
 
+            self.model = model if model is not None else self.load_inference_model()
+            logging.info(f"Model loaded successfully ({self.inference_backend} backend).")
+
         except Exception as e:
             logging.error(f"Error during initialization: {str(e)}")
             raise e  # Stop execution if model loading fails
 
-        self.all_feature_names = list(self.df_scaled.columns[1:])  # Exclude 'Patient_ID'
-
         self.critical_thresholds = {
             "Blood Glucose Level (mg/dL)": (70, 140),
             "Blood Oxygen (SpO₂)": (90, 100),
@@ -64,86 +101,369 @@ class PatientHealthMonitor:
             "Systolic_BP": (90, 140),
             "Diastolic_BP": (60, 90),
         }
-
-    def make_predictions(self):
-        """Generate predictions for each patient and detect critical alerts."""
+        self.alert_engine = ThresholdAlertEngine(self.critical_thresholds, self.all_feature_names)
+        self.alert_severity = {}
+        # Alerts leave through a background dispatcher, so slow sinks never hold up inference.
+        self.alert_dispatcher = AlertDispatcher(
+            self.alert_engine,
+            build_sinks(self.alert_sinks, self.alert_file_path),
+            cooldown=self.alert_cooldown,
+            hysteresis=self.alert_hysteresis,
+            max_queue=self.alert_queue_size,
+        ).start()
+        self.forecaster = MultiHorizonForecaster(self.model, self.all_feature_names, batch_size=self.batch_size)
+
+        # With triage, stable patients keep their last (prediction, alerts, severity) between forward passes.
+        self.triage = None
+        self.served = {}
+        if self.triage_enabled:
+            self.triage = StreamingTriage.from_scaler(self.alert_engine, self.scaler, alpha=self.triage_alpha, stable_every=self.triage_stable_every)
+
+        self.prediction_cache = None
+        if self.prediction_cache_size > 0:
+            self.prediction_cache = PredictionCache(self.artifact_version(model is not None), self.prediction_cache_size, self.prediction_cache_ttl)
+
+    def close(self):
+        """Deliver the alerts still queued, then stop the dispatcher thread."""
+        self.alert_dispatcher.stop()
+
+    def load_inference_model(self):
+        """Load the forecasting model with the configured backend.
+
+        The "numpy" backend runs the weights exported by `src.numpy_lstm` and never imports TensorFlow.
+        """
+        if self.inference_backend == "numpy":
+            from src.numpy_lstm import NumpyLSTMModel
+            return NumpyLSTMModel.load(self.numpy_model_path)
+
+        from tensorflow.keras.models import load_model
+        return load_model(self.model_path)
+
+    def load_merged_data(self):
+        """Preprocess the merged CSV, reusing the artifacts the preprocessor applied (and possibly extended with new patients)."""
+        self.data_mtime = os.path.getmtime(self.merged_data_path)
+        preprocessor = DataPreprocessor(self.merged_data_path, self.encoder_path, self.scaler_path)
+        self.df_scaled = preprocessor.preprocess()
+        self.encoder = preprocessor.encoder
+        self.scaler = preprocessor.scaler
+        logging.info("Data preprocessing completed successfully.")
+
+    def refresh_data(self):
+        """Pick up new data: re-read the feature store index, or re-preprocess the merged CSV if it changed."""
+        if self.feature_store is not None:
+            self.feature_store.refresh()
+        elif os.path.getmtime(self.merged_data_path) != self.data_mtime:
+            self.load_merged_data()
+            self.patient_names = dict(enumerate(self.encoder.classes_))
+
+    def decode_patient_id(self, patient_id):
+        """Map an encoded patient ID back to its original ID, reloading the encoder for patients added since startup."""
+        name = self.patient_names.get(int(patient_id))
+        if name is None:
+            self.encoder = joblib.load(self.encoder_path)
+            self.patient_names = dict(enumerate(self.encoder.classes_))
+            name = self.patient_names.get(int(patient_id), str(patient_id))
+        return name
+
+    def artifact_version(self, injected_model=False):
+        """Identify the loaded model and scaler, so cached predictions never outlive them."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.scaler.mean_.tobytes())
+        digest.update(self.scaler.scale_.tobytes())
+        model_path = self.numpy_model_path if self.inference_backend == "numpy" else self.model_path
+        if injected_model:
+            digest.update(f"{type(self.model).__name__}:{id(self.model)}".encode())
+        elif model_path and os.path.exists(model_path):
+            digest.update(f"{model_path}:{os.path.getmtime(model_path)}".encode())
+        return digest.hexdigest()
+
+    def build_windows(self, patient_ids=None):
+        """Collect the last `sequence_length` scaled rows of every patient (or of `patient_ids`) into one (N, T, F) tensor."""
+        if self.feature_store is not None:
+            return self.feature_store.windows(self.sequence_length, patient_ids)
+
+        ids = self.df_scaled['Patient_ID'].to_numpy()
+        values = self.df_scaled.iloc[:, 1:].to_numpy(dtype=np.float32)
+
+        # One stable sort groups each patient's rows together while keeping their time order.
+        order = np.argsort(ids, kind="stable")
+        unique_ids, starts, counts = np.unique(ids[order], return_index=True, return_counts=True)
+        if patient_ids is not None:
+            wanted = np.isin(unique_ids, np.asarray(list(patient_ids), dtype=unique_ids.dtype))
+            unique_ids, starts, counts = unique_ids[wanted], starts[wanted], counts[wanted]
+
+        ready = counts >= self.sequence_length
+        if not ready.all():
+            logging.warning(f"{(~ready).sum()} patients have insufficient data (<{self.sequence_length} readings), skipping: {unique_ids[~ready][:10].tolist()}")
+
+        ends = starts[ready] + counts[ready]
+        rows = order[ends[:, None] - self.sequence_length + np.arange(self.sequence_length)]
+        return unique_ids[ready], values[rows]
+
+    def make_predictions(self, window_store=None, patient_ids=None):
+        """Generate predictions for each patient and detect critical alerts.
+
+        Windows come from the preprocessed batch data unless a live `PatientWindowStore`
+        is given, in which case its ready windows (optionally only `patient_ids`) are used.
+        """
         logging.info("Generating predictions...")
-        predictions = {}
-        alerts = {}
-
-        for patient_id in self.df_scaled['Patient_ID'].unique():
-            patient_data = self.df_scaled[self.df_scaled['Patient_ID'] == patient_id].iloc[:, 1:].values  
-
-            if len(patient_data) < 30:
-                logging.warning(f"Patient {patient_id} has insufficient data (<30 readings), skipping...")
-                continue  
+        if window_store is not None:
+            patient_ids, windows = window_store.ready_windows(patient_ids)
+        else:
+            patient_ids, windows = self.build_windows()
 
-            last_sequence = patient_data[-30:].reshape(1, 30, -1)
-            next_row_prediction = self.model.predict(last_sequence)
+        if self.triage is not None:
+            predictions, alerts, self.alert_severity = self.triage_predictions(patient_ids, windows)
+        else:
+            predictions, alerts, self.alert_severity = self.predict_windows(patient_ids, windows)
 
-            if next_row_prediction.shape[1] != self.scaler.scale_.shape[0]:
-                logging.warning(f"Feature mismatch for patient {patient_id}, skipping...")
-                continue  
-
-            next_row_original = self.scaler.inverse_transform(next_row_prediction)
-            predictions[patient_id] = np.round(next_row_original, 2)
-
-            alert_messages = []
-            for i, feature in enumerate(self.all_feature_names):
-                if feature in self.critical_thresholds:
-                    min_val, max_val = self.critical_thresholds[feature]
-                    feature_value = predictions[patient_id][0, i]
-                    if feature_value < min_val or feature_value > max_val:
-                        alert_msg = f"⚠️ {feature} is out of range: {feature_value:.2f}"
-                        alert_messages.append(alert_msg)
-                        logging.warning(f"ALERT for Patient {patient_id}: {alert_msg}")
-
-            if alert_messages:
-                alerts[patient_id] = alert_messages
+        if window_store is not None and predictions:
+            alerting = np.array([patient_id in alerts for patient_id in patient_ids])
+            self.observe_reading_latency(window_store.latest_timestamps(patient_ids), alerting)
 
         return predictions, alerts
 
-    def highlight_abnormal_values(self, val, feature_name):
-        """Highlight values that are outside the normal range."""
-        if feature_name in self.critical_thresholds:
-            min_val, max_val = self.critical_thresholds[feature_name]
-            if val < min_val or val > max_val:
-                return "background-color: red; color: white;"  # Highlight in red
-        return ""
+    def predict_windows(self, patient_ids, windows):
+        """Run one batched forward pass over (N, T, F) scaled windows and evaluate the alert thresholds.
+
+        Returns (predictions, alerts, severity), each keyed by patient ID. It can run on a
+        worker thread next to the dashboard: it reads the model, scaler and alert engine
+        without changing them, and the state it does touch is thread-safe. The prediction
+        cache guards its entries with a lock, the alert dispatcher only enqueues onto a
+        `queue.Queue`, and the metrics registry locks every update. The model itself is not
+        assumed to be thread-safe, so concurrent callers (e.g. the inference service's
+        single worker) must not run it in parallel.
+        """
+        predictions, alerts, severity_by_patient = {}, {}, {}
+        if len(patient_ids) == 0:
+            return predictions, alerts, severity_by_patient
+
+        # Patients whose window is unchanged since their last prediction are served from the cache.
+        next_rows_original = np.empty((len(patient_ids), len(self.all_feature_names)))
+        missing = np.ones(len(patient_ids), dtype=bool)
+        if self.prediction_cache is not None:
+            fingerprints = [self.prediction_cache.fingerprint(window) for window in windows]
+            for i, (patient_id, fingerprint) in enumerate(zip(patient_ids, fingerprints)):
+                cached = self.prediction_cache.get(patient_id, fingerprint)
+                if cached is not None:
+                    next_rows_original[i] = cached
+                    missing[i] = False
+
+        if missing.any():
+            with REGISTRY.span("inference"):
+                next_rows = self.model.predict(windows[missing], batch_size=self.batch_size, verbose=0)
+            REGISTRY.counter("predictions_total").inc(int(missing.sum()))
+
+            if next_rows.shape[1] != self.scaler.scale_.shape[0]:
+                logging.warning(f"Feature mismatch for {len(patient_ids)} patients ({next_rows.shape[1]} predicted vs {self.scaler.scale_.shape[0]} scaled features), skipping...")
+                return predictions, alerts, severity_by_patient
+
+            next_rows_original[missing] = np.round(self.scaler.inverse_transform(next_rows), 2)
+            if self.prediction_cache is not None:
+                for i in np.flatnonzero(missing):
+                    self.prediction_cache.put(patient_ids[i], fingerprints[i], next_rows_original[i].copy())
+
+        with REGISTRY.span("alert_evaluation"):
+            severity = self.alert_engine.evaluate(next_rows_original)
+            self.alert_dispatcher.submit(patient_ids, next_rows_original, severity)
+
+            for patient_id, next_row, row_severity in zip(patient_ids, next_rows_original, severity):
+                predictions[patient_id] = next_row.reshape(1, -1)
+                severity_by_patient[patient_id] = row_severity.reshape(1, -1)
+
+                if row_severity.any():
+                    alerts[patient_id] = self.alert_engine.alert_messages(next_row, row_severity)
+        REGISTRY.counter("alerts_total").inc(len(alerts))
+
+        return predictions, alerts, severity_by_patient
+
+    def triage_predictions(self, patient_ids, windows):
+        """Run the model only on the patients the triage schedules; the others keep their last served results.
+
+        Every `TRIAGE_AUDIT_EVERY` cycles all patients are inferred, and the alerts that the
+        skipped patients' carried-over results lacked are counted as triage misses.
+        """
+        patient_ids = np.asarray(patient_ids)
+        due = self.triage.schedule(patient_ids, windows)
+        audit = self.triage_audit_every > 0 and self.triage.cycle % self.triage_audit_every == 0
+        infer = np.ones_like(due) if audit else due
+        predictions, alerts, severity_by_patient = self.predict_windows(patient_ids[infer], windows[infer])
+
+        if audit:
+            self.record_triage_misses(patient_ids[~due], severity_by_patient)
+        for patient_id in predictions:
+            self.served[patient_id] = (predictions[patient_id], alerts.get(patient_id), severity_by_patient[patient_id])
+        for patient_id in patient_ids[~infer]:
+            served = self.served.get(patient_id)
+            if served is None:
+                continue
+            predictions[patient_id], severity_by_patient[patient_id] = served[0], served[2]
+            if served[1]:
+                alerts[patient_id] = served[1]
+        return predictions, alerts, severity_by_patient
+
+    def record_triage_misses(self, skipped_ids, severity_by_patient):
+        """Count the alert cells of a full pass that the skipped patients' carried-over results did not show."""
+        total = sum(int(np.count_nonzero(severity)) for severity in severity_by_patient.values())
+        missed = 0
+        for patient_id in skipped_ids:
+            served = self.served.get(patient_id)
+            severity = severity_by_patient.get(patient_id)
+            if served is not None and severity is not None:
+                missed += int(np.count_nonzero((severity != 0) & (severity != served[2])))
+        REGISTRY.counter("triage_audited_alerts_total").inc(total)
+        REGISTRY.counter("triage_missed_alerts_total").inc(missed)
+        logging.info(f"🩺 Triage audit: {len(skipped_ids)} of {len(severity_by_patient)} patients would have been skipped, "
+                     f"missing {missed} of {total} alerts ({missed / max(total, 1):.2%}).")
+
+    def forecast(self, horizon=None, window_store=None, patient_ids=None):
+        """Forecast `horizon` readings ahead (default `FORECAST_HORIZON_STEPS`) and check every step against the thresholds.
+
+        Returns (forecasts, alerts, severity) keyed by patient ID: (H, F) forecasts in original
+        units, one message per out-of-range cell tagged with its lead time, and the (H, F) severity mask.
+        """
+        horizon = horizon or self.forecast_horizon
+        if window_store is not None:
+            patient_ids, windows = window_store.ready_windows(patient_ids)
+        else:
+            patient_ids, windows = self.build_windows(patient_ids)
+
+        forecasts, alerts, severity_by_patient = {}, {}, {}
+        if len(patient_ids) == 0:
+            return forecasts, alerts, severity_by_patient
+
+        scaled = self.forecaster.forecast(windows, horizon)
+        features = scaled.shape[2]
+        values = np.round(self.scaler.inverse_transform(scaled.reshape(-1, features)), 2).reshape(-1, horizon, features)
+
+        with REGISTRY.span("alert_evaluation"):
+            severity = self.alert_engine.evaluate(values)
+            for patient_id, rows, row_severity in zip(patient_ids, values, severity):
+                forecasts[patient_id] = rows
+                severity_by_patient[patient_id] = row_severity
+                messages = [
+                    f"+{(step + 1) * self.reading_interval_minutes:g} min: {message}"
+                    for step in np.flatnonzero(row_severity.any(axis=1))
+                    for message in self.alert_engine.alert_messages(rows[step], row_severity[step])
+                ]
+                if messages:
+                    alerts[patient_id] = messages
+        REGISTRY.counter("forecast_alerts_total").inc(len(alerts))
+        logging.info(f"Forecast {horizon} steps for {len(patient_ids)} patients; {len(alerts)} cross a threshold.")
+
+        return forecasts, alerts, severity_by_patient
+
+    def observe_reading_latency(self, timestamps, alerting):
+        """Record producer-timestamp-to-prediction (and -alert) latency from epoch-ms reading timestamps."""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        known = timestamps > 0
+        lag = time.time() - timestamps / 1000
+        for seconds in lag[known]:
+            REGISTRY.histogram("reading_to_prediction_seconds").observe(seconds)
+        for seconds in lag[known & alerting]:
+            REGISTRY.histogram("reading_to_alert_seconds").observe(seconds)
+
+    def refresh_predictions(self):
+        """Reload changed data and predict; the prediction cache limits inference to patients with new windows.
+
+        Returns (predictions, alerts, severity). Serialized, as the monitor is shared by all dashboard sessions.
+        """
+        with self.refresh_lock:
+            self.refresh_data()
+            predictions, alerts = self.make_predictions()
+            return predictions, alerts, self.alert_severity
+
+    def highlight_abnormal_values(self, severity, index):
+        """Return the cell styles that highlight out-of-range predictions of a (patients, F) severity mask."""
+        styles = self.alert_engine.highlight_styles(severity)
+        return pd.DataFrame(styles, index=index, columns=self.all_feature_names)
+
+    def select_patients(self, predictions, alerts, search="", view="Alerting first"):
+        """Order (and filter) the patients to list: by search text and alerting state, then by ID."""
+        names = {patient_id: str(self.decode_patient_id(patient_id)) for patient_id in predictions}
+        patient_ids = [pid for pid in predictions if search.lower() in names[pid].lower()]
+        if view == "Alerting only":
+            patient_ids = [pid for pid in patient_ids if pid in alerts]
+        if view == "Alerting first":
+            patient_ids.sort(key=lambda pid: (pid not in alerts, names[pid]))
+        else:
+            patient_ids.sort(key=lambda pid: names[pid])
+        return patient_ids, names
 
     def run_dashboard(self):
-        """Run the Streamlit dashboard."""
-        
+        """Run the Streamlit dashboard.
+
+        The patient table is a fragment that refreshes itself every `DASHBOARD_REFRESH_SECONDS`
+        without rerunning the page; only patients with new readings are re-inferred.
+        """
         logging.info("Starting Streamlit dashboard...")
         st.set_page_config(page_title="Early Health Monitoring", layout="wide")
         st.title("🏥 Early Health Monitoring Dashboard")
 
-        predictions, alerts = self.make_predictions()
-
-        for patient_id, pred_values in predictions.items():
-            decoded_patient_id = self.encoder.inverse_transform([int(patient_id)])[0]
-
-            st.subheader(f"🔮 Predicted Readings for Patient {decoded_patient_id}")
-
-            pred_df = pd.DataFrame(pred_values, columns=self.all_feature_names)
-            styled_pred_df = pred_df.style.apply(lambda col: col.apply(self.highlight_abnormal_values, args=(col.name,)), axis=0)
-
+        with st.sidebar:
+            search = st.text_input("🔍 Search patient ID")
+            view = st.radio("Patients", ["Alerting first", "Alerting only", "All"])
+            page_size = st.selectbox("Patients per page", [25, 50, 100, 250], index=1)
+            horizon = st.selectbox(
+                "Forecast ahead", range(self.forecast_horizon + 1),
+                format_func=lambda steps: f"{steps * self.reading_interval_minutes:g} min" if steps else "Off",
+            )
+
+        @st.fragment(run_every=self.dashboard_refresh_seconds)
+        def patient_table():
+            predictions, alerts, severity = self.refresh_predictions()
+            patient_ids, names = self.select_patients(predictions, alerts, search, view)
+            st.caption(f"🚨 {len(alerts)} of {len(predictions)} patients alerting")
+            if not patient_ids:
+                st.info("No patients match.")
+                return
+
+            pages = math.ceil(len(patient_ids) / page_size)
+            if st.session_state.get("page", 1) > pages:
+                st.session_state["page"] = pages
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key="page")
+            page_ids = patient_ids[(page - 1) * page_size:page * page_size]
+
+            # One styled table per page instead of one per patient.
+            index = [names[pid] for pid in page_ids]
+            pred_df = pd.DataFrame(np.vstack([predictions[pid] for pid in page_ids]), index=index, columns=self.all_feature_names)
+            page_severity = np.vstack([severity[pid] for pid in page_ids])
+            styled_pred_df = pred_df.style.apply(lambda _: self.highlight_abnormal_values(page_severity, index), axis=None)
+            st.subheader("🔮 Predicted Readings")
             st.dataframe(styled_pred_df.format(precision=2))
 
-            if patient_id in alerts:
-                st.error("⚠️ **Critical Alerts Detected!**")
-                for alert in alerts[patient_id]:
-                    st.write(alert)
+            for patient_id in page_ids:
+                if patient_id in alerts:
+                    with st.expander(f"⚠️ Critical alerts for Patient {names[patient_id]}"):
+                        for alert in alerts[patient_id]:
+                            st.write(alert)
+
+            if horizon:
+                # Only the page's patients are rolled forward: `horizon` batched passes over at most `page_size` windows.
+                forecasts, forecast_alerts, forecast_severity = self.forecast(horizon, patient_ids=page_ids)
+                st.subheader(f"⏳ Forecast ({horizon * self.reading_interval_minutes:g} min ahead)")
+                st.caption(f"{len(forecast_alerts)} of {len(forecasts)} patients on this page cross a threshold within the horizon")
+                lead_times = [f"+{(step + 1) * self.reading_interval_minutes:g} min" for step in range(horizon)]
+                for patient_id in page_ids:
+                    if patient_id in forecast_alerts:
+                        with st.expander(f"⏳ Forecast alerts for Patient {names[patient_id]}"):
+                            forecast_df = pd.DataFrame(forecasts[patient_id], index=lead_times, columns=self.all_feature_names)
+                            mask = forecast_severity[patient_id]
+                            st.dataframe(forecast_df.style.apply(lambda _, mask=mask: self.highlight_abnormal_values(mask, lead_times), axis=None).format(precision=2))
+                            for alert in forecast_alerts[patient_id]:
+                                st.write(alert)
+
+        patient_table()
+        logging.info("Dashboard rendered successfully.")
 
-            st.write("---")  
 
-        logging.info("Dashboard rendered successfully.")
-        # time.sleep(600)  
-        # st.experimental_rerun()
+@st.cache_resource(show_spinner="Loading model and patient data...")
+def load_monitor():
+    """One monitor (model, artifacts and preprocessed data) shared by every rerun and session."""
+    return PatientHealthMonitor()
 
 
 if __name__ == "__main__":
-    monitor = PatientHealthMonitor()
-    monitor.run_dashboard()
-    # time.sleep(600)  
-    # st.rerun()
+    # Streamlit reruns this block on every interaction; after the first run it is a no-op.
+    setup_logging(log_file=LOG_FILE_PATH, stream=False)
+    load_monitor().run_dashboard()
@@ -0,0 +1,196 @@
+import os
+import json
+import atexit
+import time
+import queue
+import logging
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from src.metrics import REGISTRY
+from logger import ALERT_LOGGER
+
+
+class AlertRecord(namedtuple("AlertRecord", ["patient_id", "feature", "value", "lower", "upper", "severity", "timestamp"])):
+    """One out-of-range predicted value; `severity` is -1 (below `lower`) or +1 (above `upper`)."""
+
+    def message(self):
+        return f"⚠️ {self.feature} is out of range: {self.value:.2f}"
+
+
+class LoggingSink:
+    """Writes every alert as a warning, as the monitor did before dispatching.
+
+    Alerts go to the `alerts` logger, which the logging pipeline never rate-limits or drops.
+    """
+
+    name = "log"
+
+    def __init__(self):
+        self.logger = logging.getLogger(ALERT_LOGGER)
+
+    def write(self, records):
+        for record in records:
+            self.logger.warning(f"ALERT for Patient {record.patient_id}: {record.message()}")
+
+
+class JsonlFileSink:
+    """Appends each batch of alerts to a JSON-lines file with one write."""
+
+    name = "file"
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def write(self, records):
+        lines = "".join(json.dumps(record._asdict()) + "\n" for record in records)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def build_sinks(names, file_path="artifacts/alerts.jsonl"):
+    """Sinks for a comma-separated list of "log" and "file"."""
+    factories = {"log": LoggingSink, "file": lambda: JsonlFileSink(file_path)}
+    names = [name.strip() for name in names.split(",") if name.strip()]
+    unknown = set(names) - set(factories)
+    if unknown:
+        raise ValueError(f"Unknown alert sinks: {sorted(unknown)}")
+    return [factories[name]() for name in names]
+
+
+class AlertDeduplicator:
+    """Turns per-prediction severity masks into alerts worth sending.
+
+    A (patient, feature) alert fires when it first goes out of range or flips side, and
+    then at most once per `cooldown` seconds while it stays out. It only clears once the
+    value is back inside the range by a margin of `hysteresis` × the range width, so a
+    value hovering at a bound does not re-alert on every prediction.
+    """
+
+    def __init__(self, alert_engine, cooldown=900, hysteresis=0.05):
+        self.feature_names = alert_engine.feature_names
+        self.lower = alert_engine.min_bounds
+        self.upper = alert_engine.max_bounds
+        width = self.upper - self.lower
+        margin = hysteresis * np.where(np.isfinite(width), width, 0.0)
+        self.clear_lower = self.lower + margin
+        self.clear_upper = self.upper - margin
+        self.cooldown = cooldown
+        # patient ID -> {feature index: (severity, time last sent)}
+        self.active = {}
+        self.suppressed = REGISTRY.counter("alerts_suppressed_total")
+
+    def filter(self, patient_ids, values, severity, now=None):
+        """Return the AlertRecords to send for (N,) patients with (N, F) values and severity."""
+        now = time.time() if now is None else now
+
+        for i in [i for i, patient_id in enumerate(patient_ids) if patient_id in self.active]:
+            state = self.active[patient_ids[i]]
+            for feature in [f for f in state if severity[i, f] == 0 and self.clear_lower[f] <= values[i, f] <= self.clear_upper[f]]:
+                del state[feature]
+            if not state:
+                del self.active[patient_ids[i]]
+
+        records, suppressed = [], 0
+        for i, feature in zip(*np.nonzero(severity)):
+            patient_id = patient_ids[i]
+            level = int(severity[i, feature])
+            state = self.active.setdefault(patient_id, {})
+            previous = state.get(feature)
+            if previous is not None and previous[0] == level and now - previous[1] < self.cooldown:
+                suppressed += 1
+                continue
+            state[feature] = (level, now)
+            records.append(AlertRecord(
+                patient_id.item() if isinstance(patient_id, np.generic) else patient_id,
+                self.feature_names[feature], float(values[i, feature]),
+                float(self.lower[feature]), float(self.upper[feature]), level, now,
+            ))
+        self.suppressed.inc(suppressed)
+        return records
+
+
+class AlertDispatcher:
+    """Delivers alerts to slow sinks without holding up inference.
+
+    `submit` only puts the prediction batch on a bounded queue (dropping it, and counting
+    the drop, when the queue is full). A background thread deduplicates the batches and
+    hands the resulting records to every sink in batches of up to `batch_size`, at most
+    `max_wait_ms` after the first record of the batch arrived.
+    """
+
+    STOP = object()
+
+    def __init__(self, alert_engine, sinks, cooldown=900, hysteresis=0.05, max_queue=1000, batch_size=256, max_wait_ms=200):
+        self.deduplicator = AlertDeduplicator(alert_engine, cooldown, hysteresis)
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.depth = REGISTRY.gauge("alert_queue_depth")
+        self.dropped = REGISTRY.counter("alert_batches_dropped_total")
+        self.thread = threading.Thread(target=self.run, name="alert-dispatch", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        # atexit runs hooks last-registered first, and logger registered shutdown_logging at
+        # import, so queued alerts are delivered while logging still writes.
+        atexit.register(self.stop)
+        return self
+
+    def stop(self, timeout=None):
+        """Deliver everything queued so far, then stop the thread."""
+        if self.thread.is_alive():
+            self.queue.put(self.STOP)
+            self.thread.join(timeout)
+
+    def submit(self, patient_ids, values, severity):
+        """Queue one prediction batch: (N,) patient IDs with their (N, F) values and severity mask."""
+        try:
+            self.queue.put_nowait((patient_ids, values, severity, time.perf_counter()))
+        except queue.Full:
+            self.dropped.inc()
+        self.depth.set(self.queue.qsize())
+
+    def run(self):
+        pending, enqueued, deadline = [], [], None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.perf_counter(), 0)
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            self.depth.set(self.queue.qsize())
+
+            if item is not None and item is not self.STOP:
+                patient_ids, values, severity, submitted = item
+                records = self.deduplicator.filter(patient_ids, values, severity)
+                if records:
+                    pending += records
+                    enqueued.append(submitted)
+                    deadline = deadline or time.perf_counter() + self.max_wait
+
+            if pending and (item is None or item is self.STOP or len(pending) >= self.batch_size or time.perf_counter() >= deadline):
+                for start in range(0, len(pending), self.batch_size):
+                    self.deliver(pending[start:start + self.batch_size])
+                delivered = time.perf_counter()
+                for submitted in enqueued:
+                    REGISTRY.histogram("alert_dispatch_lag_seconds").observe(delivered - submitted)
+                pending, enqueued, deadline = [], [], None
+
+            if item is self.STOP:
+                return
+
+    def deliver(self, records):
+        for sink in self.sinks:
+            name = getattr(sink, "name", type(sink).__name__)
+            try:
+                with REGISTRY.span("alert_sink", sink=name):
+                    sink.write(records)
+                REGISTRY.counter("alerts_dispatched_total", sink=name).inc(len(records))
+            except Exception as e:
+                REGISTRY.counter("alert_sink_errors_total", sink=name).inc()
+                logging.error(f"Alert sink {name} failed on {len(records)} alerts: {e}")
@@ -0,0 +1,39 @@
+import numpy as np
+
+
+NORMAL = 0
+BELOW_RANGE = -1
+ABOVE_RANGE = 1
+
+
+class ThresholdAlertEngine:
+    """Vectorized range checks of predicted vitals against the critical thresholds."""
+
+    def __init__(self, critical_thresholds, feature_names):
+        self.feature_names = list(feature_names)
+
+        # Features without a threshold get open bounds so they can never alert.
+        self.min_bounds = np.full(len(self.feature_names), -np.inf)
+        self.max_bounds = np.full(len(self.feature_names), np.inf)
+        for i, feature in enumerate(self.feature_names):
+            if feature in critical_thresholds:
+                self.min_bounds[i], self.max_bounds[i] = critical_thresholds[feature]
+
+    def evaluate(self, values):
+        """Return an int8 severity mask (-1 below, 0 normal, +1 above) shaped like `values`."""
+        values = np.asarray(values)
+        severity = np.zeros(values.shape, dtype=np.int8)
+        severity[values < self.min_bounds] = BELOW_RANGE
+        severity[values > self.max_bounds] = ABOVE_RANGE
+        return severity
+
+    def alert_messages(self, values, severity):
+        """Format one message per flagged cell of a single patient's row."""
+        return [
+            f"⚠️ {self.feature_names[i]} is out of range: {values[i]:.2f}"
+            for i in np.flatnonzero(severity)
+        ]
+
+    def highlight_styles(self, severity):
+        """Map a severity mask to the CSS used by the dashboard table."""
+        return np.where(severity != NORMAL, "background-color: red; color: white;", "")
@@ -1,154 +1,244 @@
 import os
+import sys
+import json
+import numpy as np
 import pandas as pd
 import logging
+from src.segment_store import SegmentReader
+from src.metrics import REGISTRY
+from logger import setup_logging
+from src.schema import load_csv, parse_dates, PATIENT_ID
 
 class PatientDataMerger:
-    def __init__(self, kafka_path, lab_path, output_file):
+    """Merges wearable readings with the latest lab results known at each reading.
+
+    Every patient has a watermark: the producer timestamp of the last wearable reading
+    already written to `output_file`. `merge(incremental=True)` only merges readings
+    past the watermark and appends them, so a cycle costs O(new rows). Lab reports
+    are cached and only re-read when their file changes.
+    """
+
+    def __init__(self, kafka_path, lab_path, output_file, log_file="merge_log.log"):
         self.kafka_path = kafka_path
         self.lab_path = lab_path
         self.output_file = output_file
+        self.state_file = f"{output_file}.state.json"
+        # One reader for the merger's lifetime, so repeated merges only parse new index lines.
+        self.reader = SegmentReader(kafka_path)
+
+        self.lab_frames = {}
+        self.lab_mtimes = {}
+        self.lab_index = None
 
-        logging.basicConfig(
-            level=logging.INFO,
-            format="%(asctime)s [%(levelname)s] %(message)s",
-            handlers=[
-                logging.FileHandler("merge_log.log", mode='w'),
-                logging.StreamHandler()
-            ]
-        )
+        setup_logging(fmt="%(asctime)s [%(levelname)s] %(message)s", log_file=log_file, file_mode="w")
 
     def preprocess_date(self, df):
         try:
-            print(df['Date'][0])
-            df['Date'] = pd.to_datetime(df['Date'], format='%d-%m-%Y', errors='coerce')
-            logging.info("Converted 'Date' column to datetime.")
+            df['Date'] = parse_dates(df['Date'])
+            logging.debug("Converted 'Date' column to datetime.")
         except Exception as e:
             logging.error(f"Error in date preprocessing: {e}")
         return df
 
-    def merge(self):
+    def load_topic(self, topic, patient_ids=None, start=None, end=None, since=None):
+        """Load one wearable topic from the consumer's segment store, or its legacy CSV dump."""
+        reader = self.reader
+        if reader.exists():
+            return reader.read(topic, patient_ids, start, end, since)
+
+        csv_file = os.path.join(self.kafka_path, topic, f"{topic}.csv")
+        if not os.path.exists(csv_file):
+            return None
+        df = load_csv(csv_file, topic, float_dtype="float64")
+        if patient_ids is not None:
+            df = df[df[PATIENT_ID].isin(set(patient_ids))]
+        if start is not None and "timestamp" in df.columns:
+            df = df[df["timestamp"] >= start]
+        if end is not None and "timestamp" in df.columns:
+            df = df[df["timestamp"] <= end]
+        return df
+
+    def patient_ids(self):
+        """All patients with wearable readings, from the segment index or the legacy CSV dump."""
+        reader = self.reader
+        if reader.exists():
+            return sorted(reader.patient_ids("vitals") | reader.patient_ids("blood_monitoring"))
+        csv_file = os.path.join(self.kafka_path, "blood_monitoring", "blood_monitoring.csv")
+        if not os.path.exists(csv_file):
+            return []
+        return sorted(load_csv(csv_file, "blood_monitoring", [PATIENT_ID])[PATIENT_ID].dropna().unique())
+
+    def load_watermarks(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        with open(self.state_file) as f:
+            return json.load(f)["watermarks"]
+
+    def save_watermarks(self, watermarks):
+        with open(self.state_file + ".tmp", "w") as f:
+            json.dump({"watermarks": watermarks}, f)
+        os.replace(self.state_file + ".tmp", self.state_file)
+
+    def load_lab_index(self, patient_ids=None):
+        """Return all lab results sorted by Date, re-reading only lab files that changed."""
+        patient_ids = None if patient_ids is None else set(patient_ids)
+        changed = False
+        for file_name in os.listdir(self.lab_path):
+            lab_path = os.path.join(self.lab_path, file_name)
+            if not (os.path.isfile(lab_path) and file_name.endswith(".csv")):
+                continue
+            if patient_ids is not None and os.path.splitext(file_name)[0] not in patient_ids:
+                continue
+
+            mtime = os.path.getmtime(lab_path)
+            if self.lab_mtimes.get(file_name) == mtime:
+                continue
+
+            try:
+                # float64: merged values are written back out and must keep their recorded precision.
+                lab_df = load_csv(lab_path, "lab_results", float_dtype="float64")
+                logging.debug(f"Loaded lab file: {file_name}")
+            except Exception as e:
+                logging.error(f"Error reading lab file {file_name}: {e}")
+                continue
+
+            lab_df = self.preprocess_date(lab_df)
+            lab_df = lab_df.dropna(subset=["Date"]).sort_values("Date")
+            lab_columns = [col for col in lab_df.columns if col not in ("Patient_ID", "Date")]
+            lab_df[lab_columns] = lab_df[lab_columns].ffill()
+
+            self.lab_frames[file_name] = lab_df
+            self.lab_mtimes[file_name] = mtime
+            changed = True
+
+        if changed or self.lab_index is None:
+            frames = list(self.lab_frames.values())
+            self.lab_index = pd.concat(frames, ignore_index=True).sort_values("Date") if frames else pd.DataFrame(columns=["Patient_ID", "Date"])
+        return self.lab_index
+
+    @REGISTRY.timed("merge")
+    def merge(self, patient_ids=None, start=None, end=None, incremental=False):
+        """Merge wearable and lab data, optionally only for `patient_ids` and producer timestamps in [start, end].
+
+        A full merge rewrites `output_file`; an incremental merge appends the readings
+        that arrived since the previous run. Returns the rows written (None when nothing was).
+        """
         try:
             logging.info("Starting merge process...")
-            blood_file = os.path.join(self.kafka_path, "blood_monitoring", "blood_monitoring.csv")
-            bp_file = os.path.join(self.kafka_path, "bp_monitoring", "bp_monitoring.csv")
-
-            if not os.path.exists(blood_file) or not os.path.exists(bp_file):
-                logging.error("Missing blood or BP file.")
-                return
+            watermarks = self.load_watermarks() if incremental and os.path.exists(self.output_file) else {}
 
             try:
-                blood_df = pd.read_csv(blood_file)
-                bp_df = pd.read_csv(bp_file)
-                logging.info("Loaded blood and BP files.")
+                merged_df = self.load_wearable(patient_ids, start, end, watermarks)
             except Exception as e:
-                logging.error(f"Error reading blood or BP files: {e}")
+                logging.error(f"Error loading wearable data: {e}")
                 return
 
-            blood_df = self.preprocess_date(blood_df)
-            bp_df = self.preprocess_date(bp_df)
+            if merged_df is None:
+                logging.error("Missing blood or BP file.")
+                return
+            if merged_df.empty:
+                logging.info("No new wearable readings to merge.")
+                return
 
             try:
-                merged_df = blood_df.merge(bp_df, on=["Patient_ID", "Date", "Time"], how="outer")
-                logging.info("Merged blood and BP data.")
+                lab_df = self.load_lab_index(patient_ids)
+                lab_columns = set(lab_df.columns) - {"Patient_ID", "Date"}
+                lab_df = lab_df.drop(columns=lab_columns.intersection(merged_df.columns), errors="ignore")
+                lab_df = lab_df[lab_df["Patient_ID"].isin(merged_df["Patient_ID"].unique())]
+
+                missing = set(merged_df["Patient_ID"].unique()) - set(lab_df["Patient_ID"].unique())
+                if missing:
+                    logging.warning(f"No lab data found for {len(missing)} patients: {', '.join(sorted(map(str, missing))[:10])}{' ...' if len(missing) > 10 else ''}")
+                merged_df = merged_df[~merged_df["Patient_ID"].isin(missing)]
+
+                # One backward as-of join gives every reading the latest lab result on or before its date.
+                final_df = pd.merge_asof(
+                    merged_df.dropna(subset=["Date"]).sort_values("Date"),
+                    lab_df.sort_values("Date"),
+                    by="Patient_ID",
+                    on="Date",
+                    direction="backward"
+                )
+                logging.info(f"Merged lab data for {final_df['Patient_ID'].nunique()} patients.")
             except Exception as e:
-                logging.error(f"Error merging blood and BP data: {e}")
+                logging.error(f"Error processing lab data: {e}")
                 return
 
-            all_patients_data = []
-
-            for file_name in os.listdir(self.lab_path):
-                lab_path = os.path.join(self.lab_path, file_name)
-
-                if os.path.isfile(lab_path) and file_name.endswith(".csv"):
-                    if not os.path.exists(lab_path):
-                        logging.warning(f"Lab file missing for: {self.lab_path}")
-                        continue
-
-                    try:
-                        lab_df = pd.read_csv(lab_path)
-                        logging.info(f"Loaded lab file: {file_name}")
-                    except Exception as e:
-                        logging.error(f"Error reading lab file {file_name}: {e}")
-                        continue
-
-                    lab_df = self.preprocess_date(lab_df)
-                    print("lab_df", lab_df.shape)
-
-                    try:
-                        lab_columns = set(lab_df.columns) - {"Patient_ID", "Date"}
-                        existing_columns = lab_columns.intersection(merged_df.columns)
-                        lab_df = lab_df.drop(columns=existing_columns, errors="ignore")
-
-                        current_patient_id = lab_df["Patient_ID"].iloc[0]
-                        logging.info(f"Processing patient: {current_patient_id}")
-                        print("current_patient_id", current_patient_id)
-                        patient_data = merged_df[merged_df["Patient_ID"] == current_patient_id].copy()
-
-                        if patient_data.empty:
-                            logging.warning(f"No matching patient data found for: {current_patient_id}")
-                            continue
-
-                        lab_df_sorted = lab_df.sort_values("Date")
-                        patient_data_sorted = patient_data.sort_values("Date")
-
-                        merged_asof = pd.merge_asof(
-                            patient_data_sorted,
-                            lab_df_sorted,
-                            by="Patient_ID",
-                            on="Date",
-                            direction="backward"
-                        )
-
-                        merged_exact = patient_data_sorted.merge(
-                            lab_df_sorted,
-                            on=["Patient_ID", "Date"],
-                            how="left",
-                            suffixes=('', '_lab_exact')
-                        )
-
-                        print("merged_exact", merged_exact.shape)
-
-                        for col in lab_columns:
-                            merged_asof[col] = merged_exact[col].combine_first(merged_asof[col])
-
-                        merged_asof = merged_asof.sort_values(by=["Patient_ID", "Date"])
-                        merged_asof[list(lab_columns)] = merged_asof.groupby("Patient_ID")[list(lab_columns)].ffill()
-
-                        print("merged_asof", merged_asof.shape)
+            if final_df.empty:
+                logging.warning("No patient data to merge.")
+                return
 
-                        all_patients_data.append(merged_asof)
-                        logging.info(f"Merged lab data for patient: {current_patient_id}")
+            try:
+                final_df = final_df.drop("Lab Result", axis=1, errors="ignore")
+                final_df = final_df.sort_values(by=['Date', 'Time']).reset_index(drop=True)
 
-                    except Exception as e:
-                        logging.error(f"Error processing lab data in {file_name}: {e}")
-                        continue
+                cols = ['Patient_ID'] + [col for col in final_df.columns if col != 'Patient_ID']
+                final_df = final_df[cols]
 
-            print("len of data", len(all_patients_data))
-            if all_patients_data:
-                try:
-                    final_df = pd.concat(all_patients_data, ignore_index=True)
-                    print("final_df", final_df.shape)
-                    final_df = final_df.drop("Lab Result", axis=1, errors="ignore")
-                    final_df = final_df.sort_values(by=['Date', 'Time']).reset_index(drop=True)
+                if watermarks:
+                    header = pd.read_csv(self.output_file, nrows=0).columns
+                    final_df.reindex(columns=header).to_csv(self.output_file, mode='a', header=False, index=False)
+                else:
+                    final_df.to_csv(self.output_file, index=False)
 
-                    cols = ['Patient_ID'] + [col for col in final_df.columns if col != 'Patient_ID']
-                    final_df = final_df[cols]
+                stamps = final_df[[col for col in final_df.columns if col.startswith("timestamp")]].max(axis=1)
+                for patient_id, timestamp in stamps.groupby(final_df["Patient_ID"]).max().items():
+                    watermarks[str(patient_id)] = int(max(timestamp, watermarks.get(str(patient_id), timestamp)))
+                self.save_watermarks(watermarks)
+                REGISTRY.counter("merged_rows_total").inc(len(final_df))
 
-                    print("final_df", final_df.shape)
-                    final_df.to_csv(self.output_file, index=False)
-                    logging.info(f"Final merged dataset saved at: {self.output_file}")
-                except Exception as e:
-                    logging.error(f"Error saving final DataFrame: {e}")
-            else:
-                logging.warning("No patient data to merge.")
+                logging.info(f"Final merged dataset ({len(final_df)} new rows) saved at: {self.output_file}")
+                return final_df
+            except Exception as e:
+                logging.error(f"Error saving final DataFrame: {e}")
         except Exception as e:
             logging.critical(f"Unexpected error: {e}", exc_info=True)
 
+    def load_wearable(self, patient_ids=None, start=None, end=None, watermarks=None):
+        """Return the joined blood + BP readings past each patient's watermark.
+
+        Readings already joined by the consumer's streaming join ("vitals" segments) are
+        used as they are; otherwise the raw topics are joined here.
+        """
+        watermarks = watermarks or {}
+        reader = self.reader
+        if reader.segments("vitals"):
+            vitals_df = reader.read("vitals", patient_ids, start, end, since=watermarks)
+            vitals_df = vitals_df[vitals_df["timestamp"] > vitals_df["Patient_ID"].astype(str).map(watermarks).fillna(-np.inf)]
+            logging.info("Loaded joined vitals segments.")
+            return self.preprocess_date(vitals_df)
+
+        blood_df = self.load_topic("blood_monitoring", patient_ids, start, end, since=watermarks)
+        bp_df = self.load_topic("bp_monitoring", patient_ids, start, end, since=watermarks)
+        if blood_df is None or bp_df is None:
+            return None
+        logging.info("Loaded blood and BP files.")
+
+        # A reading is only complete once both topics caught up to it, so merge each
+        # patient up to the older of its two latest timestamps and leave the rest for later.
+        horizon = pd.concat(
+            [blood_df.groupby("Patient_ID")["timestamp"].max(), bp_df.groupby("Patient_ID")["timestamp"].max()],
+            axis=1,
+        ).min(axis=1, skipna=False).dropna()
+        blood_df = self.preprocess_date(self.select_new_rows(blood_df, watermarks, horizon))
+        bp_df = self.preprocess_date(self.select_new_rows(bp_df, watermarks, horizon))
+
+        merged_df = blood_df.merge(bp_df, on=["Patient_ID", "Date", "Time"], how="outer")
+        logging.info("Merged blood and BP data.")
+        return merged_df
+
+    @staticmethod
+    def select_new_rows(df, watermarks, horizon):
+        """Keep rows past their patient's watermark and not beyond the patient's complete horizon."""
+        watermark = df["Patient_ID"].astype(str).map(watermarks).fillna(-np.inf)
+        limit = df["Patient_ID"].map(horizon)
+        return df[(df["timestamp"] > watermark) & (df["timestamp"] <= limit)]
+
 
 if __name__ == "__main__":
     kafka_path = "artifacts\\kafkaConsumerData"
     lab_path = "data\\lab_reports"
     output_file = "artifacts\\merged_patient_kafka_data.csv"
-    
+
     merger = PatientDataMerger(kafka_path, lab_path, output_file)
-    merger.merge()
+    merger.merge(incremental="--incremental" in sys.argv)
@@ -1,62 +1,175 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
 import pandas as pd
 import numpy as np
 import joblib
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from src.metrics import REGISTRY
+from src.schema import load_csv, split_blood_pressure, PATIENT_ID, BLOOD_PRESSURE, SYSTOLIC_BP, DIASTOLIC_BP, MODEL_FEATURES
+
+# Producer timestamps of the merged readings (the joined vitals carry one, the legacy blood/BP merge two).
+TIMESTAMP_COLUMNS = ["timestamp", "timestamp_x", "timestamp_y"]
+
+
+@contextmanager
+def file_lock(path, stale_seconds=30):
+    """Hold an exclusive `<path>.lock` file, so processes extending a shared artifact take turns."""
+    lock_path = f"{path}.lock"
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_seconds:
+                    os.remove(lock_path)  # left behind by a crashed process
+            except FileNotFoundError:
+                pass
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
 
 class DataPreprocessor:
-    """Class for preprocessing patient health data."""
+    """Class for preprocessing patient health data.
+
+    In "fit" mode the encoder and scaler are fitted on the loaded data and persisted.
+    In "apply" mode (the default) the persisted statistics are only applied, so
+    predictions do not drift with whatever data currently sits on disk.
+    """
 
-    def __init__(self, file_path, encoder_path, scaler_path):
+    def __init__(self, file_path, encoder_path, scaler_path, mode="apply"):
+        if mode not in ("fit", "apply"):
+            raise ValueError(f"Unknown preprocessing mode: {mode}")
         self.file_path = file_path
         self.encoder_path = encoder_path
         self.scaler_path = scaler_path
-        self.df = None  
+        self.mode = mode
+        self.df = None
+        self.timestamps = None
+        self.encoder = None
+        self.scaler = None
 
     def load_data(self):
-        """Load CSV data into a DataFrame."""
-        self.df = pd.read_csv(self.file_path)
-        self.df=self.df.drop(['patient_id_x','patient_id_y','timestamp_x','timestamp_y'],axis=1)
+        """Load the patient ID, Blood Pressure and numeric feature columns of the merged CSV.
+
+        The producer timestamps are moved out of the frame into `timestamps` (the latest
+        per row, -1 where unknown), which keys feature-store appends.
+        """
+        columns = [PATIENT_ID, BLOOD_PRESSURE] + [feature for feature in MODEL_FEATURES if feature not in (SYSTOLIC_BP, DIASTOLIC_BP)]
+        self.df = load_csv(self.file_path, "merged", columns + TIMESTAMP_COLUMNS)
+        stamps = self.df[[column for column in TIMESTAMP_COLUMNS if column in self.df.columns]]
+        self.timestamps = stamps.max(axis=1).fillna(-1).to_numpy(dtype=np.int64)
+        self.df = self.df.drop(columns=stamps.columns)
         return self.df
 
-    def process_timestamp(self):
-        """Convert Date & Time columns into a Timestamp and drop original columns."""
-        if 'Date' in self.df.columns and 'Time' in self.df.columns:
-            self.df['Timestamp'] = pd.to_datetime(
-                self.df['Date'] + ' ' + self.df['Time'], format='%d-%m-%Y %H.%M.%S',errors="coerce"
-            )
-            self.df.drop(columns=['Date', 'Time'], inplace=True)
+    def load_artifacts(self):
+        """Load the persisted encoder and scaler and precompute the apply-mode lookups."""
+        if self.encoder is None:
+            self.encoder = joblib.load(self.encoder_path)
+            self.id_map = {patient_id: code for code, patient_id in enumerate(self.encoder.classes_)}
+        if self.scaler is None:
+            self.scaler = joblib.load(self.scaler_path)
+            self.inv_scale = 1.0 / self.scaler.scale_
+            self.offset = -self.scaler.mean_ * self.inv_scale
 
     def split_blood_pressure(self):
         """Split Blood Pressure column into Systolic and Diastolic BP."""
-        if 'Blood Pressure' in self.df.columns:
-            self.df[['Systolic_BP', 'Diastolic_BP']] = self.df['Blood Pressure'].str.split('/', expand=True).astype(float)
-            self.df.drop(columns=['Blood Pressure'], inplace=True)
+        split_blood_pressure(self.df)
 
     def encode_patient_id(self):
         """Encode Patient_ID column."""
-        encoder = joblib.load(self.encoder_path)
-        self.df['Patient_ID'] = encoder.fit_transform(self.df['Patient_ID'])
+        if self.mode == "fit":
+            self.encoder = LabelEncoder()
+            self.df['Patient_ID'] = self.encoder.fit_transform(self.df['Patient_ID'])
+            self.id_map = {patient_id: code for code, patient_id in enumerate(self.encoder.classes_)}
+            joblib.dump(self.encoder, self.encoder_path)
+            return
+
+        self.register_patients(pd.unique(self.df.loc[~self.df['Patient_ID'].isin(self.id_map.keys()), 'Patient_ID']))
+        self.df['Patient_ID'] = self.df['Patient_ID'].map(self.id_map)
+
+    def register_patients(self, patient_ids):
+        """Give unseen patients the next free codes and persist the extended encoder.
+
+        Existing codes never change, so the extended classes_ stay valid for inverse_transform without refitting.
+        Consumer workers and the merge pipeline may register concurrently, so the encoder is
+        re-read and extended under a lock file, and replaced atomically.
+        """
+        unseen = [patient_id for patient_id in dict.fromkeys(patient_ids) if patient_id not in self.id_map]
+        if not unseen:
+            return
+        with file_lock(self.encoder_path):
+            self.encoder = joblib.load(self.encoder_path)
+            self.id_map = {patient_id: code for code, patient_id in enumerate(self.encoder.classes_)}
+            unseen = [patient_id for patient_id in unseen if patient_id not in self.id_map]
+            if not unseen:
+                return
+            for patient_id in unseen:
+                self.id_map[patient_id] = len(self.id_map)
+            self.encoder.classes_ = np.concatenate([self.encoder.classes_, np.array(unseen, dtype=self.encoder.classes_.dtype)])
+            joblib.dump(self.encoder, self.encoder_path + ".tmp")
+            os.replace(self.encoder_path + ".tmp", self.encoder_path)
 
     def scale_features(self):
         """Apply feature scaling to numerical data (excluding Patient_ID)."""
-        scaler = joblib.load(self.scaler_path)
-        self.df = self.df.astype(np.float64)
-        self.df_scaled = self.df.copy()
-        self.df_scaled.iloc[:, 1:] = scaler.fit_transform(self.df_scaled.iloc[:, 1:])
+        feature_names = list(self.df.columns[1:])
+        values = self.df[feature_names].to_numpy(dtype=np.float64)
+
+        if self.mode == "fit":
+            self.scaler = StandardScaler()
+            self.scaler.fit(self.df[feature_names].astype(np.float64))
+            self.inv_scale = 1.0 / self.scaler.scale_
+            self.offset = -self.scaler.mean_ * self.inv_scale
+            joblib.dump(self.scaler, self.scaler_path)
+        elif hasattr(self.scaler, 'feature_names_in_'):
+            feature_names = list(self.scaler.feature_names_in_)
+            values = self.df[feature_names].to_numpy(dtype=np.float64)
+
+        # Scaled values are float32, the model's input dtype, which halves the frame's footprint.
+        scaled = (values * self.inv_scale + self.offset).astype(np.float32)
+        self.df_scaled = pd.DataFrame(scaled, columns=feature_names, index=self.df.index)
+        self.df_scaled.insert(0, 'Patient_ID', self.df['Patient_ID'].astype(np.float64))
 
     def preprocess(self):
         """Perform all preprocessing steps and return the processed DataFrame."""
-        self.load_data()
-        self.process_timestamp()
-        self.split_blood_pressure()
-        self.encode_patient_id()
-        self.df.drop(columns=['Timestamp'], errors='ignore', inplace=True)
-        self.scale_features()
+        if self.mode == "apply":
+            self.load_artifacts()
+        with REGISTRY.span("preprocess", step="load_data"):
+            self.load_data()
+        with REGISTRY.span("preprocess", step="split_blood_pressure"):
+            self.split_blood_pressure()
+        with REGISTRY.span("preprocess", step="encode_patient_id"):
+            self.encode_patient_id()
+        with REGISTRY.span("preprocess", step="scale_features"):
+            self.scale_features()
         return self.df_scaled
 
+    def update_feature_store(self, store):
+        """Append the scaled rows newer than each patient's watermark in `store`, then flush it.
+
+        Rows are matched by producer timestamp, so a full merge rewrite or a reordering of
+        the merged file neither duplicates nor skips rows.
+        """
+        values = self.df_scaled.iloc[:, 1:].to_numpy(dtype=np.float32)
+        store.extend(self.df_scaled['Patient_ID'].to_numpy(), values, self.timestamps)
+        store.flush()
+
 if __name__=="__main__":
-    
+
     merged_data_path="artifacts/merged_patient_kafka_data.csv"
-    
-    preprocessor = DataPreprocessor(merged_data_path, "artifacts/encoder.pkl", "artifacts/scaler.pkl")
+    mode = "fit" if "--fit" in sys.argv else "apply"
+
+    preprocessor = DataPreprocessor(merged_data_path, "artifacts/encoder.pkl", "artifacts/scaler.pkl", mode=mode)
     df_scaled = preprocessor.preprocess()
-    
\ No newline at end of file
+
+    if "--feature-store" in sys.argv:
+        from src.feature_store import FeatureStore
+        store_path = sys.argv[sys.argv.index("--feature-store") + 1]
+        preprocessor.update_feature_store(FeatureStore(store_path, feature_names=df_scaled.columns[1:]))
+
@@ -0,0 +1,149 @@
+import json
+import time
+import numpy as np
+import pandas as pd
+from src.schema import split_blood_pressure
+
+
+NON_FEATURE_COLUMNS = ["Patient_ID", "patient_id", "patient_id_x", "patient_id_y", "Date", "Time", "timestamp", "timestamp_x", "timestamp_y"]
+
+
+def prepare_features(df):
+    """Return the numeric model features of a merged frame, with Blood Pressure split."""
+    df = split_blood_pressure(df.drop(columns=NON_FEATURE_COLUMNS, errors="ignore"))
+    return df.select_dtypes("number")
+
+
+class ReferenceProfile:
+    """Per-feature fixed-bin histogram of the reference data, computed once and persisted.
+
+    Interior bin edges are reference quantiles, so every bin holds a similar share of
+    the reference; the two outer bins are open-ended and catch out-of-range values.
+    """
+
+    def __init__(self, features, edges, counts, std):
+        self.features = list(features)
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        self.counts = [np.asarray(c, dtype=np.float64) for c in counts]
+        self.std = np.asarray(std, dtype=np.float64)
+
+    @classmethod
+    def build(cls, reference_df, bins=20):
+        reference_df = prepare_features(reference_df)
+        features, edges, counts, std = [], [], [], []
+        for feature in reference_df.columns:
+            values = reference_df[feature].dropna().to_numpy(dtype=np.float64)
+            if values.size == 0:
+                continue
+            interior = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+            features.append(feature)
+            edges.append(interior)
+            counts.append(np.bincount(np.searchsorted(interior, values, side="right"), minlength=interior.size + 1))
+            std.append(values.std() or 1.0)
+        return cls(features, edges, counts, std)
+
+    def save(self, path):
+        profile = {
+            feature: {"edges": e.tolist(), "counts": c.tolist(), "std": float(s)}
+            for feature, e, c, s in zip(self.features, self.edges, self.counts, self.std)
+        }
+        with open(path, "w") as f:
+            json.dump(profile, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            profile = json.load(f)
+        return cls(
+            profile.keys(),
+            [p["edges"] for p in profile.values()],
+            [p["counts"] for p in profile.values()],
+            [p["std"] for p in profile.values()],
+        )
+
+
+class FeatureSketch:
+    """Mergeable running histograms of incoming data over a profile's bins."""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.counts = [np.zeros_like(c) for c in profile.counts]
+
+    def update(self, features_df):
+        for i, feature in enumerate(self.profile.features):
+            if feature not in features_df.columns:
+                continue
+            values = features_df[feature].dropna().to_numpy(dtype=np.float64)
+            bins = np.searchsorted(self.profile.edges[i], values, side="right")
+            self.counts[i] += np.bincount(bins, minlength=self.counts[i].size)
+
+    def merge(self, other):
+        for mine, theirs in zip(self.counts, other.counts):
+            mine += theirs
+        return self
+
+    def reset(self):
+        for c in self.counts:
+            c[:] = 0
+
+
+class DriftEngine:
+    """Windowed drift scores of incoming data against a `ReferenceProfile`.
+
+    Incoming rows update the sketch of the current time bucket; the window is the sum
+    of the last `window_seconds / bucket_seconds` buckets, so `scores()` costs the same
+    no matter how many rows have been seen.
+    """
+
+    def __init__(self, profile, window_seconds=300, bucket_seconds=10, psi_threshold=0.2):
+        self.profile = profile
+        self.bucket_seconds = bucket_seconds
+        self.buckets = [FeatureSketch(profile) for _ in range(max(1, int(window_seconds // bucket_seconds)))]
+        self.bucket_ids = [None] * len(self.buckets)
+        self.psi_threshold = psi_threshold
+
+    def _bucket(self, now):
+        bucket_id = int(now // self.bucket_seconds)
+        slot = bucket_id % len(self.buckets)
+        if self.bucket_ids[slot] != bucket_id:
+            self.buckets[slot].reset()
+            self.bucket_ids[slot] = bucket_id
+        return self.buckets[slot]
+
+    def update(self, df, now=None):
+        """Add a batch of merged rows to the current bucket."""
+        self._bucket(time.time() if now is None else now).update(prepare_features(df))
+
+    def window(self, now=None):
+        """Merge the buckets that are still inside the window."""
+        current = int((time.time() if now is None else now) // self.bucket_seconds)
+        window = FeatureSketch(self.profile)
+        for bucket_id, sketch in zip(self.bucket_ids, self.buckets):
+            if bucket_id is not None and current - bucket_id < len(self.buckets):
+                window.merge(sketch)
+        return window
+
+    def scores(self, now=None):
+        """Per-feature PSI and std-normed Wasserstein distance of the window vs. the reference."""
+        window = self.window(now)
+        rows = []
+        for i, feature in enumerate(self.profile.features):
+            current = window.counts[i]
+            n = current.sum()
+            if n == 0:
+                rows.append((feature, 0, np.nan, np.nan, False))
+                continue
+
+            ref_p = self.profile.counts[i] / self.profile.counts[i].sum()
+            cur_p = current / n
+            eps = 1e-6
+            psi = float(np.sum((cur_p - ref_p) * np.log((cur_p + eps) / (ref_p + eps))))
+
+            # W1 is the area between the two CDFs; only the finite interior bins have a width.
+            edges = self.profile.edges[i]
+            cdf_gap = np.abs(np.cumsum(cur_p) - np.cumsum(ref_p))[:-1]
+            wasserstein = float(np.sum(cdf_gap[:-1] * np.diff(edges)) / self.profile.std[i]) if edges.size > 1 else 0.0
+
+            rows.append((feature, int(n), psi, wasserstein, psi > self.psi_threshold))
+
+        return pd.DataFrame(rows, columns=["feature", "rows", "psi", "wasserstein", "drift"]).set_index("feature")
@@ -1,40 +1,112 @@
 import pandas as pd
-from evidently.report import Report
-from evidently.metric_preset import DataDriftPreset
-import streamlit as st
 import os
+import sys
 import json
+import time
+import logging
+from src.drift_engine import ReferenceProfile, DriftEngine, prepare_features
+from src.data_merging import PatientDataMerger
+from src.metrics import REGISTRY
+from src.schema import load_csv
+from logger import setup_logging
 
 class EvidentlyMonitor:
+    """On-demand Evidently deep-dive; the continuous monitoring loop runs on `DriftEngine`."""
+
     def __init__(self, report_dir="artifacts"):
-        
+
         self.report_dir = report_dir
         os.makedirs(self.report_dir, exist_ok=True)
 
     def generate_report(self, baseline_df: pd.DataFrame, current_df: pd.DataFrame, title: str):
-       
-        
+        from evidently.report import Report
+        from evidently.metric_preset import DataDriftPreset
+
         report = Report([DataDriftPreset(drift_share=0.7)])
         report.run(reference_data=baseline_df, current_data=current_df)
 
-        report_file = os.path.join(self.report_dir, f"{title.lower().replace(' ', '_')}.html")
-        report.save_html(report_file)
-        snapshot_dict = report.as_dict()  
-        print(snapshot_dict)
-       
-        
-      
+        report_name = title.lower().replace(' ', '_')
+        report.save_html(os.path.join(self.report_dir, f"{report_name}.html"))
+        with open(os.path.join(self.report_dir, f"{report_name}_report.json"), "w") as f:
+            json.dump(report.as_dict(), f, indent=4, default=str)
+
+
+def load_reference_profile(reference_path, profile_path, bins=20):
+    """Load the persisted reference profile, building it from the reference data on first use."""
+    if os.path.exists(profile_path):
+        return ReferenceProfile.load(profile_path)
+    profile = ReferenceProfile.build(load_csv(reference_path, "merged"), bins=bins)
+    profile.save(profile_path)
+    return profile
+
+
+class StreamingDriftMonitor:
+    """Feeds each incremental merge's new rows into a `DriftEngine` and publishes the window's scores.
+
+    Every `interval` seconds the merger appends the readings past its watermarks; only
+    those rows update the engine, so a cycle costs O(new rows). PSI and Wasserstein
+    scores are exported as `drift_psi` / `drift_wasserstein` gauges per feature, and
+    drifting features are logged.
+    """
+
+    def __init__(self, merger, engine, interval=60):
+        self.merger = merger
+        self.engine = engine
+        self.interval = interval
+
+    def poll(self, now=None):
+        """Merge the new readings, add them to the engine and return the current scores."""
+        now = time.time() if now is None else now
+        new_rows = self.merger.merge(incremental=True)
+        if new_rows is not None and not new_rows.empty:
+            self.engine.update(new_rows, now=now)
+            REGISTRY.counter("drift_rows_total").inc(len(new_rows))
+
+        scores = self.engine.scores(now)
+        for feature, row in scores.iterrows():
+            REGISTRY.gauge("drift_psi", feature=feature).set(row["psi"])
+            REGISTRY.gauge("drift_wasserstein", feature=feature).set(row["wasserstein"])
+        drifting = scores.index[scores["drift"]].tolist()
+        if drifting:
+            logging.warning(f"📉 Drift in {len(drifting)} features over the last {len(self.engine.buckets) * self.engine.bucket_seconds:g}s: {', '.join(drifting)}")
+        return scores
 
+    def run(self):
+        logging.info(f"🔭 Streaming drift monitor started (every {self.interval:g}s).")
+        try:
+            while True:
+                self.poll()
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            logging.warning("Drift monitor stopped by user.")
 
-monitor = EvidentlyMonitor()
 
-reference_data=pd.read_csv("data/merged_patient_data.csv")
-current_data=pd.read_csv("artifacts/merged_patient_kafka_data.csv")
-current_data[['Systolic', 'Diastolic']] = current_data['Blood Pressure'].str.split('/', expand=True).astype(float)
-current_data.drop('Blood Pressure', axis=1, inplace=True)
-reference_data[['Systolic', 'Diastolic']] = reference_data['Blood Pressure'].str.split('/', expand=True).astype(float)
-reference_data.drop('Blood Pressure', axis=1, inplace=True)
+if __name__ == "__main__":
+    reference_path = "data/merged_patient_data.csv"
+    current_path = "artifacts/merged_patient_kafka_data.csv"
 
-reference_data=reference_data.drop(['Date','Time','Patient_ID'],axis=1)
-current_data=current_data.drop(['Date','Time','Patient_ID','timestamp_y','timestamp_x','patient_id_y','patient_id_x'],axis=1)
-monitor.generate_report(reference_data,current_data,title="Input Feature Drift")
\ No newline at end of file
+    if "--watch" in sys.argv:
+        setup_logging()
+        if os.getenv("METRICS_PORT"):
+            REGISTRY.serve(int(os.getenv("METRICS_PORT")))
+        merger = PatientDataMerger(
+            os.getenv("KAFKA_DATA_PATH", "artifacts/kafkaConsumerData"),
+            os.getenv("LAB_PATH", "data/lab_reports"),
+            os.getenv("MERGED_DATA_PATH", current_path),
+            log_file=None,
+        )
+        engine = DriftEngine(
+            load_reference_profile(reference_path, "artifacts/reference_profile.json"),
+            window_seconds=float(os.getenv("DRIFT_WINDOW_SECONDS", 300)),
+        )
+        StreamingDriftMonitor(merger, engine, interval=float(os.getenv("DRIFT_INTERVAL_SECONDS", 60))).run()
+    elif "--deep-dive" in sys.argv:
+        monitor = EvidentlyMonitor()
+        reference_data = prepare_features(load_csv(reference_path, "merged"))
+        current_data = prepare_features(load_csv(current_path, "merged"))
+        monitor.generate_report(reference_data, current_data, title="Input Feature Drift")
+    else:
+        profile = load_reference_profile(reference_path, "artifacts/reference_profile.json")
+        engine = DriftEngine(profile)
+        engine.update(load_csv(current_path, "merged"), now=time.time())
+        print(engine.scores().round(4).to_string())
@@ -0,0 +1,169 @@
+import os
+import json
+import numpy as np
+
+
+VALUES_FILE = "values.f32"
+INDEX_FILE = "index.json"
+
+
+class FeatureStore:
+    """On-disk store of each patient's scaled history as contiguous float32 rows.
+
+    All rows live in one memory-mapped (rows, F) float32 file. Each encoded patient ID
+    owns an extent [offset, offset + capacity) of it, of which the first `length` rows
+    are used; `index.json` holds the extents and each patient's watermark (the producer
+    timestamp of its newest row). Appending past an extent's capacity moves the
+    patient's rows to a new extent of twice the size at the end of the file.
+    `window` returns a zero-copy view, so opening the store costs O(patients), not O(history).
+    """
+
+    def __init__(self, root, feature_names=None, readonly=False, min_capacity=64):
+        self.root = root
+        self.values_path = os.path.join(root, VALUES_FILE)
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self.readonly = readonly
+        self.min_capacity = min_capacity
+
+        self.index_mtime = None
+        if os.path.exists(self.index_path):
+            self._load_index()
+            if feature_names is not None and list(feature_names) != self.feature_names:
+                raise ValueError(f"Feature store at {root} holds different features")
+        elif feature_names is None or readonly:
+            raise FileNotFoundError(f"No feature store at {root}")
+        else:
+            os.makedirs(root, exist_ok=True)
+            self.feature_names = list(feature_names)
+            self.used_rows = 0
+            self.extents = {}
+            self.watermarks = {}
+            self.values = None
+            self._resize(1024)
+
+        self._map()
+
+    def _load_index(self):
+        self.index_mtime = os.path.getmtime(self.index_path)
+        with open(self.index_path) as f:
+            index = json.load(f)
+        self.feature_names = index["feature_names"]
+        self.used_rows = index["used_rows"]
+        self.extents = {int(patient_id): extent for patient_id, extent in index["extents"].items()}
+        self.watermarks = {int(patient_id): timestamp for patient_id, timestamp in index.get("watermarks", {}).items()}
+
+    def refresh(self):
+        """Re-read the index (and remap the file) if another process flushed new rows; return True if it did."""
+        if os.path.getmtime(self.index_path) == self.index_mtime:
+            return False
+        self._load_index()
+        self._map()
+        return True
+
+    @staticmethod
+    def exists(root):
+        return os.path.exists(os.path.join(root, INDEX_FILE))
+
+    def _map(self):
+        rows = os.path.getsize(self.values_path) // (4 * len(self.feature_names))
+        self.values = np.memmap(self.values_path, dtype=np.float32, mode="r" if self.readonly else "r+",
+                                shape=(rows, len(self.feature_names)))
+
+    def _resize(self, rows):
+        if self.values is not None:
+            self.values.flush()
+        with open(self.values_path, "ab") as f:
+            f.truncate(rows * 4 * len(self.feature_names))
+
+    def _allocate(self, rows):
+        """Reserve `rows` rows at the end of the file and return their offset."""
+        needed = self.used_rows + rows
+        if needed > len(self.values):
+            self._resize(max(needed, 2 * len(self.values)))
+            self._map()
+        offset = self.used_rows
+        self.used_rows = needed
+        return offset
+
+    def __contains__(self, patient_id):
+        return int(patient_id) in self.extents
+
+    @property
+    def patient_ids(self):
+        return list(self.extents)
+
+    def length(self, patient_id):
+        extent = self.extents.get(int(patient_id))
+        return 0 if extent is None else extent[1]
+
+    def append(self, patient_id, rows):
+        """Append (n, F) scaled rows to a patient's history."""
+        rows = np.asarray(rows, dtype=np.float32).reshape(-1, len(self.feature_names))
+        patient_id = int(patient_id)
+        offset, length, capacity = self.extents.get(patient_id, (None, 0, 0))
+
+        if length + len(rows) > capacity:
+            new_capacity = max(2 * capacity, length + len(rows), self.min_capacity)
+            new_offset = self._allocate(new_capacity)
+            if length:
+                self.values[new_offset:new_offset + length] = self.values[offset:offset + length]
+            offset, capacity = new_offset, new_capacity
+
+        self.values[offset + length:offset + length + len(rows)] = rows
+        self.extents[patient_id] = [offset, length + len(rows), capacity]
+
+    def extend(self, patient_ids, values, timestamps=None):
+        """Append the rows of many patients, given as parallel (rows,) IDs and (rows, F) values.
+
+        Rows keep their given (time) order per patient. With (rows,) producer `timestamps`,
+        only rows newer than the patient's watermark are appended and the watermark moves
+        to the newest of them, as `PatientDataMerger` does; without, all rows are appended.
+        """
+        patient_ids = np.asarray(patient_ids).astype(np.int64)
+        order = np.argsort(patient_ids, kind="stable")
+        if timestamps is not None:
+            timestamps = np.asarray(timestamps, dtype=np.int64)
+        unique_ids, starts, counts = np.unique(patient_ids[order], return_index=True, return_counts=True)
+        for patient_id, start, count in zip(unique_ids, starts, counts):
+            rows = order[start:start + count]
+            if timestamps is not None:
+                rows = rows[timestamps[rows] > self.watermarks.get(int(patient_id), np.iinfo(np.int64).min)]
+                if len(rows):
+                    self.watermarks[int(patient_id)] = int(timestamps[rows].max())
+            if len(rows):
+                self.append(patient_id, values[rows])
+
+    def history(self, patient_id):
+        """Zero-copy view of a patient's full scaled history (oldest row first)."""
+        offset, length, _ = self.extents[int(patient_id)]
+        return self.values[offset:offset + length]
+
+    def window(self, patient_id, size=30):
+        """Zero-copy view of a patient's last `size` rows, or None if the history is shorter."""
+        history = self.history(patient_id)
+        return history[-size:] if len(history) >= size else None
+
+    def windows(self, size=30, patient_ids=None):
+        """Return (patient_ids, (N, size, F) windows) for every patient with at least `size` rows.
+
+        Unlike `window`, this gathers the rows into a new array (one copy of N × size rows).
+        """
+        patient_ids = self.patient_ids if patient_ids is None else [int(pid) for pid in patient_ids]
+        patient_ids = np.array([pid for pid in patient_ids if self.length(pid) >= size], dtype=np.int64)
+        ends = np.array([self.extents[pid][0] + self.extents[pid][1] for pid in patient_ids], dtype=np.int64)
+        rows = ends[:, None] - size + np.arange(size)
+        return patient_ids, self.values[rows]
+
+    def flush(self):
+        """Persist the rows and then the index that points at them."""
+        self.values.flush()
+        index = {
+            "feature_names": self.feature_names,
+            "used_rows": self.used_rows,
+            "extents": {str(patient_id): extent for patient_id, extent in self.extents.items()},
+            "watermarks": {str(patient_id): timestamp for patient_id, timestamp in self.watermarks.items()},
+        }
+        with open(self.index_path + ".tmp", "w") as f:
+            json.dump(index, f)
+        os.replace(self.index_path + ".tmp", self.index_path)
+        self.index_mtime = os.path.getmtime(self.index_path)
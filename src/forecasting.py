@@ -0,0 +1,45 @@
+import numpy as np
+
+from src.metrics import REGISTRY
+from src.schema import LAB_FEATURES
+
+
+class MultiHorizonForecaster:
+    """Autoregressive multi-step forecasts for all patients at once.
+
+    The model only predicts the next row, so each step feeds its batched prediction back
+    as the newest reading. Windows and forecasts share one preallocated (N, T + H, F)
+    buffer: step h predicts from the view `buffer[:, h:h + T]` and writes row `T + h`, so
+    the window slides forward without copying and the tail ends up holding the forecast.
+    Lab features (`static_features`) are not measured by the wearables; they are held at
+    their last value instead of being extrapolated. A forecast of H steps costs H
+    batched forward passes regardless of the number of patients.
+    """
+
+    def __init__(self, model, feature_names, static_features=LAB_FEATURES, batch_size=256):
+        self.model = model
+        self.feature_names = list(feature_names)
+        self.static = np.array([i for i, name in enumerate(self.feature_names) if name in static_features], dtype=np.intp)
+        self.batch_size = batch_size
+
+    def forecast(self, windows, horizon):
+        """Return (N, horizon, F) scaled forecasts for (N, T, F) scaled windows."""
+        windows = np.asarray(windows, dtype=np.float32)
+        n, size, features = windows.shape
+        if features != len(self.feature_names):
+            raise ValueError(f"Windows have {features} features, expected {len(self.feature_names)}")
+
+        buffer = np.empty((n, size + horizon, features), dtype=np.float32)
+        buffer[:, :size] = windows
+        if n == 0:
+            return buffer[:, size:]
+
+        for step in range(horizon):
+            with REGISTRY.span("forecast_step"):
+                next_rows = self.model.predict(buffer[:, step:step + size], batch_size=self.batch_size, verbose=0)
+            if next_rows.shape[1] != features:
+                raise ValueError(f"Model predicts {next_rows.shape[1]} features, expected {features}")
+            buffer[:, size + step] = next_rows
+            buffer[:, size + step, self.static] = buffer[:, size - 1, self.static]
+        REGISTRY.counter("forecasts_total").inc(n)
+        return buffer[:, size:]
@@ -0,0 +1,174 @@
+import os
+import time
+import asyncio
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.metrics import REGISTRY
+from logger import setup_logging, count_event
+
+
+class MicroBatchInferenceService:
+    """Asyncio service that coalesces per-patient window-ready events into bounded micro-batches.
+
+    A batch is closed once it holds `max_batch_size` patients or its oldest event has waited
+    `max_wait_ms`; each batch is one `PatientHealthMonitor.predict_windows` call on a worker
+    thread, and its (predictions, alerts) are handed to `publish` on the event loop.
+    A patient submitted twice before its batch runs is predicted once, on the newest window.
+    """
+
+    def __init__(self, monitor, max_batch_size=64, max_wait_ms=20, max_queue=10000, publish=None, executor=None):
+        self.monitor = monitor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.publish = publish or self.log_results
+        # One worker: the model is not assumed to be thread-safe, and batching already fills it.
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self.queue = None
+        self.loop = None
+        self.task = None
+        self.thread = None
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self.task = self.loop.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def submit(self, patient_id, window, timestamp=None):
+        """Queue a ready (T, F) window; waits while the queue is full."""
+        await self.queue.put((patient_id, window, timestamp, time.perf_counter()))
+
+    def submit_threadsafe(self, patient_id, window, timestamp=None):
+        """Queue a window from a non-loop thread (e.g. the Kafka consumer); drops it if the queue is full."""
+        self.loop.call_soon_threadsafe(self._put_nowait, (patient_id, window, timestamp, time.perf_counter()))
+
+    def _put_nowait(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            REGISTRY.counter("inference_events_dropped_total").inc()
+
+    async def next_batch(self):
+        """Wait for one event, then gather more until the batch is full or the oldest event's deadline passes."""
+        patient_id, window, timestamp, enqueued = await self.queue.get()
+        batch = {patient_id: (window, timestamp, enqueued)}
+        deadline = enqueued + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            try:
+                event = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            patient_id, window, timestamp, _ = event
+            # Keep the first enqueue time so coalescing never extends a patient's deadline.
+            first = batch.get(patient_id, (None, None, event[3]))[2]
+            batch[patient_id] = (window, timestamp, first)
+        return batch
+
+    async def run(self):
+        while True:
+            batch = await self.next_batch()
+            patient_ids = np.array(list(batch))
+            windows = np.stack([window for window, _, _ in batch.values()]).astype(np.float32, copy=False)
+            timestamps = np.array([timestamp or 0 for _, timestamp, _ in batch.values()], dtype=np.float64)
+            oldest = min(enqueued for _, _, enqueued in batch.values())
+
+            REGISTRY.histogram("inference_batch_size", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)).observe(len(batch))
+            try:
+                predictions, alerts, _ = await self.loop.run_in_executor(
+                    self.executor, self.monitor.predict_windows, patient_ids, windows)
+            except Exception as e:
+                logging.error(f"Inference batch of {len(batch)} patients failed: {str(e)}")
+                continue
+            REGISTRY.histogram("inference_queue_to_result_seconds").observe(time.perf_counter() - oldest)
+
+            if predictions:
+                self.monitor.observe_reading_latency(timestamps, np.array([pid in alerts for pid in patient_ids]))
+            self.publish(predictions, alerts)
+
+    def log_results(self, predictions, alerts):
+        count_event("live predictions", len(predictions))
+        count_event("live alerts", len(alerts))
+
+    def start_in_thread(self):
+        """Run the service on its own event loop in a daemon thread (for synchronous hosts)."""
+        started = threading.Event()
+
+        def serve():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+            loop.run_until_complete(self.stop())
+            loop.close()
+
+        self.thread = threading.Thread(target=serve, name="inference-service", daemon=True)
+        self.thread.start()
+        started.wait()
+        return self
+
+    def stop_thread(self, timeout=5):
+        if self.thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+            self.thread = None
+        self.executor.shutdown(wait=False)
+
+
+async def replay(service, patient_ids, windows, rounds, rate):
+    """Submit every batch window `rounds` times at roughly `rate` events/s."""
+    interval = 1 / rate if rate else 0
+    for _ in range(rounds):
+        for patient_id, window in zip(patient_ids, windows):
+            await service.submit(patient_id, window, time.time() * 1000)
+            await asyncio.sleep(interval)
+    while not service.queue.empty():
+        await asyncio.sleep(service.max_wait)
+    await asyncio.sleep(service.max_wait * 2)
+
+
+if __name__ == "__main__":
+    setup_logging(fmt="%(asctime)s - %(levelname)s - %(message)s")
+    from main import PatientHealthMonitor
+
+    parser = argparse.ArgumentParser(description="Drive the micro-batching inference service with the batch windows.")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=0, help="events per second (0 = as fast as possible)")
+    parser.add_argument("--max-batch-size", type=int, default=int(os.getenv("INFERENCE_MAX_BATCH", 64)))
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.getenv("INFERENCE_MAX_WAIT_MS", 20)))
+    args = parser.parse_args()
+
+    monitor = PatientHealthMonitor()
+    patient_ids, windows = monitor.build_windows()
+
+    async def main():
+        service = MicroBatchInferenceService(monitor, args.max_batch_size, args.max_wait_ms, publish=lambda *_: None)
+        await service.start()
+        await replay(service, patient_ids, windows, args.rounds, args.rate)
+        await service.stop()
+
+    asyncio.run(main())
+    snapshot = REGISTRY.snapshot()
+    for name in ("inference_batch_size", "inference_queue_to_result_seconds", "inference_seconds"):
+        print(name, snapshot.get(name))
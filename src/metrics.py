@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Interface the metrics endpoint binds to; it has no auth, so exposing it beyond localhost is opt-in.
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# Seconds, from 1 ms to 10 min; covers both per-stage spans and end-to-end lag.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def set(self, value):
+        with self.lock:
+            self.value = value
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        """Approximate quantile: the upper bound of the bucket holding the q-th observation."""
+        with self.lock:
+            counts, count = list(self.counts), self.count
+        if count == 0:
+            return None
+        rank, seen = q * count, 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """Process-wide counters, histograms and timing spans with Prometheus-text and JSON snapshots."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.help = {}
+        self.lock = threading.Lock()
+
+    def _get(self, kind, name, labels, factory):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self.metrics.get(key)
+        if metric is None:
+            with self.lock:
+                metric = self.metrics.setdefault(key, factory())
+        if not isinstance(metric, kind):
+            raise TypeError(f"Metric {name} is already registered as {type(metric).__name__}")
+        return metric
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def counter(self, name, **labels):
+        return self._get(Counter, name, labels, Counter)
+
+    def gauge(self, name, **labels):
+        return self._get(Gauge, name, labels, Gauge)
+
+    def histogram(self, name, buckets=DEFAULT_BUCKETS, **labels):
+        return self._get(Histogram, name, labels, lambda: Histogram(buckets))
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Time the enclosed block into the `<name>_seconds` histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(f"{name}_seconds", **labels).observe(time.perf_counter() - start)
+
+    def timed(self, name, **labels):
+        """Decorator form of `span`."""
+        def decorator(fn):
+            def wrapper(*args, **kwargs):
+                with self.span(name, **labels):
+                    return fn(*args, **kwargs)
+            wrapper.__name__, wrapper.__doc__ = fn.__name__, fn.__doc__
+            return wrapper
+        return decorator
+
+    def items(self):
+        """A copy of the registered metrics, safe to iterate while other threads register new ones."""
+        with self.lock:
+            return list(self.metrics.items())
+
+    def render_prometheus(self):
+        lines, described = [], set()
+        for (name, labels), metric in sorted(self.items(), key=lambda item: item[0]):
+            if name not in described:
+                described.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                kind = "gauge" if isinstance(metric, Gauge) else "counter" if isinstance(metric, Counter) else "histogram"
+                lines.append(f"# TYPE {name} {kind}")
+            if isinstance(metric, (Counter, Gauge)):
+                lines.append(f"{name}{_label_text(labels)} {metric.value}")
+                continue
+            with metric.lock:
+                counts, total, count = list(metric.counts), metric.sum, metric.count
+            cumulative = 0
+            for bound, n in zip(metric.buckets + ("+Inf",), counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(labels)} {total}")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        snapshot = {}
+        for (name, labels), metric in self.items():
+            key = name + _label_text(labels)
+            if isinstance(metric, (Counter, Gauge)):
+                snapshot[key] = metric.value
+            else:
+                snapshot[key] = {
+                    "count": metric.count,
+                    "sum": metric.sum,
+                    "p50": metric.quantile(0.5),
+                    "p95": metric.quantile(0.95),
+                    "p99": metric.quantile(0.99),
+                }
+        return snapshot
+
+    def serve(self, port, host=None):
+        """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread, on `METRICS_HOST` by default."""
+        registry = self
+        host = host or METRICS_HOST
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.render_prometheus().encode(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(registry.snapshot()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("ingest_lag_seconds", "Producer timestamp to consumer receipt.")
+REGISTRY.describe("reading_to_prediction_seconds", "Producer timestamp of a patient's newest reading to its prediction.")
+REGISTRY.describe("reading_to_alert_seconds", "Producer timestamp of a patient's newest reading to its alert.")
+REGISTRY.describe("alert_queue_depth", "Prediction batches waiting for alert dispatch.")
+REGISTRY.describe("alert_dispatch_lag_seconds", "Prediction to delivery of its alerts to the sinks.")
@@ -0,0 +1,208 @@
+import sys
+import json
+import argparse
+import logging
+import numpy as np
+
+from logger import setup_logging
+
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "tanh": np.tanh,
+    "relu": lambda x: np.maximum(x, 0),
+    "sigmoid": lambda x: 0.5 * (1.0 + np.tanh(0.5 * x)),
+}
+
+SKIPPED_LAYERS = ("InputLayer", "Dropout", "SpatialDropout1D", "GaussianNoise", "ActivityRegularization")
+
+
+def _lstm_spec(layer):
+    config = layer.get_config()
+    kernel, recurrent_kernel, *bias = layer.get_weights()
+    units = recurrent_kernel.shape[0]
+    spec = {
+        "activation": config.get("activation", "tanh"),
+        "recurrent_activation": config.get("recurrent_activation", "sigmoid"),
+        "return_sequences": config.get("return_sequences", False),
+        "go_backwards": config.get("go_backwards", False),
+    }
+    arrays = {
+        "kernel": kernel,
+        "recurrent_kernel": recurrent_kernel,
+        "bias": bias[0] if bias else np.zeros(4 * units, dtype=kernel.dtype),
+    }
+    return spec, arrays
+
+
+def export_weights(model, out_path):
+    """Extract the layers of a trained Keras model into a self-describing `.npz` file."""
+    specs, arrays = [], {}
+
+    def add(kind, spec, layer_arrays):
+        index = len(specs)
+        specs.append({"type": kind, **spec})
+        for name, value in layer_arrays.items():
+            arrays[f"{index}/{name}"] = np.asarray(value, dtype=np.float32)
+
+    for layer in model.layers:
+        kind = type(layer).__name__
+        config = layer.get_config()
+
+        if kind in SKIPPED_LAYERS:
+            continue
+        elif kind == "LSTM":
+            add("LSTM", *_lstm_spec(layer))
+        elif kind == "Bidirectional":
+            forward_spec, forward_arrays = _lstm_spec(layer.forward_layer)
+            _, backward_arrays = _lstm_spec(layer.backward_layer)
+            spec = {
+                "merge_mode": config.get("merge_mode", "concat"),
+                "activation": forward_spec["activation"],
+                "recurrent_activation": forward_spec["recurrent_activation"],
+                "return_sequences": forward_spec["return_sequences"],
+            }
+            layer_arrays = {f"forward_{name}": value for name, value in forward_arrays.items()}
+            layer_arrays.update({f"backward_{name}": value for name, value in backward_arrays.items()})
+            add("Bidirectional", spec, layer_arrays)
+        elif kind in ("LayerNormalization", "BatchNormalization"):
+            names = [w.name.split("/")[-1].split(":")[0] for w in layer.weights]
+            add(kind, {"epsilon": float(config.get("epsilon", 1e-3))}, dict(zip(names, layer.get_weights())))
+        elif kind == "Dense":
+            kernel, *bias = layer.get_weights()
+            add("Dense", {"activation": config.get("activation", "linear")},
+                {"kernel": kernel, "bias": bias[0] if bias else np.zeros(kernel.shape[1])})
+        else:
+            raise ValueError(f"Layer type {kind} is not supported by the NumPy backend")
+
+    np.savez(out_path, __spec__=np.array(json.dumps(specs)), **arrays)
+    logging.info(f"Exported {len(specs)} layers to {out_path}")
+
+
+class NumpyLSTMModel:
+    """Vectorized NumPy forward pass over the layers exported by `export_weights`.
+
+    Mirrors the subset of the Keras model API that PatientHealthMonitor uses, so it
+    can replace the TensorFlow model at serve time.
+    """
+
+    def __init__(self, specs, arrays):
+        self.layers = []
+        for index, spec in enumerate(specs):
+            prefix = f"{index}/"
+            weights = {key[len(prefix):]: arrays[key] for key in arrays if key.startswith(prefix)}
+            self.layers.append((spec, weights))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            specs = json.loads(str(data["__spec__"]))
+            arrays = {key: data[key].astype(np.float32) for key in data.files if key != "__spec__"}
+        return cls(specs, arrays)
+
+    @staticmethod
+    def _lstm(x, kernel, recurrent_kernel, bias, activation, recurrent_activation, return_sequences, go_backwards):
+        n, steps, _ = x.shape
+        units = recurrent_kernel.shape[0]
+        act, recurrent_act = ACTIVATIONS[activation], ACTIVATIONS[recurrent_activation]
+
+        if go_backwards:
+            x = x[:, ::-1]
+        # The input projection of every timestep is one matmul; only the recurrence is sequential.
+        projected = x @ kernel + bias
+        h = np.zeros((n, units), dtype=np.float32)
+        c = np.zeros((n, units), dtype=np.float32)
+        outputs = np.empty((n, steps, units), dtype=np.float32) if return_sequences else None
+
+        for t in range(steps):
+            z = projected[:, t] + h @ recurrent_kernel
+            i = recurrent_act(z[:, :units])
+            f = recurrent_act(z[:, units:2 * units])
+            g = act(z[:, 2 * units:3 * units])
+            o = recurrent_act(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * act(c)
+            if return_sequences:
+                outputs[:, t] = h
+
+        return outputs if return_sequences else h
+
+    def _apply(self, spec, weights, x):
+        kind = spec["type"]
+        if kind == "LSTM":
+            return self._lstm(x, weights["kernel"], weights["recurrent_kernel"], weights["bias"],
+                              spec["activation"], spec["recurrent_activation"], spec["return_sequences"], spec["go_backwards"])
+        if kind == "Bidirectional":
+            args = (spec["activation"], spec["recurrent_activation"], spec["return_sequences"])
+            forward = self._lstm(x, weights["forward_kernel"], weights["forward_recurrent_kernel"], weights["forward_bias"], *args, False)
+            backward = self._lstm(x, weights["backward_kernel"], weights["backward_recurrent_kernel"], weights["backward_bias"], *args, True)
+            if spec["return_sequences"]:
+                backward = backward[:, ::-1]
+            merge_mode = spec["merge_mode"]
+            if merge_mode == "concat":
+                return np.concatenate([forward, backward], axis=-1)
+            if merge_mode == "sum":
+                return forward + backward
+            if merge_mode == "mul":
+                return forward * backward
+            if merge_mode == "ave":
+                return (forward + backward) / 2
+            raise ValueError(f"Unsupported merge_mode {merge_mode}")
+        if kind == "LayerNormalization":
+            mean = x.mean(axis=-1, keepdims=True)
+            var = x.var(axis=-1, keepdims=True)
+            x = (x - mean) / np.sqrt(var + spec["epsilon"])
+            return x * weights.get("gamma", 1.0) + weights.get("beta", 0.0)
+        if kind == "BatchNormalization":
+            x = (x - weights["moving_mean"]) / np.sqrt(weights["moving_variance"] + spec["epsilon"])
+            return x * weights.get("gamma", 1.0) + weights.get("beta", 0.0)
+        if kind == "Dense":
+            return ACTIVATIONS[spec["activation"]](x @ weights["kernel"] + weights["bias"])
+        raise ValueError(f"Unknown layer type {kind}")
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        for spec, weights in self.layers:
+            x = self._apply(spec, weights, x)
+        return x
+
+    def predict(self, x, batch_size=None, verbose=0):
+        """Run the forward pass over (N, T, F) input in chunks of `batch_size` windows."""
+        x = np.asarray(x, dtype=np.float32)
+        if not batch_size or len(x) <= batch_size:
+            return self(x)
+        return np.concatenate([self(x[i:i + batch_size]) for i in range(0, len(x), batch_size)])
+
+
+def check_parity(keras_model, numpy_model, windows, atol=1e-4):
+    """Compare both backends on the same windows; return the max absolute difference."""
+    expected = keras_model.predict(windows, verbose=0)
+    actual = numpy_model.predict(windows)
+    diff = float(np.max(np.abs(expected - actual)))
+    if diff > atol:
+        raise AssertionError(f"NumPy backend differs from Keras by {diff:.2e} (atol={atol:.0e})")
+    logging.info(f"NumPy backend matches Keras within {diff:.2e}")
+    return diff
+
+
+if __name__ == "__main__":
+    setup_logging(fmt="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Export a trained Keras LSTM model for the NumPy inference backend.")
+    parser.add_argument("model_path")
+    parser.add_argument("out_path")
+    parser.add_argument("--check", type=int, default=64, help="number of random windows for the parity check (0 to skip)")
+    args = parser.parse_args()
+
+    from tensorflow.keras.models import load_model
+
+    keras_model = load_model(args.model_path)
+    export_weights(keras_model, args.out_path)
+
+    if args.check:
+        windows = np.random.default_rng(0).standard_normal((args.check, *keras_model.input_shape[1:])).astype(np.float32)
+        try:
+            check_parity(keras_model, NumpyLSTMModel.load(args.out_path), windows)
+        except AssertionError as e:
+            logging.error(str(e))
+            sys.exit(1)
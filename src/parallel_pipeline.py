@@ -0,0 +1,124 @@
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from src.data_merging import PatientDataMerger
+from src.data_preprocessing import DataPreprocessor
+from src.metrics import REGISTRY
+from logger import setup_logging
+
+
+def shard_patients(patient_ids, shards):
+    """Deal patients round-robin into `shards` lists so every shard gets a similar mix."""
+    return [shard for shard in (list(patient_ids)[k::shards] for k in range(shards)) if shard]
+
+
+def rebuild_shard(kafka_path, lab_path, shard_file, encoder_path, scaler_path, patient_ids):
+    """Merge and scale one shard of patients; return (shard_file or None, encoded IDs, scaled values, timestamps)."""
+    merger = PatientDataMerger(kafka_path, lab_path, shard_file, log_file=None)
+    merger.merge(patient_ids=patient_ids)
+    if not os.path.exists(shard_file):
+        return None, np.empty(0, dtype=np.int64), None, np.empty(0, dtype=np.int64)
+
+    preprocessor = DataPreprocessor(shard_file, encoder_path, scaler_path)
+    df_scaled = preprocessor.preprocess()
+    return shard_file, df_scaled["Patient_ID"].to_numpy(dtype=np.int64), df_scaled.iloc[:, 1:].to_numpy(dtype=np.float32), preprocessor.timestamps
+
+
+class ParallelRebuild:
+    """Full merge + preprocessing rebuild, sharded by patient over a process pool.
+
+    Unseen patients are registered in the encoder up front, so the workers only apply
+    the shared artifacts. Each worker writes its own merged shard and returns its
+    scaled rows; the shards are concatenated into `output_file` (rows stay in time
+    order per patient) and their watermarks combined, so a later incremental merge
+    continues from the rebuild.
+    """
+
+    def __init__(self, kafka_path, lab_path, output_file, encoder_path, scaler_path, workers=None):
+        self.kafka_path = kafka_path
+        self.lab_path = lab_path
+        self.output_file = output_file
+        self.encoder_path = encoder_path
+        self.scaler_path = scaler_path
+        self.workers = workers or os.cpu_count()
+
+    def shard_file(self, k):
+        return f"{self.output_file}.part-{k}"
+
+    @REGISTRY.timed("parallel_rebuild")
+    def run(self):
+        """Rebuild `output_file`; return (encoded patient IDs, (rows, F) float32 scaled values, feature names, producer timestamps)."""
+        patient_ids = PatientDataMerger(self.kafka_path, self.lab_path, self.output_file, log_file=None).patient_ids()
+        preprocessor = DataPreprocessor(self.output_file, self.encoder_path, self.scaler_path)
+        preprocessor.load_artifacts()
+        preprocessor.register_patients(patient_ids)
+        feature_names = list(preprocessor.scaler.feature_names_in_)
+        if not patient_ids:
+            logging.warning(f"No wearable readings under {self.kafka_path}, nothing to rebuild.")
+            return np.empty(0, dtype=np.int64), np.empty((0, len(feature_names)), dtype=np.float32), feature_names, np.empty(0, dtype=np.int64)
+
+        shards = shard_patients(patient_ids, self.workers)
+        logging.info(f"Rebuilding {len(patient_ids)} patients in {len(shards)} shards on {self.workers} workers...")
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(rebuild_shard, self.kafka_path, self.lab_path, self.shard_file(k), self.encoder_path, self.scaler_path, shard)
+                for k, shard in enumerate(shards)
+            ]
+            results = [future.result() for future in futures]
+
+        shard_files = [shard_file for shard_file, _, _, _ in results if shard_file]
+        self.combine(shard_files)
+        ids = np.concatenate([ids for _, ids, _, _ in results])
+        values = np.concatenate([values for _, _, values, _ in results if values is not None]) if shard_files else np.empty((0, len(feature_names)), dtype=np.float32)
+        timestamps = np.concatenate([timestamps for _, _, _, timestamps in results])
+        logging.info(f"Rebuilt {len(ids)} rows for {len(np.unique(ids))} patients into {self.output_file}")
+        return ids, values, feature_names, timestamps
+
+    def combine(self, shard_files):
+        """Concatenate the shard CSVs (one header) and their watermarks, then delete the shards."""
+        headers = [pd.read_csv(shard_file, nrows=0).columns.tolist() for shard_file in shard_files]
+        with open(self.output_file + ".tmp", "w", newline="") as out:
+            if headers and all(header == headers[0] for header in headers):
+                for k, shard_file in enumerate(shard_files):
+                    with open(shard_file, newline="") as f:
+                        if k:
+                            f.readline()
+                        shutil.copyfileobj(f, out)
+            elif headers:
+                pd.concat([pd.read_csv(shard_file) for shard_file in shard_files]).to_csv(out, index=False)
+        os.replace(self.output_file + ".tmp", self.output_file)
+
+        watermarks = {}
+        for shard_file in shard_files:
+            with open(f"{shard_file}.state.json") as f:
+                watermarks.update(json.load(f)["watermarks"])
+            os.remove(f"{shard_file}.state.json")
+            os.remove(shard_file)
+        PatientDataMerger(self.kafka_path, self.lab_path, self.output_file, log_file=None).save_watermarks(watermarks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the merged and scaled patient data on a process pool.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("MERGE_WORKERS", 0)) or None)
+    parser.add_argument("--feature-store", help="also write the scaled rows to a fresh feature store at this path")
+    args = parser.parse_args()
+
+    setup_logging(fmt="%(asctime)s [%(levelname)s] %(message)s", stream=sys.stdout)
+    rebuild = ParallelRebuild(
+        "artifacts/kafkaConsumerData", "data/lab_reports", "artifacts/merged_patient_kafka_data.csv",
+        "artifacts/encoder.pkl", "artifacts/scaler.pkl", workers=args.workers,
+    )
+    ids, values, feature_names, timestamps = rebuild.run()
+
+    if args.feature_store:
+        from src.feature_store import FeatureStore
+        shutil.rmtree(args.feature_store, ignore_errors=True)
+        store = FeatureStore(args.feature_store, feature_names=feature_names)
+        store.extend(ids, values, timestamps)
+        store.flush()
@@ -0,0 +1,54 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from src.metrics import REGISTRY
+
+
+class PredictionCache:
+    """Per-patient memo of the last prediction, keyed on a fingerprint of the input window.
+
+    The fingerprint is a BLAKE2b digest of the window bytes and of `version` (which
+    identifies the model and scaler), so a patient with no new readings hits the cache
+    and any new reading or artifact change misses. At most `max_entries` patients are
+    kept (least recently used evicted first) and entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, version, max_entries=10000, ttl=600):
+        self.version = version.encode()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = REGISTRY.counter("prediction_cache_hits_total")
+        self.misses = REGISTRY.counter("prediction_cache_misses_total")
+
+    def fingerprint(self, window):
+        digest = hashlib.blake2b(self.version, digest_size=16)
+        digest.update(window.tobytes())
+        return digest.digest()
+
+    def get(self, patient_id, fingerprint):
+        """Return the cached value for this exact window, or None."""
+        with self.lock:
+            entry = self.entries.get(patient_id)
+            if entry is not None and entry[0] == fingerprint and time.monotonic() - entry[1] < self.ttl:
+                self.entries.move_to_end(patient_id)
+                self.hits.inc()
+                return entry[2]
+            if entry is not None:
+                del self.entries[patient_id]
+        self.misses.inc()
+        return None
+
+    def put(self, patient_id, fingerprint, value):
+        with self.lock:
+            self.entries[patient_id] = (fingerprint, time.monotonic(), value)
+            self.entries.move_to_end(patient_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,83 @@
+import os
+import importlib.util
+import pandas as pd
+
+
+PATIENT_ID = "Patient_ID"
+BLOOD_PRESSURE = "Blood Pressure"
+SYSTOLIC_BP = "Systolic_BP"
+DIASTOLIC_BP = "Diastolic_BP"
+
+# Dates and times as written by the devices, lab systems and the producer.
+DATE_FORMAT = "%d-%m-%Y"
+TIME_FORMAT = "%H.%M.%S"
+
+BLOOD_FEATURES = ["Blood Glucose Level (mg/dL)", "Blood Oxygen (SpO₂)", "Electrocardiogram (ECG/EKG)", "Hydration Levels"]
+BP_FEATURES = ["Heart Rate (HR)", "Respiratory Rate (RR)", "Body Temperature"]
+LAB_FEATURES = ["Hemoglobin", "Glucose", "Cholesterol", "Heart Rate", "Platelet Count", "WBC Count",
+                "RBC Count", "Creatinine", "Urea", "Sodium", "Potassium", "Calcium"]
+# The model's input columns, in the order the scaler was fitted on.
+MODEL_FEATURES = BLOOD_FEATURES + BP_FEATURES + LAB_FEATURES + [SYSTOLIC_BP, DIASTOLIC_BP]
+
+# Fields the producer adds to every Kafka message (and so to legacy consumer CSV dumps).
+MESSAGE_FIELDS = {"patient_id": "str", "timestamp": "Int64"}
+
+# Columns and dtypes of every CSV source. Columns a file has but its source does not
+# declare (e.g. the free-text "Lab Result") are never parsed. Patient IDs are
+# categorical where the frame is not joined with other sources.
+SOURCES = {
+    "blood_monitoring": {
+        "Date": "str", "Time": "str", **dict.fromkeys(BLOOD_FEATURES, "float32"), PATIENT_ID: "str", **MESSAGE_FIELDS,
+    },
+    "bp_monitoring": {
+        "Date": "str", "Time": "str", BLOOD_PRESSURE: "str", **dict.fromkeys(BP_FEATURES, "float32"), PATIENT_ID: "str", **MESSAGE_FIELDS,
+    },
+    "lab_results": {
+        "Date": "str", **dict.fromkeys(LAB_FEATURES, "float32"), BLOOD_PRESSURE: "str", PATIENT_ID: "str",
+    },
+    "merged": {
+        PATIENT_ID: "category", "Date": "str", "Time": "str", **dict.fromkeys(BLOOD_FEATURES, "float32"),
+        BLOOD_PRESSURE: "str", **dict.fromkeys(BP_FEATURES, "float32"), **dict.fromkeys(LAB_FEATURES, "float32"),
+        "timestamp": "Int64", "timestamp_x": "Int64", "timestamp_y": "Int64",
+    },
+}
+
+CSV_ENGINE = os.getenv("CSV_ENGINE") or ("pyarrow" if importlib.util.find_spec("pyarrow") else "c")
+# Below this size the C parser is faster: pyarrow's per-file setup dominates small lab reports.
+PYARROW_MIN_BYTES = int(os.getenv("PYARROW_MIN_BYTES", 1 << 20))
+
+
+def load_csv(path, source, columns=None, float_dtype="float32", engine=None):
+    """Read a CSV of a registered source with only the needed columns and explicit dtypes.
+
+    `columns` narrows the read to a subset of the source's columns; those missing from
+    the file are skipped. `float_dtype` overrides the compact float32 of the numeric
+    columns, e.g. where values are re-serialized. `engine` defaults to `CSV_ENGINE` (pyarrow
+    when installed) for files of at least `PYARROW_MIN_BYTES` and to the C parser below that.
+    """
+    schema = SOURCES[source]
+    wanted = schema if columns is None else {column: schema[column] for column in columns}
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [column for column in header if column in wanted]
+    dtypes = {column: float_dtype if wanted[column] == "float32" else wanted[column] for column in usecols}
+    if engine is None:
+        engine = CSV_ENGINE if os.path.getsize(path) >= PYARROW_MIN_BYTES else "c"
+    return pd.read_csv(path, usecols=usecols, dtype=dtypes, engine=engine)
+
+
+def parse_dates(dates, with_time=None):
+    """Parse `Date` strings (and optionally the matching `Time` strings); unparseable values become NaT."""
+    if with_time is None:
+        return pd.to_datetime(dates, format=DATE_FORMAT, errors="coerce")
+    return pd.to_datetime(dates + " " + with_time, format=f"{DATE_FORMAT} {TIME_FORMAT}", errors="coerce")
+
+
+def split_blood_pressure(df, float_dtype="float32"):
+    """Replace the "120/80" `Blood Pressure` column with numeric `Systolic_BP` / `Diastolic_BP` in place."""
+    if BLOOD_PRESSURE not in df.columns:
+        return df
+    parts = df[BLOOD_PRESSURE].str.split("/", n=1, expand=True).reindex(columns=[0, 1])
+    df[SYSTOLIC_BP] = pd.to_numeric(parts[0], errors="coerce").astype(float_dtype)
+    df[DIASTOLIC_BP] = pd.to_numeric(parts[1], errors="coerce").astype(float_dtype)
+    df.drop(columns=[BLOOD_PRESSURE], inplace=True)
+    return df
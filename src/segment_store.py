@@ -0,0 +1,205 @@
+import os
+import glob
+import json
+import time
+import logging
+import numpy as np
+import pandas as pd
+from src.metrics import REGISTRY
+from logger import count_event
+from src.schema import PATIENT_ID, BLOOD_PRESSURE, BLOOD_FEATURES, BP_FEATURES
+
+
+# Longest patient ID a segment can hold; longer IDs are rejected instead of truncated.
+PATIENT_ID_WIDTH = 64
+
+# Fixed-width NumPy record layouts of the wearable topics, in message field names.
+SEGMENT_SCHEMAS = {
+    "blood_monitoring": [
+        (PATIENT_ID, f"U{PATIENT_ID_WIDTH}"),
+        ("timestamp", "i8"),
+        ("Date", "U10"),
+        ("Time", "U8"),
+    ] + [(feature, "f4") for feature in BLOOD_FEATURES],
+    "bp_monitoring": [
+        (PATIENT_ID, f"U{PATIENT_ID_WIDTH}"),
+        ("timestamp", "i8"),
+        ("Date", "U10"),
+        ("Time", "U8"),
+        (BLOOD_PRESSURE, "U9"),
+    ] + [(feature, "f4") for feature in BP_FEATURES],
+}
+
+# Joined blood + BP readings emitted by the consumer's streaming join.
+SEGMENT_SCHEMAS["vitals"] = SEGMENT_SCHEMAS["blood_monitoring"] + [
+    field for field in SEGMENT_SCHEMAS["bp_monitoring"] if field[0] not in ("Patient_ID", "timestamp", "Date", "Time")
+]
+
+INDEX_FILE = "index.jsonl"
+# Each consumer process appends to its own `index-<worker>.jsonl`; readers merge them all.
+INDEX_PATTERN = "index*.jsonl"
+
+
+class SegmentWriter:
+    """Append-only writer of per-topic, per-patient NumPy record segments.
+
+    Messages are buffered per (topic, patient) and written as one immutable `.npy`
+    segment when a buffer reaches `max_rows` or is older than `max_age` seconds.
+    Every segment gets one line in the index file with its timestamp range, so
+    readers can pick segments without opening them. `max_buffered_rows` bounds
+    the memory held across all buffers.
+    """
+
+    def __init__(self, root, schemas=SEGMENT_SCHEMAS, max_rows=5000, max_age=60.0, max_buffered_rows=200000, index_file=INDEX_FILE):
+        self.root = root
+        self.dtypes = {topic: np.dtype(fields) for topic, fields in schemas.items()}
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.max_buffered_rows = max_buffered_rows
+
+        self.buffers = {}
+        self.opened_at = {}
+        self.buffered_rows = 0
+        self.sequence = 0
+
+        os.makedirs(self.root, exist_ok=True)
+        self.index_path = os.path.join(self.root, index_file)
+
+    def append(self, topic, record):
+        """Buffer one message; write its segment if the buffer is full."""
+        key = (topic, str(record.get("Patient_ID") or record.get("patient_id")))
+        if len(key[1]) > PATIENT_ID_WIDTH:
+            raise ValueError(f"Patient ID longer than {PATIENT_ID_WIDTH} characters: {key[1][:PATIENT_ID_WIDTH]}...")
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            buffer = self.buffers[key] = []
+            self.opened_at[key] = time.monotonic()
+        buffer.append(record)
+        self.buffered_rows += 1
+
+        if len(buffer) >= self.max_rows:
+            self._flush_key(key)
+        elif self.buffered_rows >= self.max_buffered_rows:
+            self.flush()
+
+    def roll_expired(self):
+        """Write every buffer that has been open for longer than `max_age`."""
+        now = time.monotonic()
+        for key in [key for key, opened in self.opened_at.items() if now - opened >= self.max_age]:
+            self._flush_key(key)
+
+    def flush(self):
+        """Write all buffered messages."""
+        for key in list(self.buffers):
+            self._flush_key(key)
+
+    def _flush_key(self, key):
+        records = self.buffers.pop(key)
+        del self.opened_at[key]
+        self.buffered_rows -= len(records)
+        if records:
+            self._write_segment(*key, records)
+
+    @REGISTRY.timed("segment_write")
+    def _write_segment(self, topic, patient_id, records):
+        dtype = self.dtypes[topic]
+        segment = np.empty(len(records), dtype=dtype)
+        for name in dtype.names:
+            default = "" if dtype[name].kind == "U" else 0 if dtype[name].kind == "i" else np.nan
+            values = [record.get(name) for record in records]
+            segment[name] = [default if value is None else value for value in values]
+
+        start, end = int(segment["timestamp"].min()), int(segment["timestamp"].max())
+        self.sequence += 1
+        relative_path = os.path.join(topic, patient_id, f"{start}_{end}_{os.getpid()}_{self.sequence}.npy")
+        path = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write under a temporary name first so readers never see a partial segment.
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, segment)
+        os.replace(path + ".tmp", path)
+
+        entry = {"topic": topic, "patient_id": patient_id, "path": relative_path, "start": start, "end": end, "rows": len(segment)}
+        with open(self.index_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        REGISTRY.counter("segment_rows_written_total", topic=topic).inc(len(segment))
+        logging.debug(f"💾 Wrote {len(segment)} {topic} rows for {patient_id} to {relative_path}")
+        count_event("segments written")
+
+
+class SegmentReader:
+    """Reads back the segments written by `SegmentWriter`, pruned by patient and time.
+
+    The parsed index entries are cached per index file with the byte offset read so far;
+    each lookup only parses the lines appended since, instead of re-reading every index
+    file from the start.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        # index path -> (byte offset parsed up to, {topic: [entries]})
+        self.index_cache = {}
+
+    def index_paths(self):
+        return sorted(glob.glob(os.path.join(self.root, INDEX_PATTERN)))
+
+    def exists(self):
+        return bool(self.index_paths())
+
+    def segments(self, topic, patient_ids=None, start=None, end=None, since=None):
+        """Return the index entries of `topic` that overlap the requested patients and time range.
+
+        `since` maps patient IDs to a timestamp; segments that end at or before it are skipped.
+        """
+        patient_ids = None if patient_ids is None else {str(pid) for pid in patient_ids}
+
+        entries = []
+        for index_path in self.index_paths():
+            for entry in self.index_entries(index_path).get(topic, ()):
+                if patient_ids is not None and entry["patient_id"] not in patient_ids:
+                    continue
+                if (start is not None and entry["end"] < start) or (end is not None and entry["start"] > end):
+                    continue
+                if since and entry["end"] <= since.get(entry["patient_id"], -1):
+                    continue
+                entries.append(entry)
+        return entries
+
+    def index_entries(self, index_path):
+        """Return the {topic: entries} of one index file, parsing only the complete lines added since the last call."""
+        offset, by_topic = self.index_cache.get(index_path, (0, {}))
+        if os.path.getsize(index_path) < offset:
+            offset, by_topic = 0, {}  # the index was rewritten
+        with open(index_path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        # A last line without a newline is still being appended by a consumer process.
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            entry = json.loads(line)
+            by_topic.setdefault(entry["topic"], []).append(entry)
+        self.index_cache[index_path] = (offset + len(complete), by_topic)
+        return by_topic
+
+    def patient_ids(self, topic):
+        return {entry["patient_id"] for entry in self.segments(topic)}
+
+    def read(self, topic, patient_ids=None, start=None, end=None, since=None):
+        """Load the matching segments of `topic` into one DataFrame ordered by timestamp."""
+        dtype = np.dtype(SEGMENT_SCHEMAS[topic])
+        arrays = [
+            np.load(os.path.join(self.root, entry["path"]), mmap_mode="r")
+            for entry in self.segments(topic, patient_ids, start, end, since)
+        ]
+        # Segments written with an older (narrower) layout are widened to the current one.
+        arrays = [array if array.dtype == dtype else array.astype(dtype) for array in arrays]
+        if not arrays:
+            return pd.DataFrame(columns=[name for name, _ in SEGMENT_SCHEMAS[topic]])
+
+        df = pd.DataFrame(np.concatenate(arrays))
+        if start is not None:
+            df = df[df["timestamp"] >= start]
+        if end is not None:
+            df = df[df["timestamp"] <= end]
+        return df.sort_values("timestamp", kind="stable").reset_index(drop=True)
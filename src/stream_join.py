@@ -0,0 +1,120 @@
+import time
+from collections import OrderedDict, deque
+
+
+class VitalsJoiner:
+    """Event-time join of the blood and BP halves of each wearable reading.
+
+    Halves are matched on (patient_id, producer timestamp). Each patient has a bounded
+    buffer of at most `max_pending` unmatched readings. A reading whose partner has
+    not arrived within `lateness_ms` (of wall-clock time since its first half, or of
+    event time behind the patient's newest reading) is emitted with the missing
+    half's fields set to None. A half that arrives after its reading was emitted is
+    dropped and counted in `late_dropped`.
+
+    A second half from the same topic for a pending (patient, timestamp) key never
+    overwrites the first: an identical redelivery is dropped and counted in
+    `duplicates`; a different reading is counted in `collisions` and the pending
+    reading is emitted first, so neither reading is lost.
+    """
+
+    def __init__(self, topic_fields, lateness_ms=5000, max_pending=16):
+        self.topic_fields = {topic: [f for f in fields if f not in ("Patient_ID", "patient_id", "timestamp")] for topic, fields in topic_fields.items()}
+        self.lateness_ms = lateness_ms
+        self.max_pending = max_pending
+
+        self.pending = {}
+        self.newest = {}
+        self.expired = {}
+        self.late_dropped = 0
+        self.duplicates = 0
+        self.collisions = 0
+
+    def add(self, topic, record, now_ms=None):
+        """Add one half; return the merged records that became complete or timed out."""
+        patient_id = record.get("patient_id") or record.get("Patient_ID")
+        timestamp = record.get("timestamp")
+        if timestamp in self.expired.get(patient_id, ()):
+            self.late_dropped += 1
+            return []
+
+        readings = self.pending.setdefault(patient_id, OrderedDict())
+        halves = readings.get(timestamp)
+        emitted = []
+        if halves is not None and topic in halves:
+            if halves[topic] == record:
+                self.duplicates += 1
+                return []
+            self.collisions += 1
+            emitted.append(self._merge(patient_id, timestamp, readings.pop(timestamp)))
+            halves = None
+        if halves is None:
+            halves = readings[timestamp] = {"arrived": now_ms if now_ms is not None else time.time() * 1000}
+        halves[topic] = record
+
+        if all(t in halves for t in self.topic_fields):
+            del readings[timestamp]
+            emitted.append(self._merge(patient_id, timestamp, halves))
+
+        # Event time moved on: readings older than the lateness tolerance will not be completed.
+        newest = max(self.newest.get(patient_id, timestamp), timestamp)
+        self.newest[patient_id] = newest
+        while readings:
+            oldest = next(iter(readings))
+            if len(readings) <= self.max_pending and oldest >= newest - self.lateness_ms:
+                break
+            emitted.append(self._expire(patient_id, oldest))
+
+        return emitted
+
+    def expire(self, now_ms=None):
+        """Emit every reading that has waited longer than `lateness_ms` for its partner."""
+        now_ms = now_ms if now_ms is not None else time.time() * 1000
+        emitted = []
+        for patient_id, readings in self.pending.items():
+            for timestamp in [ts for ts, halves in readings.items() if now_ms - halves["arrived"] > self.lateness_ms]:
+                emitted.append(self._expire(patient_id, timestamp))
+        return emitted
+
+    def _expire(self, patient_id, timestamp):
+        halves = self.pending[patient_id].pop(timestamp)
+        expired = self.expired.get(patient_id)
+        if expired is None:
+            expired = self.expired[patient_id] = deque(maxlen=self.max_pending)
+        expired.append(timestamp)
+        return self._merge(patient_id, timestamp, halves)
+
+    def _merge(self, patient_id, timestamp, halves):
+        merged = {"Patient_ID": patient_id, "timestamp": timestamp}
+        for topic, fields in self.topic_fields.items():
+            record = halves.get(topic)
+            for field in fields:
+                value = record.get(field) if record is not None else None
+                if value is not None or field not in merged:
+                    merged[field] = value
+        return merged
+
+    def export_state(self, patient_ids):
+        """Return the unmatched halves and join bookkeeping of `patient_ids`."""
+        return {
+            patient_id: {
+                "pending": self.pending.get(patient_id, OrderedDict()),
+                "newest": self.newest.get(patient_id),
+                "expired": self.expired.get(patient_id, deque(maxlen=self.max_pending)),
+            }
+            for patient_id in patient_ids
+            if patient_id in self.pending or patient_id in self.newest
+        }
+
+    def restore_state(self, state):
+        for patient_id, patient_state in state.items():
+            self.pending[patient_id] = patient_state["pending"]
+            self.expired[patient_id] = patient_state["expired"]
+            if patient_state["newest"] is not None:
+                self.newest[patient_id] = patient_state["newest"]
+
+    def drop(self, patient_ids):
+        for patient_id in patient_ids:
+            self.pending.pop(patient_id, None)
+            self.newest.pop(patient_id, None)
+            self.expired.pop(patient_id, None)
@@ -0,0 +1,361 @@
+import os
+import json
+import mmap
+import time
+import zlib
+import struct
+import threading
+from collections import namedtuple, defaultdict
+
+
+TRANSPORT = os.getenv("TRANSPORT", "kafka")
+TRANSPORT_PARTITIONS = int(os.getenv("TRANSPORT_PARTITIONS", 4))
+TRANSPORT_LOG_PATH = os.getenv("TRANSPORT_LOG_PATH", "artifacts/transport_log")
+
+# Seconds between checks for new records in a file log written by another process.
+FILE_LOG_POLL_INTERVAL = 0.005
+
+# Record frame of the file log: producer timestamp (ms), key length, value length.
+FRAME_HEADER = struct.Struct("<qII")
+
+TopicPartition = namedtuple("TopicPartition", ["topic", "partition"])
+ConsumerRecord = namedtuple("ConsumerRecord", ["topic", "partition", "offset", "timestamp", "key", "value"])
+
+
+def partition_for(key, partitions):
+    """Partition of a serialized message key; stable across processes, unlike hash()."""
+    return zlib.crc32(key) % partitions
+
+
+class ConsumerRebalanceListener:
+    """Callbacks around partition assignment changes, as in kafka-python."""
+
+    def on_partitions_revoked(self, revoked):
+        pass
+
+    def on_partitions_assigned(self, assigned):
+        pass
+
+
+class MemoryLog:
+    """Partitioned topics held in this process: the producer and consumers must share the process."""
+
+    def __init__(self, partitions):
+        self.partitions = partitions
+        self.records = defaultdict(list)
+        self.offsets = defaultdict(dict)
+        self.appended = 0
+        self.condition = threading.Condition()
+
+    def append(self, tp, records):
+        with self.condition:
+            self.records[tp].extend(records)
+            self.appended += 1
+            self.condition.notify_all()
+
+    def end(self, tp):
+        return len(self.records[tp])
+
+    def read(self, tp, position, max_records):
+        """Return ([(offset, timestamp, key, value)], next position) from `position` on."""
+        with self.condition:
+            records = self.records[tp][position:position + max_records]
+        return [(position + i, *record) for i, record in enumerate(records)], position + len(records)
+
+    def version(self):
+        return self.appended
+
+    def wait(self, version, timeout):
+        """Block until something is appended after `version` was read, or `timeout` seconds."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.appended != version, timeout)
+
+    def committed(self, group_id, tp):
+        return self.offsets[group_id].get(tp)
+
+    def commit(self, group_id, positions):
+        with self.condition:
+            self.offsets[group_id].update(positions)
+
+
+class FileLog:
+    """Partitioned topics as append-only files, shared by any process on the machine.
+
+    Each partition is one `<topic>-<partition>.log` file of length-prefixed frames,
+    appended with one O_APPEND write per producer batch and read through a memory map
+    that is extended as the file grows; offsets are byte positions. A frame that is
+    still being written is not returned until it is complete. Committed positions are
+    kept per consumer group and partition, so group members never share a file.
+    """
+
+    def __init__(self, root, partitions):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        meta_path = os.path.join(root, "meta.json")
+        # The partition count is fixed when the log is created: keys must keep mapping to the same partition.
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                partitions = json.load(f)["partitions"]
+        else:
+            with open(meta_path + ".tmp", "w") as f:
+                json.dump({"partitions": partitions}, f)
+            os.replace(meta_path + ".tmp", meta_path)
+        self.partitions = partitions
+        self.writers = {}
+        self.maps = {}
+        self.lock = threading.Lock()
+
+    def path(self, tp):
+        return os.path.join(self.root, f"{tp.topic}-{tp.partition}.log")
+
+    def offset_path(self, group_id, tp):
+        return os.path.join(self.root, f"{group_id}.{tp.topic}-{tp.partition}.offset")
+
+    def append(self, tp, records):
+        frames = b"".join(FRAME_HEADER.pack(timestamp, len(key), len(value)) + key + value for timestamp, key, value in records)
+        with self.lock:
+            fd = self.writers.get(tp)
+            if fd is None:
+                fd = self.writers[tp] = os.open(self.path(tp), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        os.write(fd, frames)
+
+    def end(self, tp):
+        path = self.path(tp)
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def _map(self, tp):
+        """Memory map of the partition file covering its current size, or None while it is empty."""
+        size = self.end(tp)
+        mapped = self.maps.get(tp)
+        if mapped is None or len(mapped) < size:
+            if mapped is not None:
+                mapped.close()
+            with open(self.path(tp), "rb") as f:
+                mapped = self.maps[tp] = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) if size else None
+        return mapped
+
+    def read(self, tp, position, max_records):
+        """Return ([(offset, timestamp, key, value)], next position) of the complete frames from `position` on."""
+        if self.end(tp) <= position:
+            return [], position
+        data = self._map(tp)
+        records, size = [], len(data)
+        while len(records) < max_records and position + FRAME_HEADER.size <= size:
+            timestamp, key_length, value_length = FRAME_HEADER.unpack_from(data, position)
+            start = position + FRAME_HEADER.size
+            end = start + key_length + value_length
+            if end > size:
+                break
+            records.append((position, timestamp, data[start:start + key_length], data[start + key_length:end]))
+            position = end
+        return records, position
+
+    def version(self):
+        return None
+
+    def wait(self, version, timeout):
+        time.sleep(min(timeout, FILE_LOG_POLL_INTERVAL))
+
+    def committed(self, group_id, tp):
+        path = self.offset_path(group_id, tp)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return int(f.read())
+
+    def commit(self, group_id, positions):
+        for tp, position in positions.items():
+            path = self.offset_path(group_id, tp)
+            with open(path + ".tmp", "w") as f:
+                f.write(str(position))
+            os.replace(path + ".tmp", path)
+
+
+class LogProducer:
+    """kafka-python style producer over a `MemoryLog` or `FileLog`.
+
+    A keyed message always goes to the key's partition, so each patient's readings stay
+    in send order. Messages are buffered and appended per partition once `batch_size`
+    bytes are pending or the oldest has waited `linger_ms`, and on `flush()`.
+    """
+
+    def __init__(self, log, key_serializer=None, value_serializer=None, batch_size=16384, linger_ms=0, **_):
+        self.log = log
+        self.key_serializer = key_serializer
+        self.value_serializer = value_serializer
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000
+        self.pending = defaultdict(list)
+        self.pending_bytes = 0
+        self.oldest = None
+        self.next_partition = 0
+        self.lock = threading.Lock()
+
+    def send(self, topic, value=None, key=None, partition=None, timestamp_ms=None):
+        key = b"" if key is None else self.key_serializer(key) if self.key_serializer else key
+        value = self.value_serializer(value) if self.value_serializer else value
+        if partition is None:
+            if key:
+                partition = partition_for(key, self.log.partitions)
+            else:
+                partition, self.next_partition = self.next_partition, (self.next_partition + 1) % self.log.partitions
+        timestamp = int(time.time() * 1000) if timestamp_ms is None else timestamp_ms
+
+        with self.lock:
+            self.pending[TopicPartition(topic, partition)].append((timestamp, key, value))
+            self.pending_bytes += len(key) + len(value)
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            due = self.pending_bytes >= self.batch_size or time.monotonic() - self.oldest >= self.linger
+        if due:
+            self.flush()
+
+    def flush(self, timeout=None):
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(list)
+            self.pending_bytes, self.oldest = 0, None
+            for tp, records in pending.items():
+                self.log.append(tp, records)
+
+    def close(self, timeout=None):
+        self.flush()
+
+
+class LogConsumer:
+    """kafka-python style consumer of a `MemoryLog` or `FileLog`.
+
+    There is no group coordinator: member `member` of `members` statically owns the
+    partitions p with p % members == member, and is told so once through the listener.
+    Positions start at the group's committed offsets, else at `auto_offset_reset`.
+    """
+
+    def __init__(self, log, group_id=None, auto_offset_reset="latest", enable_auto_commit=True, auto_commit_interval_ms=5000,
+                 max_poll_records=500, key_deserializer=None, value_deserializer=None, member=0, members=1, **_):
+        self.log = log
+        self.group_id = group_id
+        self.auto_offset_reset = auto_offset_reset
+        self.auto_commit_interval = auto_commit_interval_ms / 1000 if enable_auto_commit and group_id else None
+        self.max_poll_records = max_poll_records
+        self.key_deserializer = key_deserializer
+        self.value_deserializer = value_deserializer
+        self.member = member
+        self.members = members
+        self.positions = {}
+        self.next_fetch = 0
+        self.last_commit = time.monotonic()
+
+    def subscribe(self, topics, listener=None):
+        assigned = [
+            TopicPartition(topic, partition)
+            for topic in topics for partition in range(self.log.partitions)
+            if partition % self.members == self.member
+        ]
+        for tp in assigned:
+            committed = self.log.committed(self.group_id, tp) if self.group_id else None
+            if committed is None:
+                committed = 0 if self.auto_offset_reset == "earliest" else self.log.end(tp)
+            self.positions[tp] = committed
+        if listener is not None:
+            listener.on_partitions_assigned(set(assigned))
+
+    def assignment(self):
+        return set(self.positions)
+
+    def _fetch(self, max_records):
+        """Read up to `max_records`, starting at a different partition each time so none is starved."""
+        batches, partitions = {}, list(self.positions)
+        for k in range(len(partitions)):
+            if max_records <= 0:
+                break
+            tp = partitions[(self.next_fetch + k) % len(partitions)]
+            records, self.positions[tp] = self.log.read(tp, self.positions[tp], max_records)
+            if records:
+                max_records -= len(records)
+                batches[tp] = [
+                    ConsumerRecord(
+                        tp.topic, tp.partition, offset, timestamp,
+                        self.key_deserializer(key) if key and self.key_deserializer else key or None,
+                        self.value_deserializer(value) if self.value_deserializer else value,
+                    )
+                    for offset, timestamp, key, value in records
+                ]
+        self.next_fetch += 1
+        return batches
+
+    def poll(self, timeout_ms=0, max_records=None):
+        """Return {TopicPartition: [ConsumerRecord]}, waiting up to `timeout_ms` for the first record."""
+        if self.auto_commit_interval is not None and time.monotonic() - self.last_commit >= self.auto_commit_interval:
+            self.commit()
+        deadline = time.monotonic() + timeout_ms / 1000
+        while True:
+            version = self.log.version()
+            batches = self._fetch(max_records or self.max_poll_records)
+            remaining = deadline - time.monotonic()
+            if batches or remaining <= 0:
+                return batches
+            self.log.wait(version, remaining)
+
+    def commit(self):
+        if self.group_id:
+            self.log.commit(self.group_id, dict(self.positions))
+        self.last_commit = time.monotonic()
+
+    def close(self, autocommit=True):
+        if autocommit and self.auto_commit_interval is not None:
+            self.commit()
+        self.positions = {}
+
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def open_log(backend):
+    """The process-wide log of a broker-free backend ("memory" or "mmap")."""
+    with _logs_lock:
+        if backend == "memory":
+            key = backend
+            factory = lambda: MemoryLog(TRANSPORT_PARTITIONS)
+        elif backend == "mmap":
+            key = (backend, os.path.abspath(TRANSPORT_LOG_PATH))
+            factory = lambda: FileLog(TRANSPORT_LOG_PATH, TRANSPORT_PARTITIONS)
+        else:
+            raise ValueError(f"Unknown transport {backend!r} (expected kafka, memory or mmap)")
+        if key not in _logs:
+            _logs[key] = factory()
+        return _logs[key]
+
+
+def create_producer(backend=None, **options):
+    """Producer of the `TRANSPORT` backend; `options` are KafkaProducer arguments."""
+    backend = backend or TRANSPORT
+    if backend == "kafka":
+        from kafka import KafkaProducer
+        return KafkaProducer(**options)
+    return LogProducer(open_log(backend), **options)
+
+
+def create_consumer(topics, backend=None, listener=None, member=0, members=1, **options):
+    """Subscribed consumer of the `TRANSPORT` backend; `options` are KafkaConsumer arguments.
+
+    `member` / `members` give the static partition assignment of the broker-free
+    backends; with Kafka the group coordinator assigns partitions and calls `listener`.
+    """
+    backend = backend or TRANSPORT
+    if backend == "kafka":
+        from kafka import KafkaConsumer, ConsumerRebalanceListener as KafkaRebalanceListener
+
+        class Listener(KafkaRebalanceListener):
+            def on_partitions_revoked(self, revoked):
+                listener.on_partitions_revoked(revoked)
+
+            def on_partitions_assigned(self, assigned):
+                listener.on_partitions_assigned(assigned)
+
+        consumer = KafkaConsumer(**options)
+        consumer.subscribe(topics, listener=Listener() if listener is not None else None)
+        return consumer
+
+    consumer = LogConsumer(open_log(backend), member=member, members=members, **options)
+    consumer.subscribe(topics, listener=listener)
+    return consumer
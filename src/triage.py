@@ -0,0 +1,135 @@
+import numpy as np
+
+from src.metrics import REGISTRY
+
+
+class StreamingTriage:
+    """Per-patient streaming statistics that decide who needs a model forward pass this cycle.
+
+    For every feature with a critical threshold, each patient keeps an EWMA mean and
+    variance, an EWMA of the change between readings (its slope) and its last value, in
+    scaled units, in compact (capacity, features) arrays. A reading updates them in O(F).
+
+    A patient is hot when, for some feature, the last value is closer to a bound (on
+    either side) than `volatility_k` EWMA standard deviations plus `lookahead` readings
+    of its slope plus `near_margin` × the range width. Hot patients are scheduled every
+    cycle; the rest every `stable_every` cycles. A value that sits far outside its range
+    without moving (e.g. a constant lab result) is not near a crossing, so it does not
+    keep a patient hot; its alert is carried over from the last forward pass.
+    """
+
+    def __init__(self, alert_engine, mean, scale, alpha=0.2, lookahead=3, volatility_k=3.0, near_margin=0.1,
+                 stable_every=6, capacity=1024):
+        bounded = np.isfinite(alert_engine.min_bounds) & np.isfinite(alert_engine.max_bounds)
+        self.features = np.flatnonzero(bounded)
+        mean = np.asarray(mean, dtype=np.float64)[self.features]
+        scale = np.asarray(scale, dtype=np.float64)[self.features]
+        # Thresholds moved into the scaled space the windows live in.
+        self.lower = ((alert_engine.min_bounds[self.features] - mean) / scale).astype(np.float32)
+        self.upper = ((alert_engine.max_bounds[self.features] - mean) / scale).astype(np.float32)
+        self.width = self.upper - self.lower
+
+        self.alpha = alpha
+        self.lookahead = lookahead
+        self.volatility_k = volatility_k
+        self.near_margin = near_margin
+        self.stable_every = stable_every
+        self.cycle = 0
+
+        self.slots = {}
+        features = len(self.features)
+        self.mean = np.zeros((capacity, features), dtype=np.float32)
+        self.var = np.zeros((capacity, features), dtype=np.float32)
+        self.slope = np.zeros((capacity, features), dtype=np.float32)
+        self.last = np.zeros((capacity, features), dtype=np.float32)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.last_inferred = np.full(capacity, -1, dtype=np.int64)
+
+        self.scheduled = REGISTRY.counter("triage_scheduled_total")
+        self.skipped = REGISTRY.counter("triage_skipped_total")
+        self.hot = REGISTRY.gauge("triage_hot_patients")
+
+    @classmethod
+    def from_scaler(cls, alert_engine, scaler, **kwargs):
+        return cls(alert_engine, scaler.mean_, scaler.scale_, **kwargs)
+
+    def _slots(self, patient_ids):
+        slots = np.empty(len(patient_ids), dtype=np.int64)
+        for i, patient_id in enumerate(patient_ids):
+            slot = self.slots.get(patient_id)
+            if slot is None:
+                slot = self.slots[patient_id] = len(self.slots)
+                if slot == len(self.counts):
+                    self._grow()
+            slots[i] = slot
+        return slots
+
+    def _grow(self):
+        for name in ("mean", "var", "slope", "last", "counts"):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros_like(array)]))
+        self.last_inferred = np.concatenate([self.last_inferred, np.full_like(self.last_inferred, -1)])
+
+    def _update(self, slots, x):
+        """Fold one (N, M) reading of the monitored features into the statistics of `slots`."""
+        a = self.alpha
+        first = self.counts[slots] == 0
+        mean, last = self.mean[slots], self.last[slots]
+        delta = x - mean
+        self.slope[slots] = np.where(first[:, None], 0, (1 - a) * self.slope[slots] + a * (x - last))
+        self.var[slots] = np.where(first[:, None], 0, (1 - a) * (self.var[slots] + a * delta * delta))
+        self.mean[slots] = np.where(first[:, None], x, mean + a * delta)
+        self.last[slots] = x
+        self.counts[slots] += 1
+
+    def update(self, patient_ids, rows):
+        """Fold one new (N, F) scaled reading per patient into their statistics."""
+        self._update(self._slots(patient_ids), np.asarray(rows, dtype=np.float32)[:, self.features])
+
+    def observe(self, patient_ids, windows):
+        """Fold the readings of (N, T, F) scaled windows that are newer than each patient's last seen value.
+
+        New readings are the rows after the latest one equal to the stored last value (all
+        of them for a new patient, or when that value has left the window), so an unchanged
+        window adds nothing. A reading identical to the one before it is not counted.
+        """
+        slots = self._slots(patient_ids)
+        rows = np.asarray(windows, dtype=np.float32)[:, :, self.features]
+        steps = rows.shape[1]
+
+        seen = np.all(rows == self.last[slots][:, None, :], axis=2) & (self.counts[slots] > 0)[:, None]
+        newest_seen = steps - 1 - np.argmax(seen[:, ::-1], axis=1)
+        fresh = np.where(seen.any(axis=1), steps - 1 - newest_seen, steps)
+
+        for t in range(steps - fresh.max(initial=0), steps):
+            active = fresh >= steps - t
+            self._update(slots[active], rows[active, t])
+        return slots
+
+    def risk(self, patient_ids):
+        """Per-patient risk: > 0 when some feature could cross a bound soon (in units of the range width)."""
+        return self._risk(self._slots(patient_ids))
+
+    def _risk(self, slots):
+        last = self.last[slots]
+        distance = np.minimum(np.abs(last - self.lower), np.abs(self.upper - last))
+        reach = self.volatility_k * np.sqrt(self.var[slots]) + self.lookahead * np.abs(self.slope[slots])
+        return ((reach - distance) / self.width + self.near_margin).max(axis=1, initial=-np.inf)
+
+    def schedule(self, patient_ids, windows):
+        """Observe this cycle's windows and return the (N,) mask of patients to run the model on.
+
+        Hot patients, patients never inferred and patients last inferred `stable_every`
+        or more cycles ago are scheduled; they are marked as inferred in this cycle.
+        """
+        self.cycle += 1
+        slots = self.observe(patient_ids, windows)
+        hot = self._risk(slots) > 0
+        last = self.last_inferred[slots]
+        due = hot | (last < 0) | (self.cycle - last >= self.stable_every)
+        self.last_inferred[slots[due]] = self.cycle
+
+        self.hot.set(int(hot.sum()))
+        self.scheduled.inc(int(due.sum()))
+        self.skipped.inc(int((~due).sum()))
+        return due
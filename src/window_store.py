@@ -0,0 +1,164 @@
+import numbers
+import numpy as np
+from src.schema import BLOOD_PRESSURE, SYSTOLIC_BP, DIASTOLIC_BP
+
+
+def reading_to_features(record):
+    """Turn a raw blood/BP message into a {feature: value} dict in model feature names."""
+    features = {}
+    for key, value in record.items():
+        if key == BLOOD_PRESSURE:
+            try:
+                systolic, diastolic = str(value).split("/")
+                features[SYSTOLIC_BP] = float(systolic)
+                features[DIASTOLIC_BP] = float(diastolic)
+            except ValueError:
+                continue
+        elif isinstance(value, numbers.Real) and not isinstance(value, bool):
+            features[key] = value
+    return features
+
+
+class PatientWindowStore:
+    """In-memory sliding windows of the last `window_size` scaled rows per patient.
+
+    Every patient owns one slot of a preallocated (capacity, window_size, F) float32
+    array that is used as a ring buffer, so appending a reading is O(F) and reading
+    all ready windows is a single gather. Readings only carry the features of the
+    topic they came from; the rest are forward-filled from the patient's previous
+    values (lab results are seeded through `set_static_features`). Features never
+    seen for a patient are scaled to 0, the training mean.
+
+    Patients are keyed by their encoded IDs, the same integers the batch predictions use.
+    """
+
+    def __init__(self, feature_names, mean, scale, window_size=30, capacity=1024):
+        self.feature_names = list(feature_names)
+        self.feature_index = {feature: i for i, feature in enumerate(self.feature_names)}
+        self.window_size = window_size
+
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.inv_scale = (1.0 / np.asarray(scale, dtype=np.float64)).astype(np.float32)
+
+        self.slots = {}
+        self.patient_ids = []
+        self.free_slots = []
+        self.next_slot = 0
+        self.buffers = np.zeros((capacity, window_size, len(self.feature_names)), dtype=np.float32)
+        self.last_raw = np.full((capacity, len(self.feature_names)), np.nan, dtype=np.float32)
+        self.positions = np.zeros(capacity, dtype=np.int64)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+
+    @classmethod
+    def from_scaler(cls, scaler, window_size=30, capacity=1024):
+        """Build a store that scales readings with a fitted StandardScaler."""
+        return cls(scaler.feature_names_in_, scaler.mean_, scaler.scale_, window_size, capacity)
+
+    def _slot(self, patient_id):
+        slot = self.slots.get(patient_id)
+        if slot is None:
+            if self.free_slots:
+                slot = self.free_slots.pop()
+            else:
+                slot = self.next_slot
+                self.next_slot += 1
+                if slot == len(self.positions):
+                    self._grow()
+            self.slots[patient_id] = slot
+            self.patient_ids.append(patient_id)
+        return slot
+
+    def _grow(self):
+        self.buffers = np.concatenate([self.buffers, np.zeros_like(self.buffers)])
+        self.last_raw = np.concatenate([self.last_raw, np.full_like(self.last_raw, np.nan)])
+        self.positions = np.concatenate([self.positions, np.zeros_like(self.positions)])
+        self.counts = np.concatenate([self.counts, np.zeros_like(self.counts)])
+        self.timestamps = np.concatenate([self.timestamps, np.zeros_like(self.timestamps)])
+
+    def _merge_raw(self, slot, features):
+        for feature, value in features.items():
+            i = self.feature_index.get(feature)
+            if i is not None:
+                self.last_raw[slot, i] = value
+
+    def set_static_features(self, patient_id, features):
+        """Record slowly-changing values (e.g. latest lab results) without appending a row."""
+        self._merge_raw(self._slot(patient_id), features)
+
+    def update(self, patient_id, features, timestamp=None):
+        """Append one reading for a patient; return True once the patient has a full window.
+
+        `timestamp` is the reading's producer timestamp (ms), kept for end-to-end latency.
+        """
+        slot = self._slot(patient_id)
+        self._merge_raw(slot, features)
+        if timestamp is not None:
+            self.timestamps[slot] = timestamp
+
+        scaled = (self.last_raw[slot] - self.mean) * self.inv_scale
+        position = self.positions[slot]
+        self.buffers[slot, position] = np.nan_to_num(scaled, nan=0.0)
+        self.positions[slot] = (position + 1) % self.window_size
+        self.counts[slot] += 1
+        return self.counts[slot] >= self.window_size
+
+    def is_ready(self, patient_id):
+        slot = self.slots.get(patient_id)
+        return slot is not None and self.counts[slot] >= self.window_size
+
+    def window(self, patient_id):
+        """Return a patient's window in time order (oldest row first)."""
+        slot = self.slots[patient_id]
+        return np.roll(self.buffers[slot], -self.positions[slot], axis=0)
+
+    def latest_timestamps(self, patient_ids):
+        """Producer timestamps (ms) of the newest reading of each patient."""
+        return self.timestamps[[self.slots[pid] for pid in patient_ids]]
+
+    def ready_windows(self, patient_ids=None):
+        """Return (patient_ids, windows) for every requested patient with a full window."""
+        if patient_ids is None:
+            patient_ids = self.patient_ids
+        patient_ids = [pid for pid in patient_ids if self.is_ready(pid)]
+
+        slots = np.array([self.slots[pid] for pid in patient_ids], dtype=np.int64)
+        rows = (self.positions[slots][:, None] + np.arange(self.window_size)) % self.window_size
+        return np.array(patient_ids), self.buffers[slots[:, None], rows]
+
+    def export_state(self, patient_ids):
+        """Return {patient_id: state} for the known `patient_ids`, for handing them to another process."""
+        state = {}
+        for patient_id in patient_ids:
+            slot = self.slots.get(patient_id)
+            if slot is None:
+                continue
+            state[patient_id] = {
+                "window": self.window(patient_id),
+                "last_raw": self.last_raw[slot].copy(),
+                "count": int(self.counts[slot]),
+                "timestamp": int(self.timestamps[slot]),
+            }
+        return state
+
+    def restore_state(self, state):
+        """Load patients exported by `export_state`, replacing any state held for them."""
+        for patient_id, patient_state in state.items():
+            slot = self._slot(patient_id)
+            self.buffers[slot] = patient_state["window"]
+            self.positions[slot] = 0
+            self.last_raw[slot] = patient_state["last_raw"]
+            self.counts[slot] = patient_state["count"]
+            self.timestamps[slot] = patient_state["timestamp"]
+
+    def drop(self, patient_ids):
+        """Forget patients and recycle their slots."""
+        for patient_id in patient_ids:
+            slot = self.slots.pop(patient_id, None)
+            if slot is None:
+                continue
+            self.patient_ids.remove(patient_id)
+            self.buffers[slot] = 0
+            self.last_raw[slot] = np.nan
+            self.positions[slot] = self.counts[slot] = self.timestamps[slot] = 0
+            self.free_slots.append(slot)
@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    """Run every test from the repository root, where the artifact and data paths are relative to."""
+    monkeypatch.chdir(ROOT)
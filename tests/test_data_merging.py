@@ -0,0 +1,75 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from src.data_merging import PatientDataMerger
+from src.segment_store import SegmentWriter
+
+LAB_PATH = "data/lab_reports"
+
+
+def vitals(patient_ids, start, readings):
+    """Joined wearable readings, one every 30 minutes from `start`, spanning the lab report dates."""
+    rng = np.random.default_rng(start)
+    records = []
+    for i in range(start, start + readings):
+        when = pd.Timestamp("2025-02-23") + pd.Timedelta(minutes=30 * i)
+        for patient_id in patient_ids:
+            records.append({
+                "Patient_ID": patient_id, "timestamp": 1740000000000 + i * 1800000,
+                "Date": when.strftime("%d-%m-%Y"), "Time": when.strftime("%H.%M.%S"),
+                "Blood Glucose Level (mg/dL)": rng.uniform(70, 180), "Blood Oxygen (SpO₂)": rng.uniform(90, 100),
+                "Electrocardiogram (ECG/EKG)": rng.uniform(0.5, 1.5), "Hydration Levels": rng.uniform(40, 70),
+                "Blood Pressure": f"{rng.integers(100, 140)}/{rng.integers(60, 90)}", "Heart Rate (HR)": rng.uniform(60, 100),
+                "Respiratory Rate (RR)": rng.uniform(12, 20), "Body Temperature": rng.uniform(36, 38),
+            })
+    return records
+
+
+def write_segments(kafka_path, records):
+    writer = SegmentWriter(kafka_path)
+    for record in records:
+        writer.append("vitals", record)
+    writer.flush()
+
+
+def read_sorted(path):
+    return pd.read_csv(path).sort_values(["Patient_ID", "timestamp"]).reset_index(drop=True)
+
+
+def test_incremental_merge_matches_full_merge(tmp_path):
+    patient_ids = sorted(os.path.splitext(name)[0] for name in os.listdir(LAB_PATH))
+    first, second = vitals(patient_ids, 0, 300), vitals(patient_ids, 300, 250)
+
+    full_path = str(tmp_path / "full")
+    write_segments(full_path, first + second)
+    full = PatientDataMerger(full_path, LAB_PATH, str(tmp_path / "full.csv"), log_file=str(tmp_path / "merge.log"))
+    assert len(full.merge()) == len(first) + len(second)
+
+    incremental_path = str(tmp_path / "incremental")
+    write_segments(incremental_path, first)
+    merger = PatientDataMerger(incremental_path, LAB_PATH, str(tmp_path / "incremental.csv"), log_file=str(tmp_path / "merge.log"))
+    assert len(merger.merge(incremental=True)) == len(first)
+    write_segments(incremental_path, second)
+    assert len(merger.merge(incremental=True)) == len(second)
+    assert merger.merge(incremental=True) is None
+
+    merged = read_sorted(tmp_path / "full.csv")
+    assert merged["Hemoglobin"].notna().any() and merged["Hemoglobin"].nunique() > len(patient_ids)
+    pd.testing.assert_frame_equal(read_sorted(tmp_path / "incremental.csv"), merged)
+
+
+def test_incremental_merge_picks_up_new_segments_with_a_fresh_merger(tmp_path):
+    patient_ids = sorted(os.path.splitext(name)[0] for name in os.listdir(LAB_PATH))
+    kafka_path, output_file = str(tmp_path / "kafka"), str(tmp_path / "merged.csv")
+    write_segments(kafka_path, vitals(patient_ids, 0, 100))
+    PatientDataMerger(kafka_path, LAB_PATH, output_file, log_file=str(tmp_path / "merge.log")).merge(incremental=True)
+
+    write_segments(kafka_path, vitals(patient_ids, 100, 50))
+    PatientDataMerger(kafka_path, LAB_PATH, output_file, log_file=str(tmp_path / "merge.log")).merge(incremental=True)
+
+    shutil.copy(output_file, tmp_path / "incremental.csv")
+    PatientDataMerger(kafka_path, LAB_PATH, output_file, log_file=str(tmp_path / "merge.log")).merge()
+    pd.testing.assert_frame_equal(read_sorted(tmp_path / "incremental.csv"), read_sorted(output_file))
@@ -0,0 +1,79 @@
+import json
+import shutil
+
+import numpy as np
+import pytest
+
+import kafka_consumer
+from src import transport
+
+
+@pytest.fixture(autouse=True)
+def consumer_env(tmp_path, monkeypatch):
+    """Broker-free consumers with their own segment, state and encoder files."""
+    shutil.copy("artifacts/encoder.pkl", tmp_path / "encoder.pkl")
+    monkeypatch.setattr(transport, "TRANSPORT", "memory")
+    monkeypatch.setattr(transport, "_logs", {})
+    monkeypatch.setattr(kafka_consumer, "ENCODER_PATH", str(tmp_path / "encoder.pkl"))
+    monkeypatch.setattr(kafka_consumer, "KAFKA_DATA_PATH", str(tmp_path / "kafka"))
+    monkeypatch.setattr(kafka_consumer, "CONSUMER_STATE_PATH", str(tmp_path / "state"))
+    monkeypatch.setattr(kafka_consumer, "LIVE_INFERENCE", False)
+
+
+def send_readings(patient_id, start, readings):
+    """Send both halves of `readings` one-second wearable readings of a patient."""
+    producer = transport.create_producer(key_serializer=str.encode, value_serializer=lambda v: json.dumps(v).encode())
+    for i in range(start, start + readings):
+        common = {"patient_id": patient_id, "timestamp": 1740000000000 + i * 1000}
+        producer.send("blood_monitoring", key=patient_id, value={**common, "Blood Glucose Level (mg/dL)": 100.0 + i, "Blood Oxygen (SpO₂)": 97.0})
+        producer.send("bp_monitoring", key=patient_id, value={**common, "Blood Pressure": "120/80", "Heart Rate (HR)": 60.0 + i})
+    producer.close()
+
+
+def drain(worker):
+    """Step `worker` until a poll returns nothing."""
+    while worker.step(timeout_ms=0):
+        pass
+
+
+def test_released_patients_are_restored_by_the_next_owner():
+    first = kafka_consumer.ConsumerWorker(0)
+    send_readings("P12345", 0, 35)
+    send_readings("NEW1", 0, 12)
+    drain(first)
+
+    codes = [first.encode("P12345"), first.encode("NEW1")]
+    states = first.window_store.export_state(codes)
+    partitions = {first.partition_of["P12345"], first.partition_of["NEW1"]}
+    assert first.window_store.is_ready(codes[0]) and not first.window_store.is_ready(codes[1])
+
+    first.release(partitions)
+    assert not first.window_store.is_ready(codes[0]) and codes[1] not in first.window_store.slots
+    first.consumer.close(autocommit=False)
+
+    # A worker joining the group is assigned the partitions and picks up the checkpoint.
+    second = kafka_consumer.ConsumerWorker(0)
+    assert [second.encode("P12345"), second.encode("NEW1")] == codes
+    assert second.partition_of["P12345"] in partitions and second.partition_of["NEW1"] in partitions
+    for code in codes:
+        restored = second.window_store.export_state([code])[code]
+        np.testing.assert_array_equal(restored["window"], states[code]["window"])
+        assert restored["count"] == states[code]["count"] and restored["timestamp"] == states[code]["timestamp"]
+
+    # Offsets were committed with the checkpoint, so nothing is consumed twice.
+    drain(second)
+    assert second.window_store.export_state([codes[1]])[codes[1]]["count"] == 12
+    send_readings("NEW1", 12, 18)
+    drain(second)
+    assert second.window_store.is_ready(codes[1])
+
+
+def test_live_windows_are_keyed_by_encoded_patient_ids():
+    worker = kafka_consumer.ConsumerWorker(0)
+    send_readings("P12345", 0, 5)
+    send_readings("NEW2", 0, 5)
+    drain(worker)
+
+    assert worker.encode("P12345") == list(worker.artifacts.encoder.classes_).index("P12345")
+    assert worker.decode(worker.encode("NEW2")) == "NEW2"
+    assert all(isinstance(code, int) for code in worker.window_store.slots)
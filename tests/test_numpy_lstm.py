@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from src.numpy_lstm import NumpyLSTMModel, export_weights, check_parity
+
+keras = pytest.importorskip("tensorflow").keras
+
+
+def build_model(features=6, steps=10):
+    """A small model with the layer types of the training notebook, with non-trivial normalization weights."""
+    model = keras.Sequential([
+        keras.layers.Input((steps, features)),
+        keras.layers.Bidirectional(keras.layers.LSTM(16, return_sequences=True)),
+        keras.layers.LayerNormalization(),
+        keras.layers.Dropout(0.2),
+        keras.layers.Bidirectional(keras.layers.LSTM(8, return_sequences=True)),
+        keras.layers.BatchNormalization(),
+        keras.layers.LSTM(8),
+        keras.layers.Dense(features),
+    ])
+    rng = np.random.default_rng(0)
+    for layer in model.layers:
+        if isinstance(layer, (keras.layers.LayerNormalization, keras.layers.BatchNormalization)):
+            layer.set_weights([w + rng.random(w.shape).astype(np.float32) * 0.5 for w in layer.get_weights()])
+    return model
+
+
+def test_numpy_backend_matches_keras(tmp_path):
+    model = build_model()
+    export_weights(model, tmp_path / "model.npz")
+    windows = np.random.default_rng(1).standard_normal((32, 10, 6)).astype(np.float32)
+
+    assert check_parity(model, NumpyLSTMModel.load(tmp_path / "model.npz"), windows, atol=1e-4) <= 1e-4
+
+
+def test_batched_predict_matches_single_pass(tmp_path):
+    export_weights(build_model(), tmp_path / "model.npz")
+    numpy_model = NumpyLSTMModel.load(tmp_path / "model.npz")
+    windows = np.random.default_rng(2).standard_normal((25, 10, 6)).astype(np.float32)
+
+    np.testing.assert_allclose(numpy_model.predict(windows, batch_size=8), numpy_model(windows), atol=1e-6)
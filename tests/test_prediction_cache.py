@@ -0,0 +1,116 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from src import prediction_cache
+from src.prediction_cache import PredictionCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(prediction_cache.time, "monotonic", clock)
+    return clock
+
+
+def window(value):
+    return np.full((30, 4), value, dtype=np.float32)
+
+
+def test_hit_for_the_same_window_and_miss_when_it_changes(clock):
+    cache = PredictionCache("v1")
+    fingerprint = cache.fingerprint(window(0.5))
+    cache.put("P1", fingerprint, "prediction")
+
+    assert cache.get("P1", cache.fingerprint(window(0.5))) == "prediction"
+    changed = window(0.5)
+    changed[-1, 0] = 0.6
+    assert cache.get("P1", cache.fingerprint(changed)) is None
+    # A miss drops the stale entry, so the old window no longer hits either.
+    assert cache.get("P1", fingerprint) is None
+
+
+def test_artifact_version_is_part_of_the_fingerprint():
+    assert PredictionCache("v1").fingerprint(window(0.5)) != PredictionCache("v2").fingerprint(window(0.5))
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = PredictionCache("v1", ttl=60)
+    fingerprint = cache.fingerprint(window(0.5))
+    cache.put("P1", fingerprint, "prediction")
+
+    clock.now += 59
+    assert cache.get("P1", fingerprint) == "prediction"
+    clock.now += 1
+    assert cache.get("P1", fingerprint) is None
+
+
+def test_least_recently_used_patient_is_evicted(clock):
+    cache = PredictionCache("v1", max_entries=2)
+    fingerprints = {pid: cache.fingerprint(window(i)) for i, pid in enumerate(["P1", "P2", "P3"])}
+    cache.put("P1", fingerprints["P1"], 1)
+    cache.put("P2", fingerprints["P2"], 2)
+    assert cache.get("P1", fingerprints["P1"]) == 1  # P2 is now the least recently used
+
+    cache.put("P3", fingerprints["P3"], 3)
+    assert list(cache.entries) == ["P1", "P3"]
+    assert cache.get("P2", fingerprints["P2"]) is None
+
+
+def test_hits_and_misses_are_counted(clock):
+    cache = PredictionCache("v1")
+    hits, misses = cache.hits.value, cache.misses.value
+    fingerprint = cache.fingerprint(window(0.5))
+    cache.get("P1", fingerprint)
+    cache.put("P1", fingerprint, "prediction")
+    cache.get("P1", fingerprint)
+    assert (cache.hits.value - hits, cache.misses.value - misses) == (1, 1)
+
+
+class CountingModel:
+    """Predicts the last row of each window and counts the windows it was run on."""
+
+    def __init__(self):
+        self.rows = 0
+
+    def predict(self, windows, batch_size=None, verbose=0):
+        self.rows += len(windows)
+        return windows[:, -1]
+
+
+def test_monitor_only_runs_the_model_on_changed_windows(tmp_path, monkeypatch):
+    shutil.copy("artifacts/encoder.pkl", tmp_path / "encoder.pkl")
+    monkeypatch.setenv("MERGED_DATA_PATH", "artifacts/merged_patient_kafka_data.csv")
+    monkeypatch.setenv("ENCODER_PATH", str(tmp_path / "encoder.pkl"))
+    monkeypatch.setenv("SCALER_PATH", "artifacts/scaler.pkl")
+    monkeypatch.setenv("ALERT_SINKS", "")
+    monkeypatch.delenv("FEATURE_STORE_PATH", raising=False)
+    from main import PatientHealthMonitor
+
+    model = CountingModel()
+    monitor = PatientHealthMonitor(model=model)
+    try:
+        patient_ids, windows = monitor.build_windows()
+        first, _, _ = monitor.predict_windows(patient_ids, windows)
+        assert model.rows == len(patient_ids)
+
+        second, _, _ = monitor.predict_windows(patient_ids, windows)
+        assert model.rows == len(patient_ids)
+        for patient_id in patient_ids:
+            np.testing.assert_array_equal(second[patient_id], first[patient_id])
+
+        windows = windows.copy()
+        windows[0, -1] += 1.0
+        monitor.predict_windows(patient_ids, windows)
+        assert model.rows == len(patient_ids) + 1
+    finally:
+        monitor.close()
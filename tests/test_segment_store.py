@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from src.segment_store import SegmentWriter, SegmentReader, SEGMENT_SCHEMAS, PATIENT_ID_WIDTH
+
+
+def reading(patient_id, timestamp):
+    return {"Patient_ID": patient_id, "timestamp": timestamp, "Date": "01-03-2025", "Time": "08.00.00", "Heart Rate (HR)": 70.0}
+
+
+def test_patient_ids_longer_than_the_field_are_rejected(tmp_path):
+    writer = SegmentWriter(str(tmp_path))
+    with pytest.raises(ValueError):
+        writer.append("vitals", reading("P" * (PATIENT_ID_WIDTH + 1), 1))
+
+    long_id = "P" * PATIENT_ID_WIDTH
+    writer.append("vitals", reading(long_id, 1))
+    writer.flush()
+    assert SegmentReader(str(tmp_path)).read("vitals")["Patient_ID"].tolist() == [long_id]
+
+
+def test_segments_of_the_older_narrow_layout_are_still_read(tmp_path):
+    writer = SegmentWriter(str(tmp_path), schemas={"vitals": [(name, "U16" if name == "Patient_ID" else kind) for name, kind in SEGMENT_SCHEMAS["vitals"]]})
+    writer.append("vitals", reading("P12345", 1))
+    writer.flush()
+    writer = SegmentWriter(str(tmp_path))
+    writer.append("vitals", reading("P12345", 2))
+    writer.flush()
+
+    df = SegmentReader(str(tmp_path)).read("vitals")
+    assert df["timestamp"].tolist() == [1, 2] and df["Patient_ID"].tolist() == ["P12345", "P12345"]
+    np.testing.assert_array_equal(df["Heart Rate (HR)"], [70.0, 70.0])
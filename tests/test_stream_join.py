@@ -0,0 +1,41 @@
+from src.stream_join import VitalsJoiner
+
+TOPIC_FIELDS = {"blood_monitoring": ["Patient_ID", "timestamp", "Blood Glucose Level (mg/dL)"],
+                "bp_monitoring": ["Patient_ID", "timestamp", "Heart Rate (HR)"]}
+
+
+def blood(glucose, timestamp=1000):
+    return {"patient_id": "P1", "timestamp": timestamp, "Blood Glucose Level (mg/dL)": glucose}
+
+
+def bp(heart_rate, timestamp=1000):
+    return {"patient_id": "P1", "timestamp": timestamp, "Heart Rate (HR)": heart_rate}
+
+
+def test_matching_halves_are_joined():
+    joiner = VitalsJoiner(TOPIC_FIELDS)
+    assert joiner.add("blood_monitoring", blood(100.0), now_ms=0) == []
+    assert joiner.add("bp_monitoring", bp(70.0), now_ms=0) == [
+        {"Patient_ID": "P1", "timestamp": 1000, "Blood Glucose Level (mg/dL)": 100.0, "Heart Rate (HR)": 70.0}]
+
+
+def test_same_key_halves_from_one_topic_do_not_overwrite_each_other():
+    joiner = VitalsJoiner(TOPIC_FIELDS)
+    joiner.add("blood_monitoring", blood(100.0), now_ms=0)
+
+    emitted = joiner.add("blood_monitoring", blood(120.0), now_ms=0)
+    assert emitted == [{"Patient_ID": "P1", "timestamp": 1000, "Blood Glucose Level (mg/dL)": 100.0, "Heart Rate (HR)": None}]
+    assert joiner.collisions == 1
+
+    assert joiner.add("bp_monitoring", bp(70.0), now_ms=0) == [
+        {"Patient_ID": "P1", "timestamp": 1000, "Blood Glucose Level (mg/dL)": 120.0, "Heart Rate (HR)": 70.0}]
+    assert joiner.expire(now_ms=float("inf")) == []
+
+
+def test_redelivered_half_is_dropped_as_a_duplicate():
+    joiner = VitalsJoiner(TOPIC_FIELDS)
+    joiner.add("blood_monitoring", blood(100.0), now_ms=0)
+
+    assert joiner.add("blood_monitoring", blood(100.0), now_ms=0) == []
+    assert joiner.duplicates == 1 and joiner.collisions == 0
+    assert len(joiner.add("bp_monitoring", bp(70.0), now_ms=0)) == 1